@@ -0,0 +1,147 @@
+"""
+Benchmarks the latency of manven commands, separately from virtualenv and pip.
+
+Fake ``virtualenv``, ``virtualenv-clone`` and ``pip`` executables (see ``fakebin``) are put first on the PATH
+and each command is timed (as a new process, as when used from the shell) against folders holding
+an increasing number of environments. The results are written as JSON such that runs can be compared
+across commits.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+path_to_here = os.path.dirname(os.path.abspath(__file__))
+path_to_repo = os.path.dirname(path_to_here)
+path_to_main = os.path.join(path_to_repo, "manven", "main.py")
+path_to_fakebin = os.path.join(path_to_here, "fakebin")
+sys.path.insert(0, path_to_repo)
+
+from manven.state import SOURCE_EXIT_CODE  # noqa: E402
+from manven.trash import empty_trash  # noqa: E402
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+COMMANDS = ["create", "activate", "list", "list --all", "temp", "prune", "remove"]
+# Commands which start a detached process emptying the trash
+_TRASHING_COMMANDS = ["prune", "remove"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument("-s", "--sizes", type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Number of environments to benchmark against.")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Number of runs per command and size.")
+    parser.add_argument("-c", "--commands", nargs='+', default=COMMANDS, help="Commands to benchmark.")
+    parser.add_argument("-o", "--output", type=str, default=None,
+                        help="File to write the results to (default results/<commit>.json).")
+    args = parser.parse_args()
+
+    results = {
+        "commit": _get_commit(),
+        "python": sys.version.split()[0],
+        "timestamp": time.time(),
+        "repeat": args.repeat,
+        "results": {},
+    }
+    for size in args.sizes:
+        results["results"][str(size)] = _benchmark_size(size, args.commands, args.repeat)
+
+    output = args.output
+    if output is None:
+        output = os.path.join(path_to_here, "results", f"{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+
+def _benchmark_size(size, commands, repeat):
+    """Benchmarks the commands against a folder with ``size`` environments (and ``size // 10`` temporary ones)."""
+    workdir = tempfile.mkdtemp(prefix="manven-bench-")
+    try:
+        envs_path = os.path.join(workdir, "envs")
+        with open(os.path.join(workdir, ".manven.conf"), 'w') as f:
+            f.write(f"[manven]\nENVS_PATH={envs_path}\nDEFAULT_PKGS=[]\nCREATION_BACKEND=subprocess\n")
+        for i in range(size):
+            _make_fake_environment(os.path.join(envs_path, f"venv_{i}"))
+        results = {}
+        for command in commands:
+            timings = []
+            for run in range(repeat):
+                args = _prepare(command, envs_path, size, run)
+                timings.append(_time_command(args, cwd=workdir))
+                if command in _TRASHING_COMMANDS:
+                    # Waits for the trash worker, such that it does not run during the next measurement
+                    empty_trash(basefolder=envs_path)
+            results[command] = {
+                "median": statistics.median(timings),
+                "min": min(timings),
+                "max": max(timings),
+            }
+            print(f"{size:>6} envs | {command:<12} | median {results[command]['median'] * 1000:8.1f} ms")
+        return results
+    finally:
+        if os.path.exists(workdir):
+            empty_trash(basefolder=os.path.join(workdir, "envs"))
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _prepare(command, envs_path, size, run):
+    """Sets up the state needed by a run of a command and returns its arguments."""
+    if command == "create":
+        return ["create", f"new_venv_{run}"]
+    if command == "activate":
+        return ["activate", f"venv_{run % size}"]
+    if command == "prune":
+        for i in range(max(size // 10, 1)):
+            _make_fake_environment(os.path.join(envs_path, ".temp", f"temp_venv_bench_{i}"))
+    if command == "remove":
+        name = f"remove_venv_{run}"
+        _make_fake_environment(os.path.join(envs_path, name))
+        return ["remove", name]
+    return command.split()
+
+
+def _time_command(args, cwd):
+    """Runs manven as a new process and returns the wall time in seconds."""
+    env = dict(os.environ)
+    env["PATH"] = f"{path_to_fakebin}{os.pathsep}{env.get('PATH', '')}"
+    env["PYTHONPATH"] = path_to_repo
+    env.pop("VIRTUAL_ENV", None)
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, path_to_main, *args],
+        cwd=cwd, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    duration = time.perf_counter() - start
+    if output.returncode not in (0, SOURCE_EXIT_CODE):
+        raise RuntimeError(f"manven {' '.join(args)} failed: {output.stderr.decode()}")
+    return duration
+
+
+def _make_fake_environment(path_to_venv):
+    """Creates the layout of an environment (as the fake virtualenv does)."""
+    os.makedirs(os.path.join(path_to_venv, "bin"), exist_ok=True)
+    for script in ["activate", "activate.fish", "activate.csh"]:
+        with open(os.path.join(path_to_venv, "bin", script), 'w') as f:
+            f.write(f"VIRTUAL_ENV={path_to_venv}\n")
+    with open(os.path.join(path_to_venv, "pyvenv.cfg"), 'w') as f:
+        f.write("implementation = CPython\nversion_info = 3.8.0.final.0\n")
+
+
+def _get_commit():
+    """Returns the current commit of the repository (or ``unknown``)."""
+    try:
+        output = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=path_to_repo, capture_output=True)
+    except FileNotFoundError:
+        return "unknown"
+    return output.stdout.decode().strip() or "unknown"
+
+
+if __name__ == "__main__":
+    main()
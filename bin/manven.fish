@@ -3,8 +3,17 @@
 # Get path to files
 set MANVEN_PATH (python3 -m manven)
 
-# Run the command
-python3 $MANVEN_PATH/cli.py $argv
+# Run the command, the session is identified by the pid of the shell
+env MANVEN_SESSION=$fish_pid python3 $MANVEN_PATH/main.py $argv
 
-# Source anything that needs to be sourced
-source $MANVEN_PATH/.to_execute.sh
+# Source anything that needs to be sourced (see manven.state.get_runtime_dir)
+if test -n "$XDG_RUNTIME_DIR"
+    set MANVEN_RUNTIME_DIR $XDG_RUNTIME_DIR/manven
+else if test -n "$TMPDIR"
+    set MANVEN_RUNTIME_DIR $TMPDIR/manven-(id -u)
+else
+    set MANVEN_RUNTIME_DIR /tmp/manven-(id -u)
+end
+if test -f $MANVEN_RUNTIME_DIR/$fish_pid.sh
+    source $MANVEN_RUNTIME_DIR/$fish_pid.sh
+end
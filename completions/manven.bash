@@ -0,0 +1,31 @@
+# bash completion for manven (source this file from your .bashrc)
+#
+# Completions are read from the files kept up to date by manven: the commands from ~/.cache/manven/completions,
+# without starting python, and the environments from <ENVS_PATH>/.manven/completions, where ENVS_PATH is
+# resolved by `manven get path` (which uses the cached config) like for any other command.
+
+_manven() {
+    local cur=${COMP_WORDS[COMP_CWORD]}
+    local completions_file=${XDG_CACHE_HOME:-$HOME/.cache}/manven/completions
+    local kinds kind name description
+    COMPREPLY=()
+    if [ "$COMP_CWORD" -eq 1 ]; then
+        kinds=" command "
+    else
+        case ${COMP_WORDS[1]} in
+            activate|remove|dedupe)
+                kinds=" env temp "
+                completions_file=$(manven get path 2>/dev/null)/.manven/completions
+                ;;
+            *) return 0 ;;
+        esac
+    fi
+    [ -r "$completions_file" ] || return 0
+    while IFS=$'\t' read -r kind name description; do
+        if [[ $kinds == *" $kind "* && $name == "$cur"* ]]; then
+            COMPREPLY+=("$name")
+        fi
+    done < "$completions_file"
+}
+
+complete -F _manven manven smanven
@@ -0,0 +1,29 @@
+# fish completion for manven (copy or symlink to ~/.config/fish/completions/)
+#
+# Completions are read from the files kept up to date by manven: the commands from ~/.cache/manven/completions,
+# without starting python, and the environments from <ENVS_PATH>/.manven/completions, where ENVS_PATH is
+# resolved by `manven get path` (which uses the cached config) like for any other command.
+
+function __manven_complete
+    set -l cache_home $HOME/.cache
+    if set -q XDG_CACHE_HOME[1]; and test -n "$XDG_CACHE_HOME"
+        set cache_home $XDG_CACHE_HOME
+    end
+    set -l completions_file $cache_home/manven/completions
+    if not contains -- command $argv
+        set completions_file (manven get path 2>/dev/null)/.manven/completions
+    end
+    test -r $completions_file; or return
+    while read -l line
+        set -l fields (string split \t -- $line)
+        if contains -- $fields[1] $argv
+            printf '%s\t%s\n' $fields[2] "$fields[3]"
+        end
+    end < $completions_file
+end
+
+for command in manven smanven
+    complete -c $command -f
+    complete -c $command -n __fish_use_subcommand -a '(__manven_complete command)'
+    complete -c $command -n '__fish_seen_subcommand_from activate remove dedupe' -a '(__manven_complete env temp)'
+end
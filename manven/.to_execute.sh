@@ -0,0 +1 @@
+source /root/package/tests/.tmp/.requirements/5e430546d612b812/bin/activate
\ No newline at end of file
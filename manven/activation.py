@@ -0,0 +1,123 @@
+import os
+import time
+
+from manven.state import write_execute_to_file, update_last_activated_environment, read_last_activated_environment
+from manven.toolbox import get_activate_script_name
+from manven.settings import ENVS_PATH
+from manven.tracing import traced
+from manven.index import update_index, get_index_name
+
+
+@traced()
+def activate_environment(environment_name, basefolder=ENVS_PATH):
+    """
+    Activates an existing environment.
+
+    Args:
+        environment_name (str): The name of the environment.
+        basefolder (str): The folder to contain the environment.
+    """
+    if not has_environment(environment_name, basefolder=basefolder):
+        raise ValueError(f"Environment {environment_name} does not exist")
+    python = os.path.join(get_absolute_path(environment_name, basefolder=basefolder), "bin", "python")
+    if os.path.lexists(python) and not os.path.exists(python):
+        raise ValueError(
+            f"The interpreter of {environment_name} ({os.path.realpath(python)}) does not exist anymore, "
+            "see `manven doctor --fix`"
+        )
+
+    # Get the path to the activate script, based on the shell
+    activate_script = get_activate_script_path(environment_name, basefolder=basefolder)
+
+    # Source the activate file
+    args = ["source", activate_script]
+    write_execute_to_file(args)
+
+    # Update last activated environment
+    update_last_activated_environment(environment_name, basefolder)
+    index_name = get_index_name(get_absolute_path(environment_name, basefolder=basefolder))
+    if index_name is not None:
+        update_index(index_name, last_activated=time.time())
+
+
+def deactivate_environment():
+    """
+    Deactivates the current environment (if there is one).
+    """
+    args = ["deactivate"]
+    write_execute_to_file(args)
+
+
+def open_last_environment():
+    """
+    Activates the last activated environment by writing to a file.
+    """
+    last_environment = read_last_activated_environment()
+    if last_environment is None:
+        print("No environment has been activated yet")
+        return
+
+    environment_name, basefolder = last_environment
+    activate_environment(environment_name, basefolder=basefolder)
+
+
+def is_environment(environment_name, basefolder=ENVS_PATH):
+    """
+    Checks if the environment name is an existing environment.
+
+    This is done by checking if ``bin/activate`` exists in the folder.
+
+    Args:
+        environment_name (str): The name of the environment.
+        basefolder (str): The folder to contain the environment.
+
+    Returns:
+        bool: If the environment exists.
+    """
+    activate_script = get_activate_script_path(environment_name, basefolder=basefolder)
+
+    return os.path.exists(activate_script)
+
+
+def get_activate_script_path(environment_name, basefolder=ENVS_PATH):
+    """
+    Gets the absolute path to the activate script for a given environment.
+
+    Args:
+        environment_name (str): The name of the environment.
+        basefolder (str): The folder to contain the environment.
+
+    Returns:
+        str: The path.
+    """
+    # Get the path to the activate script, based on the shell
+    path_to_venv = get_absolute_path(environment_name, basefolder=basefolder)
+    activate_script = os.path.join(path_to_venv, "bin", get_activate_script_name())
+    return activate_script
+
+
+def get_absolute_path(environment_name, basefolder=ENVS_PATH):
+    """
+    Gets the absolute path to where the environment folder should be,
+    based on the user settings.
+
+    Args:
+        environment_name (str): The name of the environment.
+        basefolder (str): The folder to contain the environment.
+    """
+    return os.path.join(basefolder, environment_name)
+
+
+def has_environment(environment_name, basefolder=ENVS_PATH):
+    """
+    Checks if the environment already exists.
+
+    Args:
+        environment_name (str): The name of the environment.
+        basefolder (str): The folder to contain the environment.
+
+    Returns:
+        bool: Whether the environment exists.
+    """
+    path_to_venv = get_absolute_path(environment_name, basefolder=basefolder)
+    return os.path.exists(path_to_venv)
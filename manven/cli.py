@@ -1,14 +1,42 @@
+import os
+import sys
+import json
+import time
 import click
+from datetime import datetime
 import manven
 from manven.commands import create_environment, activate_environment, list_environments,\
     remove_environment, deactivate_environment, reset_to_execute, check_first_usage,\
-    activate_temp_environment, prune_temp_environments, open_last_environment
-from manven.settings import ENVS_PATH, DEFAULT_PKGS
+    activate_temp_environment, prune_temp_environments, open_last_environment, has_to_execute,\
+    fill_pool, drain_pool, pool_status, create_template, list_templates, remove_template, build_wheelhouse,\
+    activate_requirements_environment, deduplicate_environments, get_environments_disk_usage,\
+    evict_temp_environments, create_environment_in_background, wait_for_environment, snapshot_environment,\
+    restore_environment, diagnose, queue_rebuild, sync_default_packages
+from manven.jobs import is_pending, list_jobs, clear_jobs, QUEUED, RUNNING, FAILED
+from manven.pool import get_pool_key, spawn_replenisher
+from manven.index import rebuild_index
+from manven.manifest import load_manifest, apply_manifest
+from manven.shell import get_init_script, SHELLS, SOURCE_EXIT_CODE
+from manven.state import get_runtime_dir, cleanup_stale_sessions
+from manven.tracing import enable as enable_tracing, is_enabled as is_tracing_enabled
+from manven.completion import read_completions, update_commands, COMMAND
+from manven.trash import spawn_trash_worker, empty_trash, list_trash, is_emptying
+from manven.toolbox import format_size
+from manven.wheelhouse import get_stats, list_abi_tags, get_wheelhouse_path
+from manven.settings import ENVS_PATH, DEFAULT_PKGS, POOL_SIZE, explain_config
 
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 
 
+def _enable_tracing(ctx, param, value):
+    if value and not is_tracing_enabled():
+        enable_tracing()
+
+
 @click.group(context_settings=CONTEXT_SETTINGS)
+@click.option("--trace", is_flag=True, expose_value=False, is_eager=True, callback=_enable_tracing,
+              help="Write the timing of each phase as JSON lines to stderr "
+                   "(set MANVEN_TRACE to a path to write to a file instead).")
 def cli():
     """Command line interface for managing virtual python environments."""
     pass
@@ -30,7 +58,15 @@ clone_op = click.option(
     "--clone",
     type=str,
     default=None,
-    help="Clone an existing environment instead of creating a fresh one (requires virtualenv-clone).",
+    help="Clone an existing environment instead of creating a fresh one.",
+)
+
+template_op = click.option(
+    "--from-template",
+    "template",
+    type=str,
+    default=None,
+    help="Materialize the environment from a template (see the template command) instead of creating a fresh one.",
 )
 
 default_pkgs_op = click.option(
@@ -42,6 +78,20 @@ default_pkgs_op = click.option(
          "Overrides what is in the config file.",
 )
 
+background_op = click.option(
+    "-b", "--background",
+    is_flag=True,
+    help="Build the environment in a detached process and return directly (see the jobs and wait commands).",
+)
+
+requirements_op = click.option(
+    "-r", "--requirements",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="Activate an environment satisfying a requirements file, "
+         "reusing the one created for the same requirements if it exists.",
+)
+
 include_all = click.option(
     "-a",
     "--all",
@@ -108,9 +158,12 @@ def version():
 ###########
 
 @cli.command()
-@environment_name_arg
+@click.argument('environment_name', type=str, required=False)
 @new_op
 @clone_op
+@template_op
+@requirements_op
+@background_op
 @default_pkgs_op
 @virtualenv_ops
 def activate(
@@ -118,23 +171,99 @@ def activate(
     *args,
     new=False,
     clone=None,
+    template=None,
+    requirements=None,
+    background=False,
     install=DEFAULT_PKGS,
     **virtualenv_ops
 ):
     """
     Activates (and creates if not exists) a virtual environment.
+
+    With --requirements the environment is instead identified by the requirements it satisfies.
+    With --background an environment which does not exist is built in the background and not activated,
+    activating it later waits for the build to finish.
     """
-    create_environment(
+    cleanup_stale_sessions()
+    if requirements is not None:
+        if environment_name is not None or new or clone is not None or template is not None or background:
+            raise click.UsageError(
+                "--requirements cannot be combined with a name, --new, --clone, --from-template or --background"
+            )
+        _activate_requirements(requirements, install, virtualenv_ops)
+        return
+    if environment_name is None:
+        raise click.UsageError("Missing argument 'ENVIRONMENT_NAME' (or --requirements)")
+    _check_template_options(template, virtualenv_ops)
+    if background and _create_in_background(
+        environment_name, replace=new, clone=clone, template=template, default_pkgs=install, **virtualenv_ops
+    ):
+        return
+    _wait_for_build(environment_name)
+    clone_stats = create_environment(
         environment_name,
         *args,
         replace=new,
         clone=clone,
+        template=template,
         default_pkgs=install,
         **virtualenv_ops
     )
+    _report_clone(clone_stats)
+    if new:
+        spawn_trash_worker()
     activate_environment(environment_name)
 
 
+def _check_template_options(template, virtualenv_ops):
+    """Refuses virtualenv options for an environment materialized from a template, which would be ignored."""
+    if template is not None and any(virtualenv_ops.values()):
+        options = ', '.join(f"--{name.replace('_', '-')}" for name, value in virtualenv_ops.items() if value)
+        raise click.UsageError(f"--from-template cannot be combined with virtualenv options ({options})")
+
+
+def _report_clone(clone_stats):
+    """Prints the throughput of a clone (to stderr), if one was made."""
+    if clone_stats is None:
+        return
+    seconds = max(clone_stats["seconds"], 1e-6)
+    click.echo(
+        f"Cloned {clone_stats['files']} files ({format_size(clone_stats['bytes'])}) in {seconds:.2f}s: "
+        f"{clone_stats['files'] / seconds:.0f} files/s, {clone_stats['bytes'] / seconds / 1024 ** 2:.1f} MB/s",
+        err=True,
+    )
+
+
+def _create_in_background(environment_name, **kwargs):
+    """Queues the creation of an environment, returns whether it was queued (False if it exists)."""
+    try:
+        queued = create_environment_in_background(environment_name, **kwargs)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    if queued:
+        click.echo(f"Building {environment_name} in the background, "
+                   f"see `manven jobs` or `manven wait {environment_name}`")
+    return queued
+
+
+def _wait_for_build(environment_name):
+    """Waits for an environment if it's being built in the background."""
+    if not is_pending(environment_name):
+        return
+    click.echo(f"Waiting for {environment_name} to be built...", err=True)
+    try:
+        wait_for_environment(environment_name)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+
+def _activate_requirements(requirements, install, virtualenv_ops):
+    """Activates the environment for a requirements file and deletes the evicted ones in the background."""
+    activate_requirements_environment(requirements, default_pkgs=install, **virtualenv_ops)
+    if list_trash():
+        spawn_trash_worker()
+
+
 ##############
 # deactivate #
 ##############
@@ -155,6 +284,8 @@ def deactivate():
 @environment_name_arg
 @new_op
 @clone_op
+@template_op
+@background_op
 @default_pkgs_op
 @virtualenv_ops
 def create(
@@ -162,20 +293,225 @@ def create(
     *args,
     new=False,
     clone=None,
+    template=None,
+    background=False,
     install=DEFAULT_PKGS,
     **virtualenv_ops,
 ):
     """
     Creates (if not exists) a virtual environment but does not activate it.
     """
-    create_environment(
+    _check_template_options(template, virtualenv_ops)
+    if background:
+        _create_in_background(
+            environment_name, replace=new, clone=clone, template=template, default_pkgs=install, **virtualenv_ops
+        )
+        return
+    _wait_for_build(environment_name)
+    clone_stats = create_environment(
         environment_name,
         *args,
         replace=new,
         clone=clone,
+        template=template,
         default_pkgs=install,
         **virtualenv_ops,
     )
+    _report_clone(clone_stats)
+    if new:
+        spawn_trash_worker()
+
+
+########
+# jobs #
+########
+
+@cli.command()
+@click.option("-a", "--all", is_flag=True, help="Include the builds which finished successfully.")
+@click.option("--clear", is_flag=True, help="Remove the finished builds and their logs.")
+def jobs(all=False, clear=False):
+    """
+    Lists the environments being built in the background.
+    """
+    if clear:
+        print(f"Removed {clear_jobs()} finished builds")
+        return
+    for job in list_jobs():
+        if job["state"] not in (QUEUED, RUNNING, FAILED) and not all:
+            continue
+        since = job["started"] if job["state"] == RUNNING else job["finished"] or job["queued"]
+        print(f"{job['name']:<20} {job['state']:<8} {datetime.fromtimestamp(since):%Y-%m-%d %H:%M:%S}  {job['log']}")
+        if job["state"] == FAILED and job["error"]:
+            print(f"    {job['error']}")
+
+
+########
+# wait #
+########
+
+@cli.command()
+@environment_name_arg
+@click.option("-t", "--timeout", type=float, default=None, help="Maximal number of seconds to wait.")
+def wait(environment_name, timeout=None):
+    """
+    Waits for an environment being built in the background.
+    """
+    try:
+        waited = wait_for_environment(environment_name, timeout=timeout)
+    except (RuntimeError, TimeoutError) as e:
+        raise click.ClickException(str(e))
+    if not waited:
+        raise click.ClickException(f"There is no background build of {environment_name}")
+
+
+##########
+# doctor #
+##########
+
+@cli.command()
+@include_all
+@click.option("--fix", is_flag=True, help="Rebuild the broken environments in the background.")
+@click.option("-j", "--jobs", type=int, default=None, help="Number of environments to check in parallel.")
+def doctor(all=False, fix=False, jobs=None):
+    """
+    Checks the interpreter, pip and scripts of the environments.
+    """
+    broken = 0
+    for environment in diagnose(include_temporary=all, jobs=jobs):
+        if not environment["problems"]:
+            continue
+        broken += 1
+        print(f"{environment['name']}:")
+        for problem in environment["problems"]:
+            print(f"    {problem}")
+        if fix and environment["name"].startswith(".temp/"):
+            print("    Not rebuilt since it's temporary, remove it with `manven prune`")
+        elif fix:
+            try:
+                queue_rebuild(environment["name"])
+            except ValueError as e:
+                print(f"    Not rebuilt: {e}")
+            else:
+                print("    Rebuilding in the background, see `manven jobs`")
+    if not broken:
+        print("All environments are healthy")
+    elif not fix:
+        sys.exit(1)
+
+
+#################
+# sync-defaults #
+#################
+
+@cli.command("sync-defaults")
+@include_all
+@click.option("-j", "--jobs", type=int, default=None,
+              help="Number of environments to upgrade in parallel (default the number of CPUs).")
+@click.option("-n", "--dry-run", is_flag=True, help="Only show the outdated environments.")
+def sync_defaults(all=False, jobs=None, dry_run=False):
+    """
+    Installs the default packages (DEFAULT_PKGS) in the environments where they are missing or outdated.
+    """
+    start = time.perf_counter()
+    results = sync_default_packages(include_temporary=all, jobs=jobs, dry_run=dry_run)
+    failed = 0
+    for result in results:
+        if not result["outdated"]:
+            print(f"{result['name']:<20} up to date")
+        elif dry_run:
+            print(f"{result['name']:<20} outdated: {' '.join(result['outdated'])}")
+        elif result["error"] is None:
+            print(f"{result['name']:<20} installed {' '.join(result['outdated'])} in {result['seconds']:.2f}s")
+        else:
+            failed += 1
+            print(f"{result['name']:<20} failed after {result['seconds']:.2f}s: {result['error']}")
+    outdated = sum(1 for result in results if result["outdated"])
+    if dry_run:
+        print(f"{outdated} of {len(results)} environments are outdated")
+    else:
+        print(f"Synced {outdated - failed} of {outdated} outdated environments in {time.perf_counter() - start:.2f}s")
+    if failed:
+        sys.exit(1)
+
+
+############
+# snapshot #
+############
+
+@cli.command()
+@environment_name_arg
+@click.argument('archive', type=click.File('wb'), required=False)
+def snapshot(environment_name, archive=None):
+    """
+    Writes an environment to a compressed archive (default <name>.tar.gz, - for stdout).
+
+    The archive can be restored, also on another machine, with the restore command.
+    """
+    if archive is None:
+        archive = click.open_file(f"{environment_name}.tar.gz", 'wb')
+    start = time.perf_counter()
+    with archive:
+        try:
+            stats = snapshot_environment(environment_name, archive)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    click.echo(f"Wrote {stats['files']} files ({format_size(stats['bytes'])}) to {archive.name} "
+               f"in {time.perf_counter() - start:.2f}s", err=True)
+
+
+###########
+# restore #
+###########
+
+@cli.command()
+@click.argument('archive', type=click.File('rb'))
+@click.option("--as", "environment_name", type=str, default=None,
+              help="Name of the restored environment (default the name of the snapshotted one).")
+def restore(archive, environment_name=None):
+    """
+    Restores an environment from an archive written by the snapshot command (- for stdin), offline.
+    """
+    start = time.perf_counter()
+    with archive:
+        try:
+            restored = restore_environment(archive, environment_name=environment_name)
+        except (ValueError, RuntimeError) as e:
+            raise click.ClickException(str(e))
+    click.echo(f"Restored {restored['name']} ({restored['files']} files, {format_size(restored['bytes'])}) "
+               f"in {time.perf_counter() - start:.2f}s", err=True)
+
+
+#########
+# apply #
+#########
+
+@cli.command()
+@click.argument('manifest', type=click.Path(exists=True, dir_okay=False))
+@click.option("-j", "--jobs", type=int, default=None, help="Number of environments to create concurrently.")
+@click.option("--force", is_flag=True, help="Also replace existing environments which were not created by a manifest.")
+def apply(manifest, jobs=None, force=False):
+    """
+    Creates or updates the environments in a manifest (TOML) file.
+
+    Environments which already match their entry in the manifest are skipped.
+    """
+    try:
+        environments = load_manifest(manifest)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    counts = {"created": 0, "updated": 0, "skipped": 0, "conflict": 0, "failed": 0}
+    results = apply_manifest(environments, jobs=jobs, force=force)
+    for i, (environment_name, action, duration, error) in enumerate(results):
+        counts[action] += 1
+        message = f"[{i + 1}/{len(environments)}] {action} {environment_name} ({duration:.1f}s)"
+        if error is not None:
+            message += f": {error}"
+        print(message, flush=True)
+    print(', '.join(f"{action}: {count}" for action, count in counts.items()))
+    if counts["updated"]:
+        spawn_trash_worker()
+    if counts["failed"] or counts["conflict"]:
+        sys.exit(1)
 
 
 ##########
@@ -189,6 +525,7 @@ def remove(environment_name):
     Removes a virtual environment and deactivates it if it is activated.
     """
     remove_environment(environment_name)
+    spawn_trash_worker()
 
 
 ########
@@ -206,6 +543,38 @@ def list(all=False):
         print(environment)
 
 
+######
+# du #
+######
+
+@cli.command()
+@include_all
+@click.option("--sort", type=click.Choice(["name", "size", "age"]), default="name",
+              help="Sort by name, size (largest first) or age (least recently activated first).")
+@click.option("--json", "as_json", is_flag=True, help="Print the report as JSON.")
+@click.option("-j", "--jobs", type=int, default=None, help="Number of environments to walk in parallel.")
+def du(all=False, sort="name", as_json=False, jobs=None):
+    """
+    Shows the disk usage, number of files and last activation time of each environment.
+    """
+    environments = get_environments_disk_usage(include_temporary=all, jobs=jobs)
+    if sort == "size":
+        environments.sort(key=lambda environment: environment["size"], reverse=True)
+    elif sort == "age":
+        environments.sort(key=lambda environment: environment["last_activated"] or 0)
+    if as_json:
+        print(json.dumps(environments, indent=2))
+        return
+    for environment in environments:
+        last_activated = environment["last_activated"]
+        if last_activated is None:
+            last_activated = "never"
+        else:
+            last_activated = datetime.fromtimestamp(last_activated).strftime("%Y-%m-%d %H:%M")
+        print(f"{format_size(environment['size']):>10} {environment['files']:>8} files  "
+              f"{last_activated:<16}  {environment['name']}")
+
+
 ########
 # temp #
 ########
@@ -213,9 +582,11 @@ def list(all=False):
 @cli.command()
 @default_pkgs_op
 @clone_op
+@requirements_op
 @virtualenv_ops
 def temp(
     clone=None,
+    requirements=None,
     install=DEFAULT_PKGS,
     **virtualenv_ops
 ):
@@ -223,12 +594,22 @@ def temp(
     Creates and activates a temporary environment.
 
     Temporary environments can be pruned with the ``prune`` command.
+    With --requirements an environment created for the same requirements is reused instead.
     """
-    activate_temp_environment(
+    if requirements is not None:
+        if clone is not None:
+            raise click.UsageError("--requirements cannot be combined with --clone")
+        _activate_requirements(requirements, install, virtualenv_ops)
+        return
+    temp_env_name = activate_temp_environment(
         default_pkgs=install,
         clone=clone,
         **virtualenv_ops
     )
+    if POOL_SIZE > 0:
+        spawn_replenisher()
+    if evict_temp_environments(keep=[temp_env_name]):
+        spawn_trash_worker()
 
 
 #########
@@ -236,11 +617,217 @@ def temp(
 #########
 
 @cli.command()
-def prune():
+@click.option("--evict", is_flag=True,
+              help="Only remove the least recently activated temporary environments exceeding "
+                   "TEMP_TTL, TEMP_MAX_BYTES or TEMP_MAX_COUNT (never the active one).")
+def prune(evict=False):
     """
     Prunes (removes) all temporary environments.
     """
-    prune_temp_environments()
+    if evict:
+        evicted = evict_temp_environments()
+        for environment_name in evicted:
+            print(f"Evicted {environment_name}")
+    else:
+        prune_temp_environments()
+    spawn_trash_worker()
+
+
+############
+# template #
+############
+
+@cli.group()
+def template():
+    """
+    Manages templates from which environments can be materialized quickly.
+    """
+
+
+@template.command("create")
+@click.argument('template_name', type=str)
+@new_op
+@default_pkgs_op
+@virtualenv_ops
+def create_template_command(
+    template_name,
+    new=False,
+    install=DEFAULT_PKGS,
+    **virtualenv_ops
+):
+    """
+    Creates a template environment.
+    """
+    create_template(
+        template_name,
+        replace=new,
+        default_pkgs=install,
+        **virtualenv_ops
+    )
+
+
+@template.command("list")
+def list_templates_command():
+    """
+    Lists all available templates.
+    """
+    for template_name in list_templates():
+        print(template_name)
+
+
+@template.command("remove")
+@click.argument('template_name', type=str)
+def remove_template_command(template_name):
+    """
+    Removes a template.
+    """
+    remove_template(template_name)
+    spawn_trash_worker()
+
+
+########
+# pool #
+########
+
+@cli.group()
+def pool():
+    """
+    Manages the pool of pre-built temporary environments.
+    """
+
+
+@pool.command()
+def status():
+    """
+    Shows the number of ready environments in each pool.
+    """
+    key = get_pool_key()
+    counts = pool_status()
+    print(f"{key} (configured): {counts.pop(key, 0)}/{POOL_SIZE}")
+    for other_key, count in counts.items():
+        print(f"{other_key}: {count}")
+
+
+@pool.command()
+@click.option("-s", "--size", type=int, default=POOL_SIZE, help="Number of environments to keep in the pool.")
+def fill(size=POOL_SIZE):
+    """
+    Fills the pool up to the configured size.
+    """
+    fill_pool(size=size)
+
+
+@pool.command()
+def drain():
+    """
+    Removes all the pre-built temporary environments.
+    """
+    drain_pool()
+    spawn_trash_worker()
+
+
+##############
+# wheelhouse #
+##############
+
+@cli.group()
+def wheelhouse():
+    """
+    Manages the local cache of wheels used to install packages offline.
+    """
+
+
+@wheelhouse.command()
+@default_pkgs_op
+@click.option("-p", "--python", type=str, default=None,
+              help="The Python interpreter to build the wheels for (default the one running manven).")
+def build(install=DEFAULT_PKGS, python=None):
+    """
+    Builds wheels for the default packages into the wheelhouse.
+    """
+    print(build_wheelhouse(packages=install, python=python))
+
+
+@wheelhouse.command("status")
+def wheelhouse_status():
+    """
+    Shows the wheelhouses and how many installs were served by them.
+    """
+    for abi_tag in list_abi_tags():
+        wheels = [f for f in os.listdir(get_wheelhouse_path(abi_tag)) if f.endswith(".whl")]
+        print(f"{abi_tag}: {len(wheels)} wheels")
+    stats = get_stats()
+    print(f"hits: {stats['hits']}, misses: {stats['misses']}")
+
+
+#########
+# index #
+#########
+
+@cli.group()
+def index():
+    """
+    Manages the index of the environments.
+    """
+
+
+@index.command()
+def rebuild():
+    """
+    Rebuilds the index by scanning the folder containing the environments.
+    """
+    environments = rebuild_index()
+    print(f"Indexed {len(environments)} environments")
+
+
+#########
+# trash #
+#########
+
+@cli.group()
+def trash():
+    """
+    Manages removed environments which are not yet deleted.
+    """
+
+
+@trash.command("status")
+def trash_status():
+    """
+    Shows the number of entries in the trash.
+    """
+    state = "being emptied" if is_emptying() else "idle"
+    print(f"{len(list_trash())} entries ({state})")
+
+
+@trash.command()
+@click.option("--wait", is_flag=True, help="Delete the entries in this process instead of in the background.")
+@click.option("-j", "--jobs", type=int, default=None, help="Number of threads used for deleting.")
+def empty(wait=False, jobs=None):
+    """
+    Deletes everything in the trash.
+    """
+    if wait:
+        empty_trash(jobs=jobs)
+    else:
+        spawn_trash_worker()
+
+
+##########
+# dedupe #
+##########
+
+@cli.command()
+@click.argument('environment_names', type=str, nargs=-1)
+@click.option("-j", "--jobs", type=int, default=None, help="Number of environments to process in parallel.")
+def dedupe(environment_names, jobs=None):
+    """
+    Hardlinks identical files in the site-packages of environments to a shared store.
+
+    Processes all environments if no names are given.
+    """
+    linked, reclaimed = deduplicate_environments(environment_names=environment_names or None, jobs=jobs)
+    print(f"Linked {linked} files, reclaimed {format_size(reclaimed)}")
 
 
 #########
@@ -274,7 +861,70 @@ def path():
     print(ENVS_PATH)
 
 
-if __name__ == "__main__":
-    check_first_usage()
+@get.command()
+@click.option("--explain", is_flag=True, help="Show which config file was used and how long resolving it took.")
+def config(explain=False):
+    """
+    The resolved settings.
+    """
+    explanation = explain_config()
+    if explain:
+        for file_path in explanation["candidates"]:
+            if file_path == explanation["file"]:
+                status = "used (cached)" if explanation["cached"] else "used (parsed)"
+            elif explanation["file"] is not None and \
+                    explanation["candidates"].index(file_path) > explanation["candidates"].index(explanation["file"]):
+                status = "not checked"
+            else:
+                status = "missing"
+            print(f"{status:<14} {file_path}")
+        if explanation["file"] is None:
+            print("No config file found, using the defaults")
+        print(f"Resolved in {explanation['duration'] * 1000:.2f} ms\n")
+    for key, value in explanation["settings"].items():
+        print(f"{key.upper()}={value}")
+
+
+########
+# init #
+########
+
+@cli.command()
+@click.argument('shell', type=click.Choice(SHELLS))
+def init(shell):
+    """
+    Prints a shell function to be evaluated in the rc file of the shell, e.g.
+
+    eval "$(manven init bash)"
+    """
+    print(get_init_script(shell, get_runtime_dir()), end='')
+    _update_completions()
+    cleanup_stale_sessions()
+
+
+def _update_completions():
+    """Writes the commands to the completion file, the environments are written by the index."""
+    update_commands({name: command.get_short_help_str(limit=60) for name, command in cli.commands.items()})
+
+
+def main():
+    """
+    Runs the CLI.
+
+    Exits with ``SOURCE_EXIT_CODE`` if the command wrote something to be sourced by the shell.
+    """
+    if sys.stdin.isatty() and sys.stdout.isatty():
+        check_first_usage()
     reset_to_execute()
-    cli()
+    if {name for name, _ in read_completions()[COMMAND]} != set(cli.commands):
+        _update_completions()
+    try:
+        cli()
+    except SystemExit as e:
+        if not e.code and has_to_execute():
+            sys.exit(SOURCE_EXIT_CODE)
+        raise
+
+
+if __name__ == "__main__":
+    main()
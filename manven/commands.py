@@ -1,24 +1,53 @@
 import os
+import sys
 import shutil
-from subprocess import run, check_output
+import time
+import uuid
+import fcntl
+from subprocess import PIPE
+from concurrent.futures import ThreadPoolExecutor
 from itertools import count
 
-from manven.toolbox import has_virtualenv, current_env, is_current_temp
-from manven.settings import ENVS_PATH, DEFAULT_PKGS, PIP_INSTALL_FLAGS
-
-_path_to_here = os.path.dirname(os.path.abspath(__file__))
-_to_execute_filename = ".to_execute.sh"
-TO_EXECUTE_FILE = os.path.join(_path_to_here, _to_execute_filename)
-_last_env_filename = ".last_env"
-LAST_ENV = os.path.join(_path_to_here, _last_env_filename)
-
-
+from manven.state import TO_EXECUTE_FILE  # noqa: F401
+from manven.tracing import traced, run
+from manven.state import LAST_ENV, reset_to_execute, has_to_execute, check_first_usage  # noqa: F401
+from manven.toolbox import current_env, is_current_temp, find_binary, read_pyvenv_cfg
+from manven.creation import has_backend, create_virtual_environment
+from manven.activation import activate_environment, get_absolute_path, has_environment, is_environment
+from manven.activation import deactivate_environment, open_last_environment  # noqa: F401
+from manven.settings import ENVS_PATH, DEFAULT_PKGS, PIP_INSTALL_FLAGS, POOL_SIZE, POOL_PYTHON,\
+    REQUIREMENTS_CACHE_SIZE, DEDUPE_AFTER_INSTALL, TEMP_TTL, TEMP_MAX_BYTES, TEMP_MAX_COUNT, CLONE_BACKEND,\
+    CLONE_HARDLINKS
+from manven.relocate import materialize_environment, clone_environment, relocate_environment
+from manven.installers import get_installer
+from manven.snapshot import create_snapshot, restore_snapshot
+from manven.jobs import queue_job, spawn_job_worker, start_job, is_pending, wait_for_job, remove_job, FAILED
+from manven.trash import move_to_trash
+from manven.index import load_index, add_to_index, get_index_name
+from manven.wheelhouse import get_wheelhouse_path, get_environment_abi_tag, format_abi_tag, can_serve,\
+    record_install
+from manven.requirements import get_requirements_path, normalize_requirements, get_requirements_hash,\
+    is_built, mark_built, mark_used, get_evictable_environments, build_lock
+from manven.usage import get_disk_usage
+from manven.doctor import diagnose_environments
+from manven.outdated import get_outdated
+from manven.eviction import select_evictions
+from manven.store import dedupe_environment, dedupe_environments, gc_store
+from manven.pool import get_pool_key, get_pool_path, list_pool_keys, list_ready_environments,\
+    claim_environment, building_marker, pool_lock
+
+_temp_counter_filename = ".counter"
+CLONE_BACKENDS = ["native", "virtualenv-clone"]
+
+
+@traced()
 def create_environment(
     environment_name,
     replace=False,
     clone=None,
     default_pkgs=DEFAULT_PKGS,
     pip_install_flags=PIP_INSTALL_FLAGS,
+    template=None,
     **virtualenv_ops
 ):
     """
@@ -29,49 +58,160 @@ def create_environment(
         replace (bool): Whether to replace an existing environment with the same name
             with a fresh one. (default: False)
         clone (str, optional): Whether to clone from an existing environment instead of creating a new one.
+        template (str, optional): Whether to materialize the environment from a template (see ``create_template``)
+            instead of creating a new one. The packages which the template is missing (or has at other versions)
+            are installed afterwards, virtualenv options cannot be given since the template is already created.
         virtualenv_ops: Additional arguments passed to virtualenv.
+
+    Returns:
+        dict: When cloned with the native backend, the number of ``files`` and ``bytes`` copied
+            and the ``seconds`` it took, otherwise None.
     """
-    # Check if virtualenv is installed and in the PATH
-    if not has_virtualenv():
+    if template is not None:
+        if clone is not None:
+            raise ValueError("Cannot both clone an environment and use a template.")
+        if any(virtualenv_ops.values()):
+            raise ValueError("Cannot pass virtualenv options when using a template.")
+        if not has_environment(template, basefolder=_get_templates_path()):
+            raise ValueError(f"Template {template} does not exist")
+    # Check if virtualenv is installed (or the configured backend is available)
+    elif not has_backend():
         raise SystemError("virtualenv is not installed or is not in the PATH")
 
     # Check if the environment already exists and if it should be replaced
-    if _has_environment(environment_name):
+    if has_environment(environment_name):
         if replace:
-            path_to_venv = _get_absolute_path(environment_name)
-            shutil.rmtree(path_to_venv)
+            path_to_venv = get_absolute_path(environment_name)
+            move_to_trash(path_to_venv)
         else:
             return
 
-    _create_an_environment(
-        environment_name=environment_name,
-        clone=clone,
-        default_pkgs=default_pkgs,
-        pip_install_flags=pip_install_flags,
-        **virtualenv_ops
-    )
+    clone_stats = None
+    if template is not None:
+        path_to_venv = get_absolute_path(environment_name)
+        materialize_environment(get_absolute_path(template, basefolder=_get_templates_path()), path_to_venv)
+        values = read_pyvenv_cfg(path_to_venv)
+        version = values.get("version_info") or values.get("version", '')
+        missing = get_outdated(
+            default_pkgs,
+            get_installer(path_to_venv).list_installed(),
+            python_version='.'.join(version.split('.')[:2]) or None,
+        )
+        _install_packages(environment_name, packages=missing, pip_install_flags=pip_install_flags)
+    else:
+        clone_stats = _create_an_environment(
+            environment_name=environment_name,
+            clone=clone,
+            default_pkgs=default_pkgs,
+            pip_install_flags=pip_install_flags,
+            **virtualenv_ops
+        )
+    add_to_index(get_absolute_path(environment_name))
+    return clone_stats
 
 
-def activate_environment(environment_name, basefolder=ENVS_PATH):
+def create_environment_in_background(
+    environment_name,
+    replace=False,
+    clone=None,
+    default_pkgs=DEFAULT_PKGS,
+    pip_install_flags=PIP_INSTALL_FLAGS,
+    template=None,
+    swap=False,
+    **virtualenv_ops
+):
     """
-    Activates an existing environment.
+    Queues the creation of an environment to a detached worker (see ``run_job``) and returns directly.
+
+    Takes the same arguments as ``create_environment``.
 
     Args:
-        environment_name (str): The name of the environment.
-        basefolder (str): The folder to contain the environment.
+        swap (bool): Whether to build the environment next to the existing one, which is only replaced
+            once the build succeeded (instead of being moved to the trash before building).
+
+    Returns:
+        bool: Whether a job was queued, i.e. False if the environment already exists (and should not be replaced).
     """
-    if not _has_environment(environment_name, basefolder=basefolder):
-        raise ValueError(f"Environment {environment_name} does not exist")
+    if has_environment(environment_name) and not replace and not is_pending(environment_name):
+        return False
+    options = {
+        "replace": replace,
+        "clone": clone,
+        "default_pkgs": list(default_pkgs),
+        "pip_install_flags": list(pip_install_flags),
+        "template": template,
+        "swap": swap,
+        **virtualenv_ops,
+    }
+    queue_job(environment_name, options)
+    try:
+        spawn_job_worker(environment_name)
+    except BaseException:
+        # Otherwise the environment would look pending until the job is considered failed
+        remove_job(environment_name)
+        raise
+    return True
+
+
+@traced()
+def run_job(environment_name):
+    """
+    Creates an environment queued by ``create_environment_in_background``, called by the worker.
 
-    # Get the path to the activate script, based on the shell
-    activate_script = _get_activate_script_path(environment_name, basefolder=basefolder)
+    If the creation fails the partially created environment is moved to the trash.
+
+    Args:
+        environment_name (str): The name of the environment.
+    """
+    path_to_venv = get_absolute_path(environment_name)
+    previous = os.stat(path_to_venv).st_ino if has_environment(environment_name) else None
+    with start_job(environment_name) as options:
+        if options.pop("swap", False):
+            _build_and_swap(environment_name, options)
+            return
+        try:
+            create_environment(environment_name, **options)
+        except BaseException:
+            if has_environment(environment_name) and os.stat(path_to_venv).st_ino != previous:
+                move_to_trash(path_to_venv)
+            raise
+
+
+def _build_and_swap(environment_name, options):
+    """Builds an environment under a hidden name and replaces the existing one with it once built."""
+    build_name = f".{environment_name}.rebuilding-{uuid.uuid4().hex[:8]}"
+    build_path = get_absolute_path(build_name)
+    try:
+        create_environment(build_name, **{**options, "replace": False})
+    except BaseException:
+        if os.path.exists(build_path):
+            move_to_trash(build_path)
+        raise
+    path_to_venv = get_absolute_path(environment_name)
+    if has_environment(environment_name):
+        move_to_trash(path_to_venv)
+    os.rename(build_path, path_to_venv)
+    relocate_environment(path_to_venv, old_prefix=build_path)
+    add_to_index(path_to_venv)
+
+
+def wait_for_environment(environment_name, timeout=None):
+    """
+    Waits for an environment which is being built in the background (returns directly if it's not).
 
-    # Source the activate file
-    args = ["source", activate_script]
-    _write_execute_to_file(args)
+    Args:
+        environment_name (str): The name of the environment.
+        timeout (float, optional): The maximal number of seconds to wait.
 
-    # Update last activated environment
-    _update_last_activated_environment(environment_name, basefolder)
+    Returns:
+        bool: Whether there was a build to wait for.
+    """
+    record = wait_for_job(environment_name, timeout=timeout)
+    if record is None:
+        return False
+    if record["state"] == FAILED:
+        raise RuntimeError(f"Building {environment_name} failed ({record['error']}), see {record['log']}")
+    return True
 
 
 def list_environments(include_temporary=False):
@@ -85,121 +225,593 @@ def list_environments(include_temporary=False):
     Returns:
         list: list of str consisting of the names of the available environments
     """
-    # Get the available environments
-    if os.path.exists(ENVS_PATH):
-        environments = sorted([venv for venv in os.listdir(ENVS_PATH) if _is_environment(venv)])
-    else:
-        environments = []
+    # Get the available environments from the index
+    index = load_index()
+    environments = sorted(venv for venv in index if not venv.startswith(".temp/"))
 
     # Optionally include the temporary environments
     if include_temporary:
-        environments += [f".temp/{venv}" for venv in sorted(_list_temporary_environments())]
+        environments += sorted(venv for venv in index if venv.startswith(".temp/"))
 
     return environments
 
 
+def get_environments_disk_usage(include_temporary=False, jobs=None):
+    """
+    Returns the disk usage of the environments, see ``manven.usage.get_disk_usage``.
+
+    Args:
+        include_temporary (bool): Whether to include temporary environments.
+            (default False).
+        jobs (int, optional): The number of environments to walk in parallel.
+
+    Returns:
+        list: list of dict with the keys ``name``, ``path``, ``size`` (in bytes), ``files`` and ``last_activated``
+            for each environment.
+    """
+    index = load_index()
+    environments = list_environments(include_temporary=include_temporary)
+    paths = [index[name]["path"] for name in environments]
+    usage = get_disk_usage(paths, jobs=jobs)
+    return [
+        {"name": name, "path": path, **usage[path], "last_activated": index[name]["last_activated"]}
+        for name, path in zip(environments, paths)
+    ]
+
+
+@traced()
+def diagnose(include_temporary=False, jobs=None):
+    """
+    Checks the health of the environments, see ``manven.doctor.diagnose_environments``.
+
+    Args:
+        include_temporary (bool): Whether to include temporary environments.
+            (default False).
+        jobs (int, optional): The number of environments to check in parallel.
+
+    Returns:
+        list: list of dict with the keys ``name``, ``path`` and ``problems`` (list of str) for each environment.
+    """
+    index = load_index()
+    environments = list_environments(include_temporary=include_temporary)
+    paths = [index[name]["path"] for name in environments]
+    problems = diagnose_environments(paths, jobs=jobs)
+    return [{"name": name, "path": path, "problems": problems[path]} for name, path in zip(environments, paths)]
+
+
+@traced()
+def sync_default_packages(
+    include_temporary=False,
+    jobs=None,
+    dry_run=False,
+    default_pkgs=DEFAULT_PKGS,
+    pip_install_flags=PIP_INSTALL_FLAGS,
+):
+    """
+    Installs the default packages in the environments where they are missing or outdated.
+
+    The installed versions are read from the ``.dist-info`` folders of each environment
+    (see ``manven.outdated.get_outdated``), such that only the outdated environments run the installer.
+
+    Args:
+        include_temporary (bool): Whether to include temporary environments.
+            (default False).
+        jobs (int, optional): The number of environments to upgrade in parallel (default the number of CPUs).
+        dry_run (bool): Whether to only return the outdated packages, without installing them.
+        default_pkgs (list): The packages which should be installed.
+        pip_install_flags (list): The flags passed to pip when installing the packages.
+
+    Returns:
+        list: list of dict with the keys ``name``, ``outdated`` (the requirements which were not satisfied),
+            ``seconds`` (spent installing) and ``error`` (None if the install succeeded) for each environment.
+    """
+    environments = list_environments(include_temporary=include_temporary)
+    results = []
+    for environment_name in environments:
+        path_to_venv = get_absolute_path(environment_name)
+        values = read_pyvenv_cfg(path_to_venv)
+        version = values.get("version_info") or values.get("version", '')
+        outdated = get_outdated(
+            default_pkgs,
+            get_installer(path_to_venv).list_installed(),
+            python_version='.'.join(version.split('.')[:2]) or None,
+        )
+        results.append({"name": environment_name, "outdated": outdated, "seconds": 0.0, "error": None})
+
+    def upgrade(result):
+        start = time.perf_counter()
+        try:
+            _install_packages(result["name"], result["outdated"], pip_install_flags=pip_install_flags)
+        except (RuntimeError, ValueError) as e:
+            result["error"] = str(e)
+        result["seconds"] = time.perf_counter() - start
+
+    to_upgrade = [result for result in results if result["outdated"]]
+    if to_upgrade and not dry_run:
+        with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+            list(executor.map(upgrade, to_upgrade))
+    return results
+
+
+def queue_rebuild(environment_name):
+    """
+    Queues a fresh build of a (broken) environment in the background, see ``create_environment_in_background``.
+
+    The distributions which were installed from an index are installed again (at the same versions, except pip,
+    setuptools and wheel), with the same python version if it's in the PATH and otherwise the default interpreter.
+    The environment is only replaced once the rebuild succeeded, such that a failed rebuild keeps it as it was.
+
+    Args:
+        environment_name (str): The name of the environment.
+
+    Returns:
+        bool: Whether the rebuild was queued.
+    """
+    path_to_venv = get_absolute_path(environment_name)
+    installed = get_installer(path_to_venv).list_installed(from_index_only=True)
+    packages = [f"{name}=={version}" for name, version in sorted(installed.items())
+                if name not in ("pip", "setuptools", "wheel")]
+    values = read_pyvenv_cfg(path_to_venv)
+    version = values.get("version_info") or values.get("version", '')
+    python = f"python{'.'.join(version.split('.')[:2])}" if version else ''
+    return create_environment_in_background(
+        environment_name,
+        replace=True,
+        swap=True,
+        default_pkgs=packages,
+        python=python if python and find_binary(python) else '',
+    )
+
+
+@traced()
 def activate_temp_environment(
     clone=None,
     basefolder=ENVS_PATH,
     default_pkgs=DEFAULT_PKGS,
     pip_install_flags=PIP_INSTALL_FLAGS,
+    pool_size=POOL_SIZE,
     **virtualenv_ops,
 ):
     """
     Creates and activates a new temporary environment.
+
+    If the pool of pre-built temporary environments (see ``fill_pool``) holds an environment
+    matching the requested interpreter and packages it is claimed instead of creating a new one.
+
+    Args:
+        pool_size (int): The configured size of the pool, the pool is not used if 0.
+
+    Returns:
+        str: The name of the environment in the index (``.temp/<name>``).
     """
     path_to_temp = _get_temp_path()
     temp_env_name = _get_unused_temp_name(path_to_temp)
-    rel_temp_path = os.path.join(os.path.relpath(path_to_temp, start=basefolder), temp_env_name)
-    _create_an_environment(
-        environment_name=rel_temp_path,
-        clone=clone,
+    claimed = False
+    if pool_size > 0 and _can_use_pool(clone, virtualenv_ops):
+        key = get_pool_key(
+            python=virtualenv_ops.get("python") or POOL_PYTHON,
+            default_pkgs=default_pkgs,
+            pip_install_flags=pip_install_flags,
+        )
+        claimed = claim_environment(key, os.path.join(path_to_temp, temp_env_name), basefolder=basefolder)
+    if not claimed:
+        if clone is not None:
+            # Clones are not made into an existing folder, the name stays taken by the counter
+            os.rmdir(os.path.join(path_to_temp, temp_env_name))
+        rel_temp_path = os.path.join(os.path.relpath(path_to_temp, start=basefolder), temp_env_name)
+        try:
+            _create_an_environment(
+                environment_name=rel_temp_path,
+                clone=clone,
+                default_pkgs=default_pkgs,
+                pip_install_flags=pip_install_flags,
+                **virtualenv_ops
+            )
+        except BaseException:
+            _remove_file_or_folder(os.path.join(path_to_temp, temp_env_name))
+            raise
+    add_to_index(os.path.join(path_to_temp, temp_env_name))
+    activate_environment(temp_env_name, basefolder=path_to_temp)
+    return get_index_name(os.path.join(path_to_temp, temp_env_name))
+
+
+@traced()
+def activate_requirements_environment(
+    requirements_file,
+    basefolder=ENVS_PATH,
+    default_pkgs=DEFAULT_PKGS,
+    pip_install_flags=PIP_INSTALL_FLAGS,
+    cache_size=REQUIREMENTS_CACHE_SIZE,
+    **virtualenv_ops,
+):
+    """
+    Activates an environment satisfying a requirements file, creating it only if needed.
+
+    The environments are keyed by a hash of the normalized requirements, the interpreter, the packages and the flags
+    passed to pip, such that an environment created for the same requirements is reused.
+    Only the ``cache_size`` most recently used environments are kept, the others are moved to the trash.
+
+    Args:
+        requirements_file (str): The path to the requirements file.
+        cache_size (int): The number of environments keyed by requirements to keep.
+
+    Returns:
+        str: The key of the environment.
+    """
+    key = get_requirements_hash(
+        normalize_requirements(requirements_file),
+        python=virtualenv_ops.get("python", ''),
         default_pkgs=default_pkgs,
         pip_install_flags=pip_install_flags,
-        **virtualenv_ops
+        virtualenv_ops={option: value for option, value in virtualenv_ops.items() if option != "python"},
     )
-    activate_environment(temp_env_name, basefolder=path_to_temp)
+    requirements_path = get_requirements_path(basefolder=basefolder)
+    with build_lock(key, basefolder=basefolder):
+        if is_built(key, basefolder=basefolder):
+            mark_used(key, basefolder=basefolder)
+        else:
+            if os.path.exists(os.path.join(requirements_path, key)):
+                # Left over from a build which did not finish
+                move_to_trash(os.path.join(requirements_path, key), basefolder=basefolder)
+            _create_an_environment(
+                key,
+                basefolder=requirements_path,
+                default_pkgs=default_pkgs,
+                pip_install_flags=pip_install_flags,
+                **virtualenv_ops
+            )
+            _install_requirements(
+                key,
+                requirements_file,
+                basefolder=requirements_path,
+                pip_install_flags=pip_install_flags,
+            )
+            mark_built(key, basefolder=basefolder)
+    activate_environment(key, basefolder=requirements_path)
+
+    # Never evict the environment which is currently active
+    keep = {key}
+    current = current_env()
+    if current is not None and os.path.dirname(current) == os.path.relpath(requirements_path, start=ENVS_PATH):
+        keep.add(os.path.basename(current))
+    for evicted in get_evictable_environments(cache_size, keep=keep, basefolder=basefolder):
+        move_to_trash(os.path.join(requirements_path, evicted), basefolder=basefolder)
+    return key
 
 
 def prune_temp_environments():
-    """Prunes all temporary environments."""
+    """
+    Prunes all temporary environments.
+
+    The environments are moved to the trash, see ``manven.trash.empty_trash`` for deleting them.
+    """
     if is_current_temp():
         raise RuntimeError("Cannot prune temporary environments when one is currently active ({})"
                            .format(current_env()))
     path_to_temp = _get_temp_path()
     temp_environments = sorted(_list_temporary_environments())
     for temp_environment in temp_environments:
-        _remove_file_or_folder(os.path.join(path_to_temp, temp_environment))
+        move_to_trash(os.path.join(path_to_temp, temp_environment))
+    load_index()
 
 
-def remove_environment(environment_name):
+def evict_temp_environments(ttl=TEMP_TTL, max_bytes=TEMP_MAX_BYTES, max_count=TEMP_MAX_COUNT, keep=()):
     """
-    Removes an existing environment.
+    Evicts the least recently activated temporary environments until they are within the budget.
+
+    The currently active environment is never evicted. The evicted environments are moved to the trash,
+    see ``manven.trash.empty_trash`` for deleting them. Does nothing if no budget is set.
 
     Args:
-        environment_name (str): The name of the environment.
+        ttl (float, optional): The time (in seconds) after which an unused temporary environment is evicted.
+        max_bytes (int, optional): The total size of the temporary environments to keep.
+        max_count (int, optional): The number of temporary environments to keep.
+        keep (iterable): Names (``.temp/<name>``) of other environments which should not be evicted.
+
+    Returns:
+        list: list of str consisting of the names of the evicted environments.
     """
-    if current_env() == environment_name:
-        raise ValueError("Cannot remove the currently activated environment.")
-    if _has_environment(environment_name):
-        path_to_venv = _get_absolute_path(environment_name)
-        shutil.rmtree(path_to_venv)
+    if ttl is None and max_bytes is None and max_count is None:
+        return []
+    index = load_index()
+    names = [name for name in index if name.startswith(".temp/")]
+    environments = [
+        {"name": name, "last_used": index[name]["last_activated"] or index[name]["created"]}
+        for name in names
+    ]
+    if max_bytes is not None:
+        usage = get_disk_usage([index[name]["path"] for name in names])
+        for environment in environments:
+            environment["size"] = usage[index[environment["name"]]["path"]]["size"]
+    keep = set(keep)
+    if current_env() is not None:
+        keep.add(current_env())
+    evicted = select_evictions(
+        environments,
+        now=time.time(),
+        ttl=ttl,
+        max_bytes=max_bytes,
+        max_count=max_count,
+        keep=keep,
+    )
+    for name in evicted:
+        move_to_trash(index[name]["path"])
+    if evicted:
+        load_index()
+    return evicted
 
 
-def deactivate_environment():
+def create_template(
+    template_name,
+    replace=False,
+    default_pkgs=DEFAULT_PKGS,
+    pip_install_flags=PIP_INSTALL_FLAGS,
+    **virtualenv_ops
+):
     """
-    Deactivates the current environment (if there is one).
+    Creates a template environment from which new environments can be materialized.
+
+    Args:
+        template_name (str): The name of the template.
+        replace (bool): Whether to replace an existing template with the same name. (default: False)
+        default_pkgs (list): The packages to install in the template.
+        pip_install_flags (list): The flags passed to pip when installing the packages.
+        virtualenv_ops: Additional arguments passed to virtualenv.
     """
-    args = ["deactivate"]
-    _write_execute_to_file(args)
+    if not has_backend():
+        raise SystemError("virtualenv is not installed or is not in the PATH")
+
+    templates_path = _get_templates_path()
+    if has_environment(template_name, basefolder=templates_path):
+        if replace:
+            move_to_trash(get_absolute_path(template_name, basefolder=templates_path))
+        else:
+            return
+
+    _create_an_environment(
+        environment_name=template_name,
+        basefolder=templates_path,
+        default_pkgs=default_pkgs,
+        pip_install_flags=pip_install_flags,
+        **virtualenv_ops
+    )
 
 
-def open_last_environment():
+def list_templates():
     """
-    Activates the last activated environment by writing to a file.
+    Returns a list of available templates.
+
+    Returns:
+        list: list of str consisting of the names of the available templates
     """
-    if not os.path.exists(LAST_ENV):
-        print("No environment has been activated yet")
-        return
+    templates_path = _get_templates_path()
+    if not os.path.exists(templates_path):
+        return []
+    return sorted(template for template in os.listdir(templates_path)
+                  if is_environment(template, basefolder=templates_path))
 
-    with open(LAST_ENV, 'r') as f:
-        environment_name, basefolder = f.read().split('\n')
-    activate_environment(environment_name, basefolder=basefolder)
 
+def remove_template(template_name):
+    """
+    Removes an existing template.
+
+    Environments materialized from the template are not affected.
 
-def reset_to_execute():
+    Args:
+        template_name (str): The name of the template.
     """
-    Resets what commands that should be executed in the shell.
+    templates_path = _get_templates_path()
+    if has_environment(template_name, basefolder=templates_path):
+        move_to_trash(get_absolute_path(template_name, basefolder=templates_path))
+
+
+@traced()
+def build_wheelhouse(packages=DEFAULT_PKGS, python=None, basefolder=ENVS_PATH):
     """
-    with open(TO_EXECUTE_FILE, 'w'):
-        pass
+    Builds wheels for the given packages (and their dependencies) into the wheelhouse.
 
+    New environments with the same interpreter ABI are then installed offline from the wheelhouse.
+
+    Args:
+        packages (list): List of strings specifying python packages to build wheels for.
+        python (str, optional): The interpreter to build the wheels for (default the current one).
+        basefolder (str): The folder containing the environments.
 
-def check_first_usage():
+    Returns:
+        str: The path to the wheelhouse.
     """
-    Checks if this is the first time manven is run and prints some information.
+    if python is None:
+        python = sys.executable
+        implementation, major, minor = sys.implementation.name, *sys.version_info[:2]
+    else:
+        output = run(
+            [python, "-c", "import sys; print(sys.implementation.name, *sys.version_info[:2])"],
+            stdout=PIPE,
+            check=True,
+        )
+        implementation, major, minor = output.stdout.decode('utf-8').split()
+    wheelhouse_path = get_wheelhouse_path(format_abi_tag(implementation, major, minor), basefolder=basefolder)
+    os.makedirs(wheelhouse_path, exist_ok=True)
+    if packages:
+        _run_assert_output(
+            [python, "-m", "pip", "wheel", "--wheel-dir", wheelhouse_path, *packages],
+            f"Something went wrong when building wheels for {packages}",
+        )
+    return wheelhouse_path
+
+
+@traced()
+def fill_pool(
+    size=POOL_SIZE,
+    python=POOL_PYTHON,
+    default_pkgs=DEFAULT_PKGS,
+    pip_install_flags=PIP_INSTALL_FLAGS,
+    basefolder=ENVS_PATH,
+):
+    """
+    Fills the pool of pre-built temporary environments up to a given size.
+
+    Does nothing if another process is already filling the same pool.
+
+    Args:
+        size (int): The number of ready environments to keep in the pool.
+        python (str): The python interpreter passed to virtualenv.
+        default_pkgs (list): The packages to install in the environments.
+        pip_install_flags (list): The flags passed to pip when installing the packages.
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        int: The number of environments that were built.
+    """
+    key = get_pool_key(python=python, default_pkgs=default_pkgs, pip_install_flags=pip_install_flags)
+    key_path = get_pool_path(key, basefolder=basefolder)
+    built = 0
+    with pool_lock(key_path) as acquired:
+        if not acquired:
+            return built
+        _remove_unfinished_pool_environments(key_path)
+        while len(list_ready_environments(key, basefolder=basefolder)) < size:
+            name = uuid.uuid4().hex[:12]
+            marker = building_marker(key_path, name)
+            with open(marker, 'w'):
+                pass
+            try:
+                _create_an_environment(
+                    environment_name=name,
+                    basefolder=key_path,
+                    default_pkgs=default_pkgs,
+                    pip_install_flags=pip_install_flags,
+                    python=python,
+                )
+            except Exception:
+                _remove_file_or_folder(os.path.join(key_path, name))
+                raise
+            finally:
+                os.remove(marker)
+            built += 1
+    return built
+
+
+def drain_pool(basefolder=ENVS_PATH):
+    """
+    Removes all the pre-built temporary environments.
+
+    Args:
+        basefolder (str): The folder containing the environments.
     """
-    if not os.path.exists(TO_EXECUTE_FILE):
-        input("It looks like it's the first time you're using manven.\n"
-              "Next time you won't see this message.\n"
-              "Since manven sometimes needs to source certain files, "
-              "it is recommended that you add the following alias to your system:\n"
-              "\n"
-              "alias smanven='source $(which manven)'\n"
-              "\n"
-              "If you're using fish, add instead:\n"
-              "\n"
-              "alias smanven 'source (which manven.fish)'\n"
-              "\n"
-              "Press enter to continue...")
+    pool_path = get_pool_path(basefolder=basefolder)
+    if os.path.exists(pool_path):
+        move_to_trash(pool_path, basefolder=basefolder)
 
 
+def pool_status(basefolder=ENVS_PATH):
+    """
+    Returns the number of ready environments in each pool.
+
+    Args:
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        dict: Mapping from the key of a pool to the number of ready environments.
+    """
+    return {key: len(list_ready_environments(key, basefolder=basefolder)) for key in list_pool_keys(basefolder)}
+
+
+@traced()
+def deduplicate_environments(environment_names=None, jobs=None):
+    """
+    Replaces identical files in the site-packages of environments by hardlinks to a shared store.
+
+    See ``manven.store.dedupe_environment``. Files in the store which are not used by any environment
+    anymore are deleted first.
+
+    Args:
+        environment_names (list, optional): The names of the environments (default all environments,
+            including temporary ones, templates and the ones keyed by requirements).
+        jobs (int, optional): The number of environments to process in parallel.
+
+    Returns:
+        tuple: The number of files replaced by hardlinks and the number of bytes reclaimed
+            (including the unused files deleted from the store).
+    """
+    if environment_names is None:
+        paths = [get_absolute_path(name) for name in list_environments(include_temporary=True)]
+        paths += [os.path.join(_get_templates_path(), name) for name in list_templates()]
+        requirements_path = get_requirements_path()
+        if os.path.exists(requirements_path):
+            paths += [os.path.join(requirements_path, key) for key in sorted(os.listdir(requirements_path))
+                      if is_environment(key, basefolder=requirements_path)]
+    else:
+        for environment_name in environment_names:
+            if not has_environment(environment_name):
+                raise ValueError(f"The environment {environment_name} does not exist")
+        paths = [get_absolute_path(name) for name in environment_names]
+    freed = gc_store()
+    linked, reclaimed = dedupe_environments(paths, jobs=jobs)
+    return linked, reclaimed + freed
+
+
+@traced()
+def snapshot_environment(environment_name, fileobj):
+    """
+    Writes a compressed snapshot of an environment, see ``manven.snapshot.create_snapshot``.
+
+    Args:
+        environment_name (str): The name of the environment.
+        fileobj: Binary file-like object to write the archive to.
+
+    Returns:
+        dict: The number of ``files`` and ``bytes`` (uncompressed) written.
+    """
+    if not is_environment(environment_name):
+        raise ValueError(f"Environment {environment_name} does not exist")
+    return create_snapshot(os.path.abspath(get_absolute_path(environment_name)), fileobj)
+
+
+@traced()
+def restore_environment(fileobj, environment_name=None):
+    """
+    Creates an environment from a snapshot (see ``snapshot_environment``) without accessing the network.
+
+    Args:
+        fileobj: Binary file-like object to read the archive from.
+        environment_name (str, optional): The name of the new environment (default the name in the snapshot).
+
+    Returns:
+        dict: The name of the environment and the number of ``files`` and ``bytes`` restored,
+            see ``manven.snapshot.restore_snapshot``.
+    """
+    os.makedirs(ENVS_PATH, exist_ok=True)
+    restored = restore_snapshot(fileobj, os.path.abspath(ENVS_PATH), environment_name=environment_name)
+    add_to_index(get_absolute_path(restored["name"]))
+    return restored
+
+
+def remove_environment(environment_name):
+    """
+    Removes an existing environment.
+
+    The environment is moved to the trash, see ``manven.trash.empty_trash`` for deleting it.
+
+    Args:
+        environment_name (str): The name of the environment.
+    """
+    if current_env() == environment_name:
+        raise ValueError("Cannot remove the currently activated environment.")
+    if has_environment(environment_name):
+        path_to_venv = get_absolute_path(environment_name)
+        move_to_trash(path_to_venv)
+        load_index()
+
+
+@traced()
 def _create_an_environment(
     environment_name,
     clone=None,
     basefolder=ENVS_PATH,
     default_pkgs=DEFAULT_PKGS,
     pip_install_flags=None,
+    clone_backend=CLONE_BACKEND,
     **virtualenv_ops
 ):
     """
@@ -209,19 +821,38 @@ def _create_an_environment(
         environment_name (str): The name of the environment.
         clone (str, optional): Whether to clone from an existing environment instead of creating a new one.
         basefolder (str): The folder to contain the environment.
+        clone_backend (str): One of ``CLONE_BACKENDS``, ``native`` copies the files in parallel in this process
+            (see ``manven.relocate.clone_environment``) and ``virtualenv-clone`` runs ``virtualenv-clone``.
+
+    Returns:
+        dict: The statistics of the clone (see ``manven.relocate.clone_environment``) if cloned natively,
+            otherwise None.
     """
     # Check that basefolder exists, otherwise create it
-    if not os.path.exists(basefolder):
-        os.makedirs(basefolder)
-
-    if clone is not None:
+    os.makedirs(basefolder, exist_ok=True)
+
+    clone_stats = None
+    if clone is not None and clone_backend == "native":
+        if not is_environment(clone, basefolder=basefolder):
+            raise ValueError(f"Cannot clone {clone} since it's not an environment")
+        clone_stats = clone_environment(
+            os.path.abspath(get_absolute_path(clone, basefolder=basefolder)),
+            os.path.abspath(get_absolute_path(environment_name, basefolder=basefolder)),
+            hardlinks=CLONE_HARDLINKS,
+        )
+    elif clone is not None:
+        if clone_backend not in CLONE_BACKENDS:
+            raise ValueError(f"Unknown clone backend {clone_backend}, should be one of {CLONE_BACKENDS}")
         # Clone the environment
         args = ['virtualenv-clone', clone, environment_name]
+        _run_assert_output(
+            args,
+            f"Something went wrong when creating the environment {environment_name}",
+            cwd=basefolder,
+        )
     else:
         # Create the new environment
-        options = _format_options(virtualenv_ops)
-        args = ["virtualenv", *options, environment_name]
-    _run_assert_output(args, f"Something went wrong when creating the environment {environment_name}", cwd=basefolder)
+        create_virtual_environment(get_absolute_path(environment_name, basefolder=basefolder), **virtualenv_ops)
 
     if clone is None:
         _install_packages(
@@ -230,23 +861,35 @@ def _create_an_environment(
             basefolder=basefolder,
             pip_install_flags=pip_install_flags,
         )
+    return clone_stats
 
 
-def _format_options(virtualenv_ops):
-    """Formats the a dictionary of options to be passed as flags to virtualenv."""
-    options = []
-    for option_name, option_value in virtualenv_ops.items():
-        if option_value:  # If True or non-zero length string
-            option = option_name.replace('_', '-')
-            option = f"--{option}"
-            if not isinstance(option_value, bool):  # If it's a True/False flag we simply add the flag, not the value
-                option_value = option_value.replace('=', '')
-                option += f"={option_value}"
-            options.append(option)
-    return options
+def _can_use_pool(clone, virtualenv_ops):
+    """Checks if a temporary environment with the given options can be claimed from the pool."""
+    if clone is not None:
+        return False
+    python = virtualenv_ops.get("python")
+    if python and python != POOL_PYTHON:
+        return False
+    return not any(value for name, value in virtualenv_ops.items() if name != "python")
+
+
+def _remove_unfinished_pool_environments(key_path):
+    """Removes pooled environments whose build was interrupted (should be called with the pool lock held)."""
+    for entry in os.listdir(key_path):
+        if entry.endswith(".building"):
+            _remove_file_or_folder(os.path.join(key_path, entry[:-len(".building")]))
+            _remove_file_or_folder(os.path.join(key_path, entry))
 
 
-def _install_packages(environment_name, packages, basefolder=ENVS_PATH, pip_install_flags=None):
+@traced()
+def _install_packages(
+    environment_name,
+    packages,
+    basefolder=ENVS_PATH,
+    pip_install_flags=None,
+    dedupe=DEDUPE_AFTER_INSTALL,
+):
     """
     Installs packages to an environment.
 
@@ -254,80 +897,85 @@ def _install_packages(environment_name, packages, basefolder=ENVS_PATH, pip_inst
         environment_name (str): The name of the environment.
         packages (list): List of strings specifying python packages to install
         basefolder (str): The folder to contain the environment.
+        dedupe (bool): Whether to hardlink the installed files to identical ones in the store afterwards.
     """
     if not packages:
         return
-    pip = os.path.join(basefolder, environment_name, "bin", "pip")
-    if not os.path.exists(pip):
+    if not is_environment(environment_name, basefolder=basefolder):
         raise ValueError(f"Environment {environment_name} at {basefolder} does not exist.")
 
+    path_to_venv = os.path.join(basefolder, environment_name)
     if pip_install_flags is None:
         pip_install_flags = []
-    _run_assert_output(
-        [pip, "install", *pip_install_flags, *packages],
-        f"Something went wrong when installing {packages}",
-    )
-
-    if "manven" in packages:
-        # Add the to execute file such that the first time text is not printed when using manven
-        python = os.path.join(basefolder, environment_name, "bin", "python")
-        args = [python, "-m", "manven"]
-        output = check_output(args).decode('utf-8').strip()
-        venv_to_execute_file = os.path.join(output, _to_execute_filename)
-        _run_assert_output(
-            ["touch", venv_to_execute_file],
-            "Something went wrong when adding the file {}".format(TO_EXECUTE_FILE),
-        )
-
-
-def _write_execute_to_file(args):
-    """Writes (w mode) commands to be executed to a file."""
-    with open(TO_EXECUTE_FILE, 'w') as f:
-        f.write(' '.join(args))
-
-
-def _list_temporary_environments():
-    """
-    Returns a list of the current temporary environments.
+    if not _install_from_wheelhouse(path_to_venv, packages, pip_install_flags):
+        get_installer(path_to_venv, pip_install_flags).install(packages, pip_install_flags)
 
-    Returns:
-        list: list of str consisting of the names of the temporary environments.
-    """
-    temp_path = _get_temp_path()
-    if os.path.exists(temp_path):
-        return [venv for venv in os.listdir(temp_path) if _is_environment(venv, basefolder=temp_path)]
-    else:
-        return []
+    if dedupe:
+        dedupe_environment(path_to_venv)
 
 
-def _update_last_activated_environment(environment_name, basefolder):
+@traced()
+def _install_requirements(
+    environment_name,
+    requirements_file,
+    basefolder=ENVS_PATH,
+    pip_install_flags=None,
+    dedupe=DEDUPE_AFTER_INSTALL,
+):
     """
-    Updates the last activated environment by writing to a file.
+    Installs the packages in a requirements file to an environment.
 
     Args:
         environment_name (str): The name of the environment.
+        requirements_file (str): The path to the requirements file.
         basefolder (str): The folder to contain the environment.
+        dedupe (bool): Whether to hardlink the installed files to identical ones in the store afterwards.
     """
-    with open(LAST_ENV, 'w') as f:
-        f.write(f"{environment_name}\n{basefolder}")
+    if not is_environment(environment_name, basefolder=basefolder):
+        raise ValueError(f"Environment {environment_name} at {basefolder} does not exist.")
 
+    path_to_venv = os.path.join(basefolder, environment_name)
+    if pip_install_flags is None:
+        pip_install_flags = []
+    get_installer(path_to_venv, pip_install_flags).install_requirements(requirements_file, pip_install_flags)
 
-def _is_environment(environment_name, basefolder=ENVS_PATH):
-    """
-    Checks if the environment name is an existing environment.
+    if dedupe:
+        dedupe_environment(path_to_venv)
 
-    This is done by checking if ``bin/activate`` exists in the folder.
 
-    Args:
-        environment_name (str): The name of the environment.
-        basefolder (str): The folder to contain the environment.
+@traced()
+def _install_from_wheelhouse(path_to_venv, packages, pip_install_flags):
+    """
+    Tries to install packages offline from the wheelhouse.
 
     Returns:
-        bool: If the environment exists.
+        bool: Whether the packages were installed.
+    """
+    abi_tag = get_environment_abi_tag(path_to_venv)
+    installed = False
+    if abi_tag is not None and can_serve(packages, abi_tag):
+        flags = ["--no-index", "--find-links", get_wheelhouse_path(abi_tag), *pip_install_flags]
+        try:
+            get_installer(path_to_venv, flags).install(packages, flags)
+            installed = True
+        except RuntimeError:
+            pass
+    record_install(hit=installed)
+    return installed
+
+
+def _list_temporary_environments():
     """
-    activate_script = _get_activate_script_path(environment_name, basefolder=basefolder)
+    Returns a list of the current temporary environments.
 
-    return os.path.exists(activate_script)
+    Returns:
+        list: list of str consisting of the names of the temporary environments.
+    """
+    temp_path = _get_temp_path()
+    if os.path.exists(temp_path):
+        return [venv for venv in os.listdir(temp_path) if is_environment(venv, basefolder=temp_path)]
+    else:
+        return []
 
 
 def _run_assert_output(args, message, **kwargs):
@@ -339,116 +987,64 @@ def _run_assert_output(args, message, **kwargs):
         raise RuntimeError(f"{message}: (" + ' '.join(args) + ')')
 
 
-def _get_activate_script_path(environment_name, basefolder=ENVS_PATH):
+def _get_temp_path():
     """
-    Gets the absolute path to the activate script for a given environment.
-
-
-    Args:
-        environment_name (str): The name of the environment.
-        basefolder (str): The folder to contain the environment.
+    Returns the path to where the temporary environments are stored.
 
     Returns:
-        bool: If the environment exists.
-    """
-    # Get the path to the activate script, based on the shell
-    path_to_venv = _get_absolute_path(environment_name, basefolder=basefolder)
-    activate_script = os.path.join(path_to_venv, "bin", _get_activate_script_name())
-    return activate_script
-
-
-def _get_activate_script_name():
+        str: The path
     """
-    Gets the name of the activate script based on what's the current shell is.
-
-    Returns:
-        str: The name of the file.
-    """
-    # Get the current shell
-    shell = _get_current_shell()
-
-    shell_to_script_name = {
-        "sh": "activate",
-        "bash": "activate",
-        "zsh": "activate",
-        "dash": "activate",
-        "csh": "activate.csh",
-        "fish": "activate.fish",
-    }
+    temp_path = os.path.join(ENVS_PATH, ".temp")
 
-    script_name = shell_to_script_name.get(shell)
-    if script_name is None:
-        raise ValueError("Unknown shell {shell}")
+    # Create the path if it does not exist
+    os.makedirs(temp_path, exist_ok=True)
 
-    return script_name
+    return temp_path
 
 
-def _get_current_shell():
+def _get_templates_path():
     """
-    Returns the current shell set by the environment variable $SHELL.
+    Returns the path to where the template environments are stored.
 
     Returns:
-        str: The name of the current shell.
+        str: The path
     """
-    if 'SHELL' not in os.environ:
-        # default to bash
-        return 'bash'
-    return os.environ['SHELL'].split('/')[-1]
-
+    return os.path.join(ENVS_PATH, ".templates")
 
-def _get_absolute_path(environment_name, basefolder=ENVS_PATH):
-    """
-    Gets the absolute path to where the environment folder should be,
-    based on the user settings.
 
-    Args:
-        environment_name (str): The name of the environment.
-        basefolder (str): The folder to contain the environment.
+def _get_unused_temp_name(path_to_temp):
     """
-    return os.path.join(basefolder, environment_name)
+    Claims a new unused name for a temporary environment.
 
-
-def _has_environment(environment_name, basefolder=ENVS_PATH):
-    """
-    Checks if the environment already exists.
+    The next number is taken from a counter file (protected by a lock) and the name is claimed by
+    creating an empty folder for it, such that concurrent calls never get the same name.
 
     Args:
-        environment_name (str): The name of the environment.
-        basefolder (str): The folder to contain the environment.
-
-    Returns:
-        bool: Whether the environment exists.
-    """
-    path_to_venv = _get_absolute_path(environment_name, basefolder=basefolder)
-    return os.path.exists(path_to_venv)
-
-
-def _get_temp_path():
-    """
-    Returns the path to where the temporary environments are stored.
+        path_to_temp (str): The folder containing the temporary environments.
 
     Returns:
-        str: The path
-    """
-    temp_path = os.path.join(ENVS_PATH, ".temp")
-
-    # Create the path if it does not exist
-    if not os.path.exists(temp_path):
-        os.makedirs(temp_path)
-
-    return temp_path
-
-
-def _get_unused_temp_name(path_to_temp):
-    """
-    Get a new unused name for a temporary environment.
+        str: The name, the folder with this name exists and is empty.
     """
-    # Find an unused name
-    for i in count():
-        temp_env_name = f"temp_venv_{i}"
-        new_path = os.path.join(path_to_temp, temp_env_name)
-        if not os.path.exists(new_path):
-            return temp_env_name
+    with open(os.path.join(path_to_temp, _temp_counter_filename), 'a+') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            content = f.read().strip()
+            start = int(content) if content.isdigit() else 0
+            for i in count(start):
+                temp_env_name = f"temp_venv_{i}"
+                try:
+                    # Skips names taken by environments not created through the counter
+                    os.mkdir(os.path.join(path_to_temp, temp_env_name))
+                except FileExistsError:
+                    continue
+                f.seek(0)
+                f.truncate()
+                f.write(str(i + 1))
+                f.flush()
+                return temp_env_name
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
 
 
 def _remove_file_or_folder(path):
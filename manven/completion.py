@@ -0,0 +1,108 @@
+import os
+import fcntl
+import threading
+
+from manven.settings import ENVS_PATH
+
+# The files have one line per completion of the form ``<kind>\t<name>[\t<description>]``
+COMMAND = "command"
+ENVIRONMENT = "env"
+TEMPORARY = "temp"
+_kinds = [COMMAND, ENVIRONMENT, TEMPORARY]
+_completions_filename = "completions"
+_lock_filename = "completions.lock"
+
+
+def get_completion_file(basefolder=None):
+    """
+    Returns the path to a file read by the completion scripts of the shells.
+
+    The commands are the same for all projects and kept per user, in ``$XDG_CACHE_HOME/manven/completions``
+    (``~/.cache/manven/completions`` by default). The environments are kept next to them, in
+    ``<basefolder>/.manven/completions``, since each project can have its own folder of environments.
+
+    Args:
+        basefolder (str, optional): The folder containing the environments, None for the file with the commands.
+
+    Returns:
+        str: The path.
+    """
+    if basefolder is not None:
+        # Imported here since the index imports this module
+        from manven.index import get_state_path
+        return os.path.join(get_state_path(basefolder), _completions_filename)
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser(os.path.join("~", ".cache"))
+    return os.path.join(cache_home, "manven", _completions_filename)
+
+
+def read_completions(basefolder=ENVS_PATH):
+    """
+    Reads the completion files.
+
+    Args:
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        dict: Mapping from each kind (``command``, ``env`` and ``temp``) to a list of tuples with the name
+            and description (empty for environments).
+    """
+    return {
+        **_read(get_completion_file(), [COMMAND]),
+        **_read(get_completion_file(basefolder), [ENVIRONMENT, TEMPORARY]),
+    }
+
+
+def update_environments(environment_names, basefolder=ENVS_PATH):
+    """
+    Updates the environments in the completion file of a folder of environments, if they changed.
+
+    Args:
+        environment_names (iterable): The names of the environments (``.temp/<name>`` for temporary ones).
+        basefolder (str): The folder containing the environments.
+    """
+    environments = [(name, '') for name in sorted(environment_names) if not name.startswith(".temp/")]
+    temporary = [(name, '') for name in sorted(environment_names) if name.startswith(".temp/")]
+    _update(get_completion_file(basefolder), {ENVIRONMENT: environments, TEMPORARY: temporary})
+
+
+def update_commands(commands):
+    """
+    Updates the (sub)commands in the completion file, if they changed.
+
+    Args:
+        commands (dict): Mapping from the name of each command to a short description.
+    """
+    _update(get_completion_file(), {COMMAND: sorted(commands.items())})
+
+
+def _read(completion_file, kinds):
+    """Reads some kinds of completions from a file."""
+    completions = {kind: [] for kind in kinds}
+    try:
+        with open(completion_file, 'r') as f:
+            for line in f:
+                kind, _, rest = line.rstrip('\n').partition('\t')
+                name, _, description = rest.partition('\t')
+                if kind in completions and name:
+                    completions[kind].append((name, description))
+    except FileNotFoundError:
+        pass
+    return completions
+
+
+def _update(completion_file, sections):
+    """Replaces the completions in a file (atomically), if they changed."""
+    if _read(completion_file, sections) == sections:
+        return
+    os.makedirs(os.path.dirname(completion_file), exist_ok=True)
+    with open(os.path.join(os.path.dirname(completion_file), _lock_filename), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            tmp_file = f"{completion_file}.{os.getpid()}-{threading.get_ident()}.tmp"
+            with open(tmp_file, 'w') as f:
+                for kind, entries in sections.items():
+                    for name, description in entries:
+                        f.write(f"{kind}\t{name}\t{description}\n" if description else f"{kind}\t{name}\n")
+            os.replace(tmp_file, completion_file)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,148 @@
+import os
+import sys
+import threading
+import importlib.util
+
+from manven.toolbox import has_binary, find_binary
+from manven.tracing import traced, run
+from manven.settings import CREATION_BACKEND
+
+BACKENDS = ["virtualenv", "venv", "subprocess"]
+
+# virtualenv configures logging globally, so only one environment is created at a time through its API
+_virtualenv_api_lock = threading.Lock()
+
+# Options of virtualenv which are supported by the venv backend, mapped to the arguments of venv.EnvBuilder
+_venv_options = {
+    "system_site_packages": "system_site_packages",
+    "clear": "clear",
+    "always_copy": "symlinks",
+    "no_pip": "with_pip",
+}
+# Options of virtualenv which should be inverted when passed to venv.EnvBuilder
+_inverted_venv_options = {"always_copy", "no_pip"}
+
+
+def has_backend(backend=CREATION_BACKEND):
+    """
+    Checks if a backend for creating environments is available.
+
+    Args:
+        backend (str): One of ``BACKENDS``.
+
+    Returns:
+        bool: Whether the backend can be used.
+    """
+    if backend == "venv":
+        return True
+    if backend == "virtualenv" and _has_virtualenv_module():
+        return True
+    return has_binary("virtualenv")
+
+
+@traced()
+def create_virtual_environment(path_to_venv, backend=CREATION_BACKEND, **virtualenv_ops):
+    """
+    Creates a new environment at a given path.
+
+    The ``virtualenv`` backend calls the virtualenv python API in this process, ``venv`` uses the stdlib
+    and ``subprocess`` runs the ``virtualenv`` binary. The in-process backends fall back
+    to the ``subprocess`` one if they cannot handle the request (e.g. an old virtualenv without ``cli_run``
+    or a different interpreter than the current one for ``venv``).
+
+    Args:
+        path_to_venv (str): The (absolute) path to the new environment.
+        backend (str): One of ``BACKENDS``.
+        virtualenv_ops: Additional arguments passed to virtualenv.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend}, should be one of {BACKENDS}")
+    if backend == "venv" and _can_use_venv(virtualenv_ops):
+        _create_with_venv(path_to_venv, virtualenv_ops)
+    elif backend in ("venv", "virtualenv") and _has_virtualenv_module():
+        _create_with_virtualenv_api(path_to_venv, virtualenv_ops)
+    else:
+        _create_with_subprocess(path_to_venv, virtualenv_ops)
+
+
+def format_options(virtualenv_ops):
+    """Formats the a dictionary of options to be passed as flags to virtualenv."""
+    options = []
+    for option_name, option_value in virtualenv_ops.items():
+        if option_value:  # If True or non-zero length string
+            option = option_name.replace('_', '-')
+            option = f"--{option}"
+            if not isinstance(option_value, bool):  # If it's a True/False flag we simply add the flag, not the value
+                option_value = option_value.replace('=', '')
+                option += f"={option_value}"
+            options.append(option)
+    return options
+
+
+def resolve_python(python=''):
+    """
+    Returns the real path to a python interpreter.
+
+    Args:
+        python (str): The interpreter as a path or a name in the PATH (default the current one).
+
+    Returns:
+        str: The path.
+    """
+    if not python:
+        return os.path.realpath(sys.executable)
+    path = python if os.sep in python else find_binary(python) or python
+    return os.path.realpath(path)
+
+
+def _create_with_virtualenv_api(path_to_venv, virtualenv_ops):
+    """Creates an environment by calling virtualenv in this process."""
+    from virtualenv import cli_run
+
+    try:
+        with _virtualenv_api_lock:
+            cli_run([*format_options(virtualenv_ops), path_to_venv])
+    except SystemExit as e:
+        # virtualenv exits on invalid arguments
+        raise RuntimeError(f"Something went wrong when creating the environment {path_to_venv}") from e
+
+
+def _create_with_venv(path_to_venv, virtualenv_ops):
+    """Creates an environment using the stdlib venv module."""
+    import venv
+
+    kwargs = {"symlinks": True, "with_pip": True}
+    for option_name, argument in _venv_options.items():
+        if option_name in virtualenv_ops:
+            value = bool(virtualenv_ops[option_name])
+            kwargs[argument] = not value if option_name in _inverted_venv_options else value
+    venv.EnvBuilder(**kwargs).create(path_to_venv)
+
+
+def _create_with_subprocess(path_to_venv, virtualenv_ops):
+    """Creates an environment by running the virtualenv binary."""
+    args = ["virtualenv", *format_options(virtualenv_ops), path_to_venv]
+    output = run(args)
+    if output.returncode != 0:
+        message = f"Something went wrong when creating the environment {path_to_venv}"
+        raise RuntimeError(f"{message}: (" + ' '.join(args) + ')')
+
+
+def _can_use_venv(virtualenv_ops):
+    """Checks if the requested options can be handled by the venv backend."""
+    python = virtualenv_ops.get("python")
+    if python and resolve_python(python) != resolve_python():
+        return False
+    return all(
+        option_name in _venv_options or option_name == "python"
+        for option_name, value in virtualenv_ops.items() if value
+    )
+
+
+def _has_virtualenv_module():
+    """Checks if a version of virtualenv with a python API (``cli_run``) is installed."""
+    spec = importlib.util.find_spec("virtualenv")
+    if spec is None:
+        return False
+    from virtualenv import __version__
+    return int(__version__.split('.')[0]) >= 20
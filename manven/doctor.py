@@ -0,0 +1,146 @@
+import os
+import glob
+import json
+from subprocess import PIPE, TimeoutExpired
+from concurrent.futures import ThreadPoolExecutor
+
+from manven.settings import ENVS_PATH
+from manven.index import get_state_path
+from manven.toolbox import read_pyvenv_cfg
+from manven.tracing import run
+
+_cache_filename = "doctor.json"
+# Seconds to wait for pip to start
+_pip_timeout = 60
+
+
+def diagnose_environments(paths, jobs=None, basefolder=ENVS_PATH):
+    """
+    Checks the health of environments, in parallel.
+
+    For each environment it is checked that the interpreter (``bin/python``) and the ``home`` in ``pyvenv.cfg``
+    exist, that pip runs and that the shebangs of the scripts in ``bin/`` point to existing interpreters.
+    The verdict for each environment is cached (in the state folder next to the environments) and only checked again
+    if the modification time of the environment's ``bin/``, ``pyvenv.cfg``, site-packages or interpreter changed.
+
+    Args:
+        paths (list): The paths to the environments.
+        jobs (int, optional): The number of threads to use (default decided by ``ThreadPoolExecutor``).
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        dict: Mapping from the path of each environment to a list of str describing its problems (empty if healthy).
+    """
+    cache = _read_cache(basefolder)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        entries = dict(zip(paths, executor.map(lambda path: _get_entry(path, cache.get(path)), paths)))
+    if any(cache.get(path) != entry for path, entry in entries.items()):
+        cache = {path: entry for path, entry in cache.items() if os.path.exists(path)}
+        cache.update(entries)
+        _write_cache(cache, basefolder)
+    return {path: entry["problems"] for path, entry in entries.items()}
+
+
+def _get_entry(path_to_venv, cached):
+    """Returns the cached verdict of an environment if still valid, otherwise checks it."""
+    key = _get_cache_key(path_to_venv)
+    if cached is not None and cached["key"] == key:
+        return cached
+    return {"key": key, "problems": _diagnose(path_to_venv)}
+
+
+def _get_cache_key(path_to_venv):
+    """Returns the modification times of the files deciding the health of an environment."""
+    python = os.path.join(path_to_venv, "bin", "python")
+    home = read_pyvenv_cfg(path_to_venv).get("home", '')
+    paths = [
+        os.path.join(path_to_venv, "bin"),
+        os.path.join(path_to_venv, "pyvenv.cfg"),
+        *sorted(glob.glob(os.path.join(path_to_venv, "lib", "python*", "site-packages"))),
+        os.path.realpath(python),
+        home,
+    ]
+    return [[path, _get_mtime(path)] for path in paths]
+
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _diagnose(path_to_venv):
+    """Checks an environment, returns its problems."""
+    problems = []
+    python = os.path.join(path_to_venv, "bin", "python")
+    if not os.path.lexists(python):
+        problems.append("bin/python is missing")
+    elif not os.path.exists(python):
+        problems.append(f"bin/python points to {os.path.realpath(python)} which does not exist")
+
+    values = read_pyvenv_cfg(path_to_venv)
+    if not values:
+        problems.append("pyvenv.cfg is missing")
+    elif not os.path.isdir(values.get("home", '')):
+        problems.append(f"The home {values.get('home')} in pyvenv.cfg does not exist")
+
+    if problems:
+        # The checks below would fail for the same reason
+        return problems
+    problems += _check_shebangs(path_to_venv)
+    if os.path.exists(os.path.join(path_to_venv, "bin", "pip")):
+        problems += _check_pip(python)
+    return problems
+
+
+def _check_shebangs(path_to_venv):
+    """Returns the scripts in ``bin/`` whose shebang points to an interpreter which does not exist."""
+    problems = []
+    bin_folder = os.path.join(path_to_venv, "bin")
+    with os.scandir(bin_folder) as entries:
+        for entry in sorted(entries, key=lambda entry: entry.name):
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            with open(entry.path, 'rb') as f:
+                first_line = f.readline(4096)
+            if not first_line.startswith(b"#!"):
+                continue
+            parts = first_line[2:].split()
+            interpreter = os.fsdecode(parts[0]) if parts else ''
+            if os.path.isabs(interpreter) and not os.path.exists(interpreter):
+                problems.append(f"bin/{entry.name} runs {interpreter} which does not exist")
+    return problems
+
+
+def _check_pip(python):
+    """Checks that pip runs with an interpreter."""
+    try:
+        output = run([python, "-m", "pip", "--version"], stdout=PIPE, stderr=PIPE, timeout=_pip_timeout)
+    except (OSError, TimeoutExpired) as e:
+        return [f"pip does not work: {e}"]
+    if output.returncode != 0:
+        lines = output.stderr.decode('utf-8', errors='replace').strip().splitlines()
+        return [f"pip does not work: {lines[-1] if lines else f'exit code {output.returncode}'}"]
+    return []
+
+
+def _read_cache(basefolder):
+    """Reads the cache file, returns an empty cache if there is none or it cannot be parsed."""
+    cache_file = os.path.join(get_state_path(basefolder), _cache_filename)
+    try:
+        with open(cache_file, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_cache(cache, basefolder):
+    """Writes the cache file atomically."""
+    state_path = get_state_path(basefolder)
+    os.makedirs(state_path, exist_ok=True)
+    cache_file = os.path.join(state_path, _cache_filename)
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp_file, cache_file)
@@ -0,0 +1,40 @@
+def select_evictions(environments, now, ttl=None, max_bytes=None, max_count=None, keep=()):
+    """
+    Selects the environments to evict such that the remaining ones are within a budget.
+
+    Environments not used within ``ttl`` are evicted and then the least recently used ones until
+    at most ``max_count`` environments using at most ``max_bytes`` remain.
+    Environments in ``keep`` are never evicted but still count towards the budget.
+
+    Args:
+        environments (list): list of dict with the keys ``name``, ``last_used`` (timestamp)
+            and ``size`` (in bytes, only needed if ``max_bytes`` is given).
+        now (float): The current time.
+        ttl (float, optional): The time (in seconds) after which an unused environment is evicted.
+        max_bytes (int, optional): The total size of the environments to keep.
+        max_count (int, optional): The number of environments to keep.
+        keep (iterable): Names of environments which should never be evicted (e.g. the active one).
+
+    Returns:
+        list: list of str consisting of the names of the environments to evict, the least recently used first.
+    """
+    remaining = sorted(environments, key=lambda environment: environment["last_used"])
+    evicted = []
+    if ttl is not None:
+        for environment in list(remaining):
+            if environment["name"] not in keep and environment["last_used"] < now - ttl:
+                remaining.remove(environment)
+                evicted.append(environment["name"])
+
+    def over_budget():
+        if max_count is not None and len(remaining) > max_count:
+            return True
+        return max_bytes is not None and sum(environment["size"] for environment in remaining) > max_bytes
+
+    for environment in list(remaining):
+        if not over_budget():
+            break
+        if environment["name"] not in keep:
+            remaining.remove(environment)
+            evicted.append(environment["name"])
+    return evicted
@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import fcntl
+from contextlib import contextmanager
+
+from manven.settings import ENVS_PATH
+from manven.toolbox import get_activate_script_name, read_pyvenv_cfg
+from manven.completion import update_environments
+from manven.tracing import traced
+
+_state_folder_name = ".manven"
+_index_filename = "index.json"
+_lock_filename = "index.lock"
+_temp_folder_name = ".temp"
+
+
+def get_state_path(basefolder=ENVS_PATH):
+    """
+    Returns the path to the folder where manven keeps its state (index, caches) next to the environments.
+
+    Args:
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        str: The path.
+    """
+    return os.path.join(basefolder, _state_folder_name)
+
+
+@traced()
+def load_index(basefolder=ENVS_PATH):
+    """
+    Returns the index of the environments.
+
+    The index is revalidated against the modification times of the folder containing the environments
+    (and the one containing the temporary environments) and rebuilt if any of these changed.
+
+    Args:
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        dict: Mapping from the name of each environment (``.temp/<name>`` for temporary ones)
+            to a dictionary with the keys ``path``, ``python``, ``created`` and ``last_activated``.
+    """
+    if not os.path.exists(basefolder):
+        return {}
+    with _index_lock(basefolder):
+        return _load_valid_index(basefolder)
+
+
+def update_index(environment_name, basefolder=ENVS_PATH, **fields):
+    """
+    Updates the entry of an environment in the index (after revalidating it).
+
+    Args:
+        environment_name (str): The name of the environment (``.temp/<name>`` for temporary ones).
+        basefolder (str): The folder containing the environments.
+        fields: The values to update, e.g. ``last_activated``.
+    """
+    if not os.path.exists(basefolder):
+        return
+    with _index_lock(basefolder):
+        mtimes = _get_mtimes(basefolder)
+        environments = _load_valid_index(basefolder)
+        if environment_name in environments:
+            environments[environment_name].update(fields)
+            _write_index(environments, mtimes, basefolder)
+
+
+@traced()
+def add_to_index(path_to_venv, basefolder=ENVS_PATH):
+    """
+    Adds a (newly created) environment to the index, replacing any previous entry with the same name.
+
+    Args:
+        path_to_venv (str): The path to the environment.
+        basefolder (str): The folder containing the environments.
+    """
+    environment_name = get_index_name(path_to_venv, basefolder=basefolder)
+    if environment_name is None:
+        return
+    with _index_lock(basefolder):
+        mtimes = _get_mtimes(basefolder)
+        environments = _load_valid_index(basefolder)
+        environments[environment_name] = _describe_environment(path_to_venv, created=time.time())
+        _write_index(environments, mtimes, basefolder)
+
+
+@traced()
+def rebuild_index(basefolder=ENVS_PATH):
+    """
+    Rebuilds the index by scanning the folder containing the environments.
+
+    The creation and last activation times of environments already in the index are kept.
+
+    Args:
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        dict: The index, see ``load_index``.
+    """
+    if not os.path.exists(basefolder):
+        return {}
+    with _index_lock(basefolder):
+        mtimes = _get_mtimes(basefolder)
+        index = _read_index(basefolder)
+        previous = index["environments"] if index is not None else {}
+        environments = _scan_environments(basefolder, previous)
+        _write_index(environments, mtimes, basefolder)
+    return environments
+
+
+def get_index_name(path_to_venv, basefolder=ENVS_PATH):
+    """
+    Returns the name of an environment in the index, given its path.
+
+    Args:
+        path_to_venv (str): The path to the environment.
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        str or None: The name or None if the environment is not in the folder containing the environments.
+    """
+    name = os.path.relpath(path_to_venv, basefolder)
+    parts = name.split(os.sep)
+    if len(parts) == 1 and not name.startswith('.'):
+        return name
+    if len(parts) == 2 and parts[0] == _temp_folder_name:
+        return name
+    return None
+
+
+@contextmanager
+def _index_lock(basefolder):
+    """Context manager holding an exclusive lock on the index."""
+    state_path = get_state_path(basefolder)
+    os.makedirs(state_path, exist_ok=True)
+    with open(os.path.join(state_path, _lock_filename), 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _load_valid_index(basefolder):
+    """Reads the index and rebuilds it if it's outdated (should be called with the lock held)."""
+    mtimes = _get_mtimes(basefolder)
+    index = _read_index(basefolder)
+    if index is not None and index["mtimes"] == mtimes:
+        return index["environments"]
+    previous = index["environments"] if index is not None else {}
+    environments = _scan_environments(basefolder, previous)
+    _write_index(environments, mtimes, basefolder)
+    return environments
+
+
+def _get_mtimes(basefolder):
+    """Returns the modification times of the folders containing the environments."""
+    mtimes = []
+    for folder in [basefolder, os.path.join(basefolder, _temp_folder_name)]:
+        try:
+            mtimes.append(os.stat(folder).st_mtime_ns)
+        except FileNotFoundError:
+            mtimes.append(None)
+    return mtimes
+
+
+def _read_index(basefolder):
+    """Reads the index file, returns None if there is none or it cannot be parsed."""
+    index_file = os.path.join(get_state_path(basefolder), _index_filename)
+    try:
+        with open(index_file, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_index(environments, mtimes, basefolder):
+    """Writes the index file atomically and updates the completions if the environments changed."""
+    index_file = os.path.join(get_state_path(basefolder), _index_filename)
+    tmp_file = f"{index_file}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump({"mtimes": mtimes, "environments": environments}, f)
+    os.replace(tmp_file, index_file)
+    update_environments(environments, basefolder=basefolder)
+
+
+def _scan_environments(basefolder, previous):
+    """Scans the folder containing the environments, reusing the known values from a previous index."""
+    activate_script_name = get_activate_script_name()
+    environments = {}
+    for folder, prefix in [(basefolder, ""), (os.path.join(basefolder, _temp_folder_name), f"{_temp_folder_name}/")]:
+        if not os.path.exists(folder):
+            continue
+        for entry in os.scandir(folder):
+            if prefix == "" and entry.name.startswith('.'):
+                continue
+            if not os.path.exists(os.path.join(entry.path, "bin", activate_script_name)):
+                continue
+            name = f"{prefix}{entry.name}"
+            environments[name] = previous.get(name) or _describe_environment(entry.path)
+    return environments
+
+
+def _describe_environment(path_to_venv, created=None):
+    """Returns the entry of an environment in the index."""
+    if created is None:
+        pyvenv_cfg = os.path.join(path_to_venv, "pyvenv.cfg")
+        created = os.stat(pyvenv_cfg).st_mtime if os.path.exists(pyvenv_cfg) else time.time()
+    values = read_pyvenv_cfg(path_to_venv)
+    return {
+        "path": path_to_venv,
+        "python": values.get("version") or values.get("version_info"),
+        "created": created,
+        "last_activated": None,
+    }
@@ -0,0 +1,181 @@
+import os
+import glob
+from abc import ABC, abstractmethod
+
+from manven.toolbox import find_binary, normalize_name
+from manven.tracing import run
+from manven.settings import INSTALLER
+
+INSTALLERS = ["pip", "uv"]
+
+# Options of ``pip install`` mapped to the equivalent option of ``uv pip install`` (None if it can be dropped)
+_uv_options = {
+    "-i": "--index-url",
+    "--index-url": "--index-url",
+    "--extra-index-url": "--extra-index-url",
+    "--no-index": "--no-index",
+    "-f": "--find-links",
+    "--find-links": "--find-links",
+    "-c": "--constraint",
+    "--constraint": "--constraint",
+    "-U": "--upgrade",
+    "--upgrade": "--upgrade",
+    "--no-deps": "--no-deps",
+    "--pre": "--prerelease=allow",
+    "--force-reinstall": "--reinstall",
+    "--no-cache-dir": "--no-cache",
+    "--require-hashes": "--require-hashes",
+    "--no-build-isolation": "--no-build-isolation",
+    "--trusted-host": "--allow-insecure-host",
+    "-q": "--quiet",
+    "--quiet": "--quiet",
+    "-v": "--verbose",
+    "--verbose": "--verbose",
+    "--disable-pip-version-check": None,
+    "--no-input": None,
+}
+
+
+class Installer(ABC):
+    """
+    Installs packages into an environment.
+
+    Subclasses implement ``_install_command``, the installed distributions are read from the ``.dist-info`` folders
+    in the site-packages which works the same for all installers.
+
+    Args:
+        path_to_venv (str): The path to the environment.
+    """
+
+    name = None
+
+    def __init__(self, path_to_venv):
+        self.path_to_venv = path_to_venv
+
+    def install(self, packages, flags=()):
+        """
+        Installs packages.
+
+        Args:
+            packages (list): List of strings specifying python packages to install.
+            flags (list): Flags for ``pip install``, translated for the installer.
+        """
+        self._run([*self._install_command(), *self.translate_flags(flags), *packages], f"installing {packages}")
+
+    def install_requirements(self, requirements_file, flags=()):
+        """
+        Installs the packages in a requirements file.
+
+        Args:
+            requirements_file (str): The path to the requirements file.
+            flags (list): Flags for ``pip install``, translated for the installer.
+        """
+        self._run(
+            [*self._install_command(), *self.translate_flags(flags), "-r", os.path.abspath(requirements_file)],
+            f"installing the requirements in {requirements_file}",
+        )
+
+    def list_installed(self, from_index_only=False):
+        """
+        Lists the installed distributions.
+
+        Args:
+            from_index_only (bool): Whether to skip the distributions installed from a local path or a URL
+                (which have a ``direct_url.json``), e.g. editable installs, which cannot be installed again by version.
+
+        Returns:
+            dict: Mapping from the normalized name of each distribution to its version.
+        """
+        installed = {}
+        for site_packages in glob.glob(os.path.join(self.path_to_venv, "lib", "python*", "site-packages")):
+            for entry in os.listdir(site_packages):
+                if not entry.endswith(".dist-info"):
+                    continue
+                if from_index_only and os.path.exists(os.path.join(site_packages, entry, "direct_url.json")):
+                    continue
+                name, _, version = entry[:-len(".dist-info")].partition('-')
+                installed[normalize_name(name)] = version
+        return installed
+
+    def translate_flags(self, flags):
+        """
+        Translates flags for ``pip install`` to the installer.
+
+        Args:
+            flags (list): The flags.
+
+        Returns:
+            list: The translated flags.
+
+        Raises:
+            ValueError: If a flag is not supported by the installer.
+        """
+        return list(flags)
+
+    @abstractmethod
+    def _install_command(self):
+        """Returns the command installing packages, to which the flags and packages are appended."""
+
+    def _run(self, args, action):
+        """Runs an install command and raises a RuntimeError if it fails."""
+        output = run(args)
+        if output.returncode != 0:
+            raise RuntimeError(f"Something went wrong when {action}: (" + ' '.join(args) + ')')
+
+
+class PipInstaller(Installer):
+    """Installs packages with the pip of the environment."""
+
+    name = "pip"
+
+    def _install_command(self):
+        return [os.path.join(self.path_to_venv, "bin", "pip"), "install"]
+
+
+class UvInstaller(Installer):
+    """Installs packages with ``uv pip install``, which resolves and installs in parallel and does not need pip."""
+
+    name = "uv"
+
+    def _install_command(self):
+        return [find_binary("uv"), "pip", "install", "--python", os.path.join(self.path_to_venv, "bin", "python")]
+
+    def translate_flags(self, flags):
+        translated = []
+        for flag in flags:
+            if not flag.startswith('-'):
+                # The value of the previous option
+                translated.append(flag)
+                continue
+            option, has_value, value = flag.partition('=')
+            if option not in _uv_options:
+                raise ValueError(f"The flag {flag} is not supported by uv")
+            if _uv_options[option] is not None:
+                translated.append(f"{_uv_options[option]}={value}" if has_value else _uv_options[option])
+        return translated
+
+
+def get_installer(path_to_venv, flags=(), installer=INSTALLER):
+    """
+    Returns the installer to use for an environment.
+
+    Falls back to pip if the requested installer is not in the PATH or does not support some of the flags.
+
+    Args:
+        path_to_venv (str): The path to the environment.
+        flags (list): The flags for ``pip install`` which will be passed to the installer.
+        installer (str): One of ``INSTALLERS``.
+
+    Returns:
+        Installer: The installer.
+    """
+    if installer not in INSTALLERS:
+        raise ValueError(f"Unknown installer {installer}, should be one of {INSTALLERS}")
+    if installer == "uv" and find_binary("uv") is not None:
+        uv = UvInstaller(path_to_venv)
+        try:
+            uv.translate_flags(flags)
+        except ValueError:
+            return PipInstaller(path_to_venv)
+        return uv
+    return PipInstaller(path_to_venv)
@@ -0,0 +1,330 @@
+import os
+import sys
+import json
+import time
+import fcntl
+from contextlib import contextmanager
+
+from manven.settings import ENVS_PATH
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_jobs_folder_name = ".jobs"
+# Held while updating a job record
+_records_lock_filename = ".lock"
+# Seconds after which a queued job without a worker is considered failed
+_spawn_grace_period = 10
+# Run by the worker, the base folder is set before importing the modules using it
+_worker_code = "from manven import settings; settings.ENVS_PATH = {basefolder!r}; " \
+    "from manven.commands import run_job; run_job({environment_name!r})"
+
+
+def get_jobs_path(basefolder=ENVS_PATH):
+    """
+    Returns the path to where the background jobs building environments are recorded.
+
+    For each job there is a record ``<name>.json``, the output of the build ``<name>.log``,
+    a lock ``<name>.lock`` held by the worker while building and a marker ``<name>.pending``
+    which exists until the build finished.
+
+    Args:
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        str: The path.
+    """
+    return os.path.join(basefolder, _jobs_folder_name)
+
+
+def get_log_path(environment_name, basefolder=ENVS_PATH):
+    """
+    Returns the path to the output of the build of an environment.
+
+    Args:
+        environment_name (str): The name of the environment.
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        str: The path.
+    """
+    return _get_job_file(environment_name, ".log", basefolder)
+
+
+def queue_job(environment_name, options, basefolder=ENVS_PATH):
+    """
+    Records a job building an environment, to be started by ``spawn_job_worker``.
+
+    Args:
+        environment_name (str): The name of the environment.
+        options (dict): The (JSON serializable) arguments of ``manven.commands.create_environment``.
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        dict: The record of the job.
+    """
+    if os.sep in environment_name:
+        raise ValueError(f"Cannot build {environment_name} in the background")
+    os.makedirs(get_jobs_path(basefolder=basefolder), exist_ok=True)
+    with _records_lock(basefolder):
+        if is_pending(environment_name, basefolder=basefolder):
+            raise ValueError(f"Environment {environment_name} is already being built")
+        record = {
+            "name": environment_name,
+            "state": QUEUED,
+            "options": options,
+            "queued": time.time(),
+            "started": None,
+            "finished": None,
+            "pid": None,
+            "error": None,
+        }
+        _write_record(record, basefolder)
+        with open(_get_job_file(environment_name, ".pending", basefolder), 'w'):
+            pass
+        with open(get_log_path(environment_name, basefolder=basefolder), 'w'):
+            pass
+    return record
+
+
+def spawn_job_worker(environment_name, basefolder=ENVS_PATH):
+    """
+    Starts a detached process running a queued job, see ``manven.commands.run_job``.
+
+    The output of the process is written to the log of the job. The worker builds the environment in ``basefolder``,
+    whatever the config resolved from its working directory.
+
+    Args:
+        environment_name (str): The name of the environment.
+        basefolder (str): The folder containing the environments.
+    """
+    # Imported here since this module is also used by the fast path of activate
+    from subprocess import Popen, DEVNULL, STDOUT
+    with open(get_log_path(environment_name, basefolder=basefolder), 'ab') as log:
+        process = Popen(
+            [sys.executable, "-c",
+             _worker_code.format(basefolder=os.path.abspath(basefolder), environment_name=environment_name)],
+            stdin=DEVNULL,
+            stdout=log,
+            stderr=STDOUT,
+            start_new_session=True,
+        )
+    _update_record(environment_name, basefolder, only_if_state=QUEUED, pid=process.pid)
+
+
+@contextmanager
+def start_job(environment_name, basefolder=ENVS_PATH):
+    """
+    Marks a job as running for the duration of a with-statement, and as done or failed afterwards.
+
+    Args:
+        environment_name (str): The name of the environment.
+        basefolder (str): The folder containing the environments.
+
+    Yields:
+        dict: The options of the job.
+    """
+    with open(_get_job_file(environment_name, ".lock", basefolder), 'w') as lock:
+        # Blocking, since a process checking if the worker is alive holds the lock for a moment
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            record = _update_record(environment_name, basefolder, state=RUNNING, started=time.time(), pid=os.getpid())
+            try:
+                yield record["options"]
+            except BaseException as e:
+                _update_record(
+                    environment_name, basefolder, state=FAILED, finished=time.time(), error=f"{type(e).__name__}: {e}",
+                )
+                raise
+            _update_record(environment_name, basefolder, state=DONE, finished=time.time())
+        finally:
+            _remove(_get_job_file(environment_name, ".pending", basefolder))
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def is_pending(environment_name, basefolder=ENVS_PATH):
+    """
+    Checks if an environment is queued or being built in the background (only stats a file).
+
+    Args:
+        environment_name (str): The name of the environment.
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        bool: Whether there is an unfinished job for the environment.
+    """
+    return os.path.exists(_get_job_file(environment_name, ".pending", basefolder))
+
+
+def get_job(environment_name, basefolder=ENVS_PATH):
+    """
+    Returns the record of the last job building an environment.
+
+    A job whose worker stopped without finishing it is reported as failed.
+
+    Args:
+        environment_name (str): The name of the environment.
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        dict or None: The record with the keys ``name``, ``state`` (``queued``, ``running``, ``done`` or ``failed``),
+            ``options``, ``queued``, ``started``, ``finished``, ``pid``, ``error`` and ``log`` (the path to the output).
+    """
+    try:
+        with open(_get_job_file(environment_name, ".json", basefolder), 'r') as f:
+            record = json.load(f)
+    except FileNotFoundError:
+        return None
+    if record["state"] in (QUEUED, RUNNING) and not _is_worker_alive(record, basefolder):
+        record["state"] = FAILED
+        record["error"] = "The worker stopped before finishing the job"
+    record["log"] = get_log_path(environment_name, basefolder=basefolder)
+    return record
+
+
+def list_jobs(basefolder=ENVS_PATH):
+    """
+    Returns the records of the jobs, see ``get_job``.
+
+    Args:
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        list: The records, sorted by the time they were queued.
+    """
+    jobs_path = get_jobs_path(basefolder=basefolder)
+    if not os.path.exists(jobs_path):
+        return []
+    records = [get_job(entry[:-len(".json")], basefolder=basefolder)
+               for entry in os.listdir(jobs_path) if entry.endswith(".json")]
+    return sorted((record for record in records if record is not None), key=lambda record: record["queued"])
+
+
+def wait_for_job(environment_name, timeout=None, interval=0.1, basefolder=ENVS_PATH):
+    """
+    Waits until the job building an environment finished.
+
+    Args:
+        environment_name (str): The name of the environment.
+        timeout (float, optional): The maximal number of seconds to wait.
+        interval (float): The number of seconds between each check.
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        dict or None: The record of the job (see ``get_job``) or None if there is no job for the environment.
+
+    Raises:
+        TimeoutError: If the job did not finish within ``timeout``.
+    """
+    start = time.time()
+    while True:
+        record = get_job(environment_name, basefolder=basefolder)
+        if record is None or record["state"] in (DONE, FAILED):
+            if record is not None:
+                _remove(_get_job_file(environment_name, ".pending", basefolder))
+            return record
+        if timeout is not None and time.time() - start > timeout:
+            raise TimeoutError(f"Environment {environment_name} is still being built")
+        time.sleep(interval)
+
+
+def clear_jobs(basefolder=ENVS_PATH):
+    """
+    Removes the records and logs of the finished jobs.
+
+    Args:
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        int: The number of removed jobs.
+    """
+    finished = [record for record in list_jobs(basefolder=basefolder) if record["state"] in (DONE, FAILED)]
+    for record in finished:
+        remove_job(record["name"], basefolder=basefolder)
+    return len(finished)
+
+
+def remove_job(environment_name, basefolder=ENVS_PATH):
+    """
+    Removes the record, log and marker of a job, e.g. if its worker could not be started.
+
+    Args:
+        environment_name (str): The name of the environment.
+        basefolder (str): The folder containing the environments.
+    """
+    for suffix in [".json", ".log", ".lock", ".pending"]:
+        _remove(_get_job_file(environment_name, suffix, basefolder))
+
+
+def _get_job_file(environment_name, suffix, basefolder):
+    return os.path.join(get_jobs_path(basefolder=basefolder), f"{environment_name}{suffix}")
+
+
+def _is_worker_alive(record, basefolder):
+    """Checks if the worker of an unfinished job is running (or still to start it)."""
+    lock_file = _get_job_file(record["name"], ".lock", basefolder)
+    if os.path.exists(lock_file):
+        with open(lock_file, 'r') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(f, fcntl.LOCK_UN)
+    if record["state"] == RUNNING:
+        return False
+    # Queued, check that the worker process still exists
+    if record["pid"] is None:
+        # The worker is being started, unless the process starting it stopped in between
+        return time.time() - record["queued"] < _spawn_grace_period
+    try:
+        # Reaps the worker if it's a child of this process which exited, otherwise it would look alive
+        if os.waitpid(record["pid"], os.WNOHANG)[0] != 0:
+            return False
+    except ChildProcessError:
+        pass
+    try:
+        os.kill(record["pid"], 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def _records_lock(basefolder):
+    with open(os.path.join(get_jobs_path(basefolder=basefolder), _records_lock_filename), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _update_record(environment_name, basefolder, only_if_state=None, **changes):
+    """Updates the fields of a job record (atomically), returns the updated record."""
+    with _records_lock(basefolder):
+        with open(_get_job_file(environment_name, ".json", basefolder), 'r') as f:
+            record = json.load(f)
+        if only_if_state is not None and record["state"] != only_if_state:
+            return record
+        record.update(changes)
+        _write_record(record, basefolder)
+    return record
+
+
+def _write_record(record, basefolder):
+    file_path = _get_job_file(record["name"], ".json", basefolder)
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(record, f)
+    os.replace(tmp_path, file_path)
+
+
+def _remove(file_path):
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,95 @@
+import sys
+
+from manven.state import reset_to_execute, has_to_execute, check_first_usage, write_execute_to_file,\
+    cleanup_stale_sessions, SOURCE_EXIT_CODE
+from manven.tracing import enable, is_enabled, span
+
+
+def main(argv=None):
+    """
+    Entry point of manven.
+
+    The hot commands ``activate <name>`` (of an existing environment), ``deactivate``, ``last``
+    and ``get path`` (called by the completion scripts) are handled directly, without importing click
+    and only loading the config when needed.
+    Everything else falls through to the full CLI in ``manven.cli``.
+
+    Args:
+        argv (list, optional): The arguments (default ``sys.argv[1:]``).
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == "--trace" and not is_enabled():
+        # Enabled before loading the CLI such that loading the config is traced as well
+        enable()
+    with span("manven", argv=argv):
+        handler = _get_fast_handler(argv)
+        if handler is None:
+            from manven.cli import main as cli_main
+            cli_main()
+            return
+
+        if sys.stdin.isatty() and sys.stdout.isatty():
+            check_first_usage()
+        reset_to_execute()
+        handler(*argv[1:])
+        if has_to_execute():
+            sys.exit(SOURCE_EXIT_CODE)
+
+
+def _get_fast_handler(argv):
+    """Returns the function handling the command if it can take the fast path, otherwise None."""
+    if not argv or any(arg.startswith('-') for arg in argv):
+        return None
+    command, args = argv[0], argv[1:]
+    if command in ("deactivate", "last") and not args:
+        return _fast_handlers[command]
+    if command == "activate" and len(args) == 1 and _is_existing_environment(args[0]):
+        return _fast_handlers[command]
+    if command == "get" and args == ["path"]:
+        return _fast_handlers[command]
+    return None
+
+
+def _is_existing_environment(environment_name):
+    """
+    Checks if an environment exists (non-existing ones are created by the full CLI,
+    which also waits for the ones being built in the background).
+    """
+    from manven.activation import has_environment
+    from manven.jobs import is_pending
+    return has_environment(environment_name) and not is_pending(environment_name)
+
+
+def _activate(environment_name):
+    from manven.activation import activate_environment
+    activate_environment(environment_name)
+    cleanup_stale_sessions()
+
+
+def _deactivate():
+    # Same as ``manven.activation.deactivate_environment`` but without loading the config
+    write_execute_to_file(["deactivate"])
+
+
+def _last():
+    from manven.activation import open_last_environment
+    open_last_environment()
+
+
+def _get(setting):
+    # Only ``get path`` takes the fast path, resolving the config (which is cached) but without loading the CLI
+    from manven.settings import ENVS_PATH
+    print(ENVS_PATH)
+
+
+_fast_handlers = {
+    "activate": _activate,
+    "deactivate": _deactivate,
+    "last": _last,
+    "get": _get,
+}
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import tomllib
+except ImportError:  # python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+from manven.commands import create_environment
+from manven.activation import get_absolute_path, has_environment
+from manven.settings import DEFAULT_PKGS, PIP_INSTALL_FLAGS
+
+_manifest_hash_filename = ".manven-manifest"
+
+# Keys of an entry in the manifest which are not passed to virtualenv, mapped to arguments of create_environment
+_entry_keys = {
+    "packages": "default_pkgs",
+    "pip_flags": "pip_install_flags",
+    "clone": "clone",
+    "template": "template",
+}
+# Keys of an entry in the manifest passed as options to virtualenv (see ``manven.cli``)
+_virtualenv_keys = [
+    "verbose", "quiet", "python", "clear", "system_site_packages", "always_copy", "relocatable", "no_setuptools",
+    "no_pip", "no_wheel", "extra_search_dir", "download", "no_download", "prompt",
+]
+
+
+def load_manifest(file_path):
+    """
+    Loads the environments specified in a manifest (TOML) file of the form
+
+    .. code-block:: toml
+
+       [envs.<name>]
+       python = "python3.8"
+       packages = ["numpy", "scipy"]
+       pip_flags = ["--no-cache-dir"]
+       system_site_packages = true
+
+    where ``packages`` and ``pip_flags`` (lists or space separated strings) default to the config and the other keys
+    than ``packages``, ``pip_flags``, ``clone`` and ``template`` are passed as options to virtualenv.
+
+    Args:
+        file_path (str): The path to the manifest.
+
+    Returns:
+        dict: Mapping from the name of each environment to the keyword arguments for ``create_environment``.
+
+    Raises:
+        ValueError: If the manifest is malformed, e.g. has an unknown key.
+    """
+    if tomllib is None:
+        raise RuntimeError("Reading a manifest requires python >= 3.11 or the package tomli")
+    with open(file_path, 'rb') as f:
+        manifest = tomllib.load(f)
+    environments = manifest.get("envs")
+    if not isinstance(environments, dict):
+        raise ValueError(f"The manifest {file_path} should have a table [envs.<name>] for each environment")
+    return {name: _parse_entry(name, entry) for name, entry in environments.items()}
+
+
+def apply_manifest(environments, jobs=None, force=False):
+    """
+    Creates or updates the environments in a manifest concurrently.
+
+    Environments which exist and were created from the same entry are skipped,
+    environments which exist but were created from a different entry are replaced.
+    Environments which exist but were not created by a manifest are conflicts and left as they are,
+    unless ``force``.
+
+    Args:
+        environments (dict): The environments, as returned by ``load_manifest``.
+        jobs (int, optional): The number of environments to create concurrently
+            (default decided by ``ThreadPoolExecutor``).
+        force (bool): Whether to also replace the environments which were not created by a manifest.
+
+    Yields:
+        tuple: For each environment as it finishes, its name, the action (``created``, ``updated``,
+            ``skipped``, ``conflict`` or ``failed``), the duration in seconds and the error
+            if it failed or is a conflict (otherwise None).
+    """
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(_apply_entry, name, kwargs, force): name for name, kwargs in environments.items()}
+        for future in as_completed(futures):
+            yield (futures[future], *future.result())
+
+
+def _apply_entry(environment_name, kwargs, force):
+    """Creates or updates a single environment, returns the action, the duration and the error if any."""
+    start = time.perf_counter()
+    entry_hash = _hash_entry(kwargs)
+    exists = has_environment(environment_name)
+    if exists:
+        previous_hash = _read_entry_hash(environment_name)
+        if previous_hash == entry_hash:
+            return "skipped", time.perf_counter() - start, None
+        if previous_hash is None and not force:
+            error = ValueError(
+                f"{environment_name} exists but was not created by a manifest, use --force to replace it"
+            )
+            return "conflict", time.perf_counter() - start, error
+    try:
+        create_environment(environment_name, replace=exists, **kwargs)
+        with open(os.path.join(get_absolute_path(environment_name), _manifest_hash_filename), 'w') as f:
+            f.write(entry_hash)
+    except Exception as e:
+        return "failed", time.perf_counter() - start, e
+    return "updated" if exists else "created", time.perf_counter() - start, None
+
+
+def _parse_entry(environment_name, entry):
+    """Converts an entry of the manifest to keyword arguments for ``create_environment``."""
+    if not isinstance(entry, dict):
+        raise ValueError(f"The entry for {environment_name} in the manifest should be a table")
+    unknown = sorted(key for key in entry if key not in _entry_keys and key not in _virtualenv_keys)
+    if unknown:
+        raise ValueError(f"Unknown keys {unknown} in the entry for {environment_name} in the manifest")
+    kwargs = {"default_pkgs": DEFAULT_PKGS, "pip_install_flags": PIP_INSTALL_FLAGS}
+    for key, value in entry.items():
+        if key in ("packages", "pip_flags"):
+            if isinstance(value, str):
+                value = [item for item in value.split(' ') if item]
+            elif not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                raise ValueError(f"{key} of {environment_name} in the manifest should be a list of strings")
+        kwargs[_entry_keys.get(key, key)] = value
+    return kwargs
+
+
+def _hash_entry(kwargs):
+    """Returns a hash of the keyword arguments an environment is created with."""
+    content = json.dumps(kwargs, sort_keys=True)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def _read_entry_hash(environment_name):
+    """Returns the hash of the entry an environment was created with, None if not created by a manifest."""
+    file_path = os.path.join(get_absolute_path(environment_name), _manifest_hash_filename)
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, 'r') as f:
+        return f.read().strip()
@@ -0,0 +1,70 @@
+import re
+
+try:
+    from packaging.requirements import Requirement, InvalidRequirement
+    from packaging.version import Version, InvalidVersion
+except ImportError:
+    Requirement = None
+
+from manven.toolbox import normalize_name
+
+# Fallback parsing of a requirement when packaging is not installed: name, extras, version specifiers and marker
+_requirement_regex = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*(\[[^\]]*\])?\s*([^;]*?)\s*(;.*)?$")
+
+
+def get_outdated(requirements, installed, python_version=None):
+    """
+    Returns the requirements which are not satisfied by the installed distributions.
+
+    A requirement without version specifiers is satisfied by any installed version (the index is not queried).
+    The version specifiers are checked with ``packaging`` if it's installed, otherwise only exact pins (``==``)
+    are compared and other specifiers are satisfied by any installed version.
+
+    Args:
+        requirements (list): List of strings specifying python packages, e.g. ``DEFAULT_PKGS``.
+        installed (dict): Mapping from the normalized name of each installed distribution to its version,
+            see ``manven.installers.Installer.list_installed``.
+        python_version (str, optional): The ``major.minor`` version of the interpreter of the environment,
+            used to evaluate environment markers (default the current interpreter).
+
+    Returns:
+        list: The requirements (as given) which should be installed.
+    """
+    return [
+        requirement for requirement in requirements
+        if not _is_satisfied(requirement, installed, python_version)
+    ]
+
+
+def _is_satisfied(requirement, installed, python_version):
+    if Requirement is None:
+        return _is_satisfied_without_packaging(requirement, installed)
+    try:
+        parsed = Requirement(requirement)
+    except InvalidRequirement:
+        # E.g. a path or URL, which cannot be compared
+        return False
+    if parsed.marker is not None:
+        environment = {"python_version": python_version} if python_version else None
+        if not parsed.marker.evaluate(environment):
+            return True
+    version = installed.get(normalize_name(parsed.name))
+    if version is None:
+        return False
+    if not parsed.specifier:
+        return True
+    try:
+        return parsed.specifier.contains(Version(version), prereleases=True)
+    except InvalidVersion:
+        return False
+
+
+def _is_satisfied_without_packaging(requirement, installed):
+    match = _requirement_regex.match(requirement)
+    if match is None:
+        return False
+    version = installed.get(normalize_name(match.group(1)))
+    if version is None:
+        return False
+    pin = re.fullmatch(r"==([^=*,]+)", match.group(3).replace(' ', ''))
+    return pin is None or pin.group(1) == version
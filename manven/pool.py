@@ -0,0 +1,166 @@
+import os
+import sys
+import json
+import fcntl
+import hashlib
+from subprocess import Popen, DEVNULL
+from contextlib import contextmanager
+
+from manven.relocate import relocate_environment
+from manven.settings import ENVS_PATH, DEFAULT_PKGS, PIP_INSTALL_FLAGS, POOL_PYTHON
+
+# Run by the replenisher, the base folder is set before importing the modules using it
+_replenisher_code = "from manven import settings; settings.ENVS_PATH = {basefolder!r}; " \
+    "from manven.commands import fill_pool; fill_pool()"
+
+_pool_folder_name = ".pool"
+_building_suffix = ".building"
+_lock_filename = ".lock"
+
+
+def get_pool_key(python=POOL_PYTHON, default_pkgs=DEFAULT_PKGS, pip_install_flags=PIP_INSTALL_FLAGS):
+    """
+    Returns the key of the pool serving environments with the given interpreter and packages.
+
+    Args:
+        python (str): The python interpreter passed to virtualenv.
+        default_pkgs (list): The packages installed in the environments.
+        pip_install_flags (list): The flags passed to pip when installing the packages.
+
+    Returns:
+        str: The key.
+    """
+    content = json.dumps([python, sorted(default_pkgs), list(pip_install_flags)])
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()[:12]
+
+
+def get_pool_path(key=None, basefolder=ENVS_PATH):
+    """
+    Returns the path to where the pooled environments (with a given key) are stored.
+
+    Args:
+        key (str, optional): The key of the pool, if None the folder containing all pools is returned.
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        str: The path.
+    """
+    pool_path = os.path.join(basefolder, ".temp", _pool_folder_name)
+    if key is None:
+        return pool_path
+    return os.path.join(pool_path, key)
+
+
+def list_pool_keys(basefolder=ENVS_PATH):
+    """
+    Returns the keys of the existing pools.
+
+    Args:
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        list: list of str consisting of the keys.
+    """
+    pool_path = get_pool_path(basefolder=basefolder)
+    if not os.path.exists(pool_path):
+        return []
+    return sorted(key for key in os.listdir(pool_path) if os.path.isdir(os.path.join(pool_path, key)))
+
+
+def list_ready_environments(key, basefolder=ENVS_PATH):
+    """
+    Returns the names of the pooled environments which are ready to be claimed.
+
+    Args:
+        key (str): The key of the pool.
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        list: list of str consisting of the names of the environments.
+    """
+    key_path = get_pool_path(key, basefolder=basefolder)
+    if not os.path.exists(key_path):
+        return []
+    entries = set(os.listdir(key_path))
+    return sorted(entry for entry in entries if _is_ready(entry, entries))
+
+
+def _is_ready(entry, entries):
+    """Checks if an entry of a pool folder is an environment which is done being built."""
+    if entry.startswith('.') or entry.endswith(_building_suffix):
+        return False
+    return f"{entry}{_building_suffix}" not in entries
+
+
+def claim_environment(key, target_path, basefolder=ENVS_PATH):
+    """
+    Claims a ready environment from a pool by (atomically) renaming it to a target path.
+
+    Args:
+        key (str): The key of the pool.
+        target_path (str): The (absolute) path the environment should be moved to.
+            This should not exist or be an empty folder.
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        bool: Whether an environment was claimed.
+    """
+    key_path = get_pool_path(key, basefolder=basefolder)
+    for entry in list_ready_environments(key, basefolder=basefolder):
+        pooled_path = os.path.join(key_path, entry)
+        try:
+            os.rename(pooled_path, target_path)
+        except OSError:
+            # Claimed by someone else in the meantime
+            continue
+        relocate_environment(target_path, old_prefix=pooled_path)
+        return True
+    return False
+
+
+def building_marker(key_path, name):
+    """Returns the path to the file marking that a pooled environment is being built."""
+    return os.path.join(key_path, f"{name}{_building_suffix}")
+
+
+@contextmanager
+def pool_lock(key_path, blocking=False):
+    """
+    Context manager holding an exclusive lock on a pool, such that only one process fills it.
+
+    Args:
+        key_path (str): The path to the pool.
+        blocking (bool): Whether to wait for the lock.
+
+    Yields:
+        bool: Whether the lock was acquired.
+    """
+    os.makedirs(key_path, exist_ok=True)
+    with open(os.path.join(key_path, _lock_filename), 'w') as f:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(f, flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def spawn_replenisher(basefolder=ENVS_PATH):
+    """
+    Starts a detached process which fills the pool to the configured size.
+
+    Args:
+        basefolder (str): The folder containing the environments, whose pool is filled
+            (whatever the config resolved from the working directory of the process).
+    """
+    Popen(
+        [sys.executable, "-c", _replenisher_code.format(basefolder=os.path.abspath(basefolder))],
+        stdin=DEVNULL,
+        stdout=DEVNULL,
+        stderr=DEVNULL,
+        start_new_session=True,
+    )
@@ -0,0 +1,255 @@
+import os
+import sys
+import time
+import errno
+import fcntl
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from manven.tracing import traced, span
+
+# ioctl request to clone a file on Linux (from linux/fs.h)
+_FICLONE = 0x40049409
+
+
+@traced()
+def relocate_environment(path_to_venv, old_prefix):
+    """
+    Rewrites the absolute paths in an environment which has been moved.
+
+    Only the files known to hold the absolute path of the environment are touched,
+    i.e. ``pyvenv.cfg`` and the scripts in ``bin/`` (activate scripts and console-script shebangs).
+    Files are rewritten by replacing them, such that a file shared with another tree
+    (e.g. through a hardlink) is never modified in place.
+
+    Args:
+        path_to_venv (str): The current (absolute) path to the environment.
+        old_prefix (str): The (absolute) path the environment was created at.
+    """
+    if old_prefix == path_to_venv:
+        return
+    old = os.fsencode(old_prefix)
+    new = os.fsencode(path_to_venv)
+    for file_path in _files_with_prefix(path_to_venv):
+        _rewrite_prefix(file_path, old, new)
+
+
+def _files_with_prefix(path_to_venv):
+    """Yields the files in an environment which may contain its absolute path."""
+    pyvenv_cfg = os.path.join(path_to_venv, "pyvenv.cfg")
+    if os.path.isfile(pyvenv_cfg):
+        yield pyvenv_cfg
+    bin_folder = os.path.join(path_to_venv, "bin")
+    if not os.path.isdir(bin_folder):
+        return
+    with os.scandir(bin_folder) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False):
+                yield entry.path
+
+
+def _rewrite_prefix(file_path, old, new):
+    """
+    Replaces the bytes ``old`` with ``new`` in a text file.
+
+    Binary files (containing null bytes) are left untouched.
+    """
+    with open(file_path, 'rb') as f:
+        content = f.read()
+    if old not in content or b'\0' in content:
+        return
+    tmp_path = f"{file_path}.manven-tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content.replace(old, new))
+    os.chmod(tmp_path, os.stat(file_path).st_mode & 0o7777)
+    os.replace(tmp_path, file_path)
+
+
+@traced()
+def materialize_environment(source_path, target_path):
+    """
+    Materializes a copy of an environment by linking its files and relocating the copy.
+
+    Files are reflinked (copy-on-write) where the filesystem supports it and hardlinked otherwise,
+    falling back to regular copies if neither is possible (e.g. across filesystems).
+
+    Args:
+        source_path (str): The (absolute) path to the environment to copy.
+        target_path (str): The (absolute) path of the new environment, which should not exist.
+    """
+    link_file = _reflink
+    for folder, subfolders, files in os.walk(source_path):
+        target_folder = os.path.join(target_path, os.path.relpath(folder, source_path))
+        os.makedirs(target_folder)
+        for name in subfolders + files:
+            source = os.path.join(folder, name)
+            target = os.path.join(target_folder, name)
+            if os.path.islink(source):
+                os.symlink(os.readlink(source), target)
+            elif name in files:
+                link_file = _link_file(link_file, source, target)
+    relocate_environment(target_path, old_prefix=source_path)
+
+
+@traced()
+def clone_environment(source_path, target_path, hardlinks=False, jobs=None):
+    """
+    Clones an environment by copying its files in parallel and relocating the copy.
+
+    Files are reflinked (copy-on-write) where the filesystem supports it and otherwise copied by the kernel
+    (``copy_file_range``), or hardlinked if ``hardlinks``, falling back to regular copies.
+    The absolute path of the environment is only rewritten in the files known to contain it,
+    i.e. ``pyvenv.cfg``, the scripts in ``bin/``, ``.pth`` files and the ``RECORD`` of the installed distributions,
+    and symlinks pointing into the environment.
+
+    Args:
+        source_path (str): The (absolute) path to the environment to clone.
+        target_path (str): The (absolute) path of the new environment, which should not exist
+            (and is removed again if the clone fails).
+        hardlinks (bool): Whether to hardlink the files which are not rewritten instead of copying them.
+        jobs (int, optional): The number of threads copying files (default decided by ``ThreadPoolExecutor``).
+
+    Returns:
+        dict: The number of ``files`` and ``bytes`` copied and the ``seconds`` it took.
+    """
+    start = time.perf_counter()
+    os.makedirs(target_path)
+    try:
+        sizes, num_files = _clone_files(source_path, target_path, hardlinks, jobs)
+    except BaseException:
+        shutil.rmtree(target_path, ignore_errors=True)
+        raise
+    return {"files": num_files, "bytes": sum(sizes), "seconds": time.perf_counter() - start}
+
+
+def _clone_files(source_path, target_path, hardlinks, jobs):
+    """Copies the files of an environment to an existing folder, returns their sizes and number."""
+    old = os.fsencode(source_path)
+    new = os.fsencode(target_path)
+    to_copy = []
+    for folder, subfolders, files in os.walk(source_path):
+        relative_folder = os.path.relpath(folder, source_path)
+        target_folder = os.path.normpath(os.path.join(target_path, relative_folder))
+        if relative_folder != '.':
+            os.mkdir(target_folder)
+        for name in subfolders + files:
+            source = os.path.join(folder, name)
+            target = os.path.join(target_folder, name)
+            if os.path.islink(source):
+                os.symlink(relocate_link(os.readlink(source), source_path, target_path), target)
+            elif name in files:
+                to_copy.append((source, target, os.path.normpath(os.path.join(relative_folder, name))))
+
+    fallbacks = _link_methods if hardlinks else _copy_methods
+    # The last method which worked, shared by the threads such that unsupported methods are not retried for each file
+    working = [fallbacks[0]]
+
+    def clone_file(args):
+        source, target, relative_path = args
+        if may_embed_prefix(relative_path) and _copy_relocated(source, target, old, new):
+            return os.stat(source).st_size
+        working[0] = _link_file(working[0], source, target, fallbacks=fallbacks)
+        return os.stat(source).st_size
+
+    with span("copy_files", files=len(to_copy)) as s:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            sizes = list(executor.map(clone_file, to_copy))
+        s.set(bytes=sum(sizes))
+    return sizes, len(to_copy)
+
+
+def may_embed_prefix(relative_path):
+    """
+    Checks if a file in an environment may contain the absolute path of the environment.
+
+    Args:
+        relative_path (str): The path to the file relative to the environment.
+
+    Returns:
+        bool: True for ``pyvenv.cfg``, the scripts in ``bin/``, ``.pth`` files and ``RECORD`` files.
+    """
+    folder, name = os.path.split(relative_path)
+    return relative_path == "pyvenv.cfg" or folder == "bin" or name.endswith(".pth") or name == "RECORD"
+
+
+def relocate_link(link, source_path, target_path):
+    """
+    Returns the target of a copied symlink, pointing into the copy if the original pointed into the source.
+
+    Args:
+        link (str): The target of the original symlink.
+        source_path (str): The (absolute) path to the original environment.
+        target_path (str): The (absolute) path to the copy.
+
+    Returns:
+        str: The target of the copied symlink.
+    """
+    if os.path.isabs(link) and (link == source_path or link.startswith(source_path + os.sep)):
+        return target_path + link[len(source_path):]
+    return link
+
+
+def _copy_relocated(source, target, old, new):
+    """
+    Copies a text file containing ``old``, replacing it with ``new``.
+
+    Returns:
+        bool: Whether the file was copied, False if it does not contain ``old`` or is binary.
+    """
+    with open(source, 'rb') as f:
+        content = f.read()
+    if old not in content or b'\0' in content:
+        return False
+    with open(target, 'wb') as f:
+        f.write(content.replace(old, new))
+    shutil.copystat(source, target)
+    return True
+
+
+def _link_file(link_file, source, target, fallbacks=None):
+    """
+    Links a file using the given method, falling back to the next method if it's not supported.
+
+    Args:
+        fallbacks (list, optional): The methods to try in order (default reflink, hardlink and copy).
+
+    Returns:
+        function: The method which worked, to be used for the next file.
+    """
+    fallbacks = fallbacks or _link_methods
+    for method in fallbacks[fallbacks.index(link_file):]:
+        try:
+            method(source, target)
+        except OSError:
+            if os.path.lexists(target):
+                os.remove(target)
+            continue
+        return method
+    raise RuntimeError(f"Could not copy {source} to {target}")
+
+
+def _reflink(source, target):
+    """Creates a copy-on-write clone of a file (raises OSError if not supported)."""
+    if sys.platform != "linux":
+        raise OSError(errno.EOPNOTSUPP, "Reflinks are only supported on Linux")
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+    shutil.copystat(source, target)
+
+
+def _copy_file_range(source, target):
+    """Copies a file within the kernel (raises OSError if not supported, e.g. across filesystems on old kernels)."""
+    if not hasattr(os, "copy_file_range"):
+        raise OSError(errno.EOPNOTSUPP, "copy_file_range requires python 3.8")
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        remaining = os.fstat(src.fileno()).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+            if copied == 0:
+                break
+            remaining -= copied
+    shutil.copystat(source, target)
+
+
+_link_methods = [_reflink, os.link, shutil.copy2]
+_copy_methods = [_reflink, _copy_file_range, shutil.copy2]
@@ -0,0 +1,175 @@
+import os
+import json
+import fcntl
+import hashlib
+from contextlib import contextmanager
+
+from manven.creation import resolve_python
+from manven.settings import ENVS_PATH
+
+_requirements_folder_name = ".requirements"
+_marker_filename = ".manven-requirements"
+_hash_length = 16
+
+
+def get_requirements_path(basefolder=ENVS_PATH):
+    """
+    Returns the path to where the environments keyed by the hash of their requirements are stored.
+
+    Args:
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        str: The path.
+    """
+    return os.path.join(basefolder, _requirements_folder_name)
+
+
+def normalize_requirements(file_path):
+    """
+    Reads a requirements file and returns its requirements in a canonical form.
+
+    Comments, blank lines and repeated whitespace are removed and the requirements are sorted,
+    such that files only differing in formatting or order give the same requirements.
+    Nested files (``-r other.txt``) are not followed.
+
+    Args:
+        file_path (str): The path to the requirements file.
+
+    Returns:
+        list: list of str consisting of the requirements.
+    """
+    requirements = set()
+    with open(file_path, 'r') as f:
+        for line in f:
+            if line.lstrip().startswith('#'):
+                continue
+            line = line.split(' #')[0]
+            line = ' '.join(line.split())
+            if line:
+                requirements.add(line)
+    return sorted(requirements)
+
+
+def get_requirements_hash(requirements, python='', default_pkgs=(), pip_install_flags=(), virtualenv_ops=None):
+    """
+    Returns the key of an environment satisfying a set of requirements.
+
+    Args:
+        requirements (list): The normalized requirements, see ``normalize_requirements``.
+        python (str): The interpreter of the environment (default the current one).
+        default_pkgs (list): The packages installed in addition to the requirements.
+        pip_install_flags (list): The flags passed to pip.
+        virtualenv_ops (dict, optional): Other options the environment is created with.
+
+    Returns:
+        str: The key.
+    """
+    content = json.dumps({
+        "requirements": list(requirements),
+        "python": resolve_python(python),
+        "default_pkgs": sorted(default_pkgs),
+        "pip_install_flags": list(pip_install_flags),
+        "virtualenv_ops": {option: value for option, value in (virtualenv_ops or {}).items() if value},
+    }, sort_keys=True)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()[:_hash_length]
+
+
+def is_built(key, basefolder=ENVS_PATH):
+    """
+    Checks if the environment for a key was completely built.
+
+    Args:
+        key (str): The key, see ``get_requirements_hash``.
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        bool: Whether the environment exists and is tagged with the key.
+    """
+    marker_path = os.path.join(get_requirements_path(basefolder=basefolder), key, _marker_filename)
+    if not os.path.exists(marker_path):
+        return False
+    with open(marker_path, 'r') as f:
+        return f.read().strip() == key
+
+
+def mark_built(key, basefolder=ENVS_PATH):
+    """
+    Tags the environment for a key as completely built, which also marks it as used.
+
+    Args:
+        key (str): The key, see ``get_requirements_hash``.
+        basefolder (str): The folder containing the environments.
+    """
+    marker_path = os.path.join(get_requirements_path(basefolder=basefolder), key, _marker_filename)
+    with open(marker_path, 'w') as f:
+        f.write(key)
+
+
+def mark_used(key, basefolder=ENVS_PATH):
+    """
+    Marks the environment for a key as the most recently used.
+
+    Args:
+        key (str): The key, see ``get_requirements_hash``.
+        basefolder (str): The folder containing the environments.
+    """
+    os.utime(os.path.join(get_requirements_path(basefolder=basefolder), key, _marker_filename))
+
+
+def list_cached_environments(basefolder=ENVS_PATH):
+    """
+    Returns the keys of the completely built environments, the most recently used first.
+
+    Args:
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        list: list of str consisting of the keys.
+    """
+    requirements_path = get_requirements_path(basefolder=basefolder)
+    if not os.path.exists(requirements_path):
+        return []
+    last_used = {}
+    for key in os.listdir(requirements_path):
+        marker_path = os.path.join(requirements_path, key, _marker_filename)
+        if not key.startswith('.') and os.path.exists(marker_path):
+            last_used[key] = os.stat(marker_path).st_mtime
+    return sorted(last_used, key=last_used.get, reverse=True)
+
+
+def get_evictable_environments(cache_size, keep=(), basefolder=ENVS_PATH):
+    """
+    Returns the least recently used environments exceeding the size of the cache.
+
+    Args:
+        cache_size (int): The number of environments to keep.
+        keep (iterable): Keys which should never be evicted (e.g. the active environment).
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        list: list of str consisting of the keys.
+    """
+    cached = list_cached_environments(basefolder=basefolder)
+    kept = [key for key in cached if key in keep]
+    others = [key for key in cached if key not in keep]
+    return others[max(cache_size - len(kept), 0):]
+
+
+@contextmanager
+def build_lock(key, basefolder=ENVS_PATH):
+    """
+    Context manager holding an exclusive lock on a key, such that its environment is built by only one process.
+
+    Args:
+        key (str): The key, see ``get_requirements_hash``.
+        basefolder (str): The folder containing the environments.
+    """
+    requirements_path = get_requirements_path(basefolder=basefolder)
+    os.makedirs(requirements_path, exist_ok=True)
+    with open(os.path.join(requirements_path, f".{key}.lock"), 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -1,48 +1,163 @@
 import os
-from configparser import ConfigParser
+import time
+from functools import lru_cache
 
 import manven
+from manven.tracing import span
+
+_config_filename = f".{manven.__name__}.conf"
+_cache_header = "manven-config-cache 1"
+# Number of config files whose parsed values are kept in the cache
+_max_cached_files = 16
 
 
 def _get_config():
     """
-    Returns the config.
+    Returns the config from the first existing config file, see ``_get_candidate_files``.
+
+    The parsed values are cached (in the cache folder of the user) and only parsed again
+    if the file changed, such that resolving the config normally only needs to stat the candidate files.
 
     Returns:
-        dict: A dictionary containing the settings.
+        tuple: dict with the settings (None if there is no config file), the path to the file (or None)
+            and whether the settings came from the cache.
     """
-    for config_function in _config_functions:
-        config = config_function()
-        if config is not None:
-            return config
+    for file_path in _get_candidate_files(os.getcwd()):
+        signature = _get_signature(file_path)
+        if signature is None:
+            continue
+        cache = _read_cache()
+        if file_path in cache and cache[file_path][0] == signature:
+            return cache[file_path][1], file_path, True
+        config = _load_config(file_path)
+        cache.pop(file_path, None)
+        cache[file_path] = (signature, config)
+        _write_cache(cache)
+        return config, file_path, False
+    return None, None, False
 
-    raise RuntimeError("Something went wrong, didn't get any config")
 
+def _get_candidate_files(directory):
+    """
+    Returns the paths where a config file is looked for, in order of priority:
 
-def _config_from_cwd():
-    file_path = os.path.join(os.getcwd(), f".{manven.__name__}.conf")
-    return _load_config(file_path)
+    1. ``.manven.conf`` in the directory or the closest of its parents, up to the home directory
+       or a mount point (see ``_get_project_candidates``).
+    2. ``.manven.conf`` in the home directory.
+    3. ``manven.conf`` in ``~/.config/manven/``.
+    """
+    return [
+        *_get_project_candidates(directory),
+        os.path.expanduser(f"~/{_config_filename}"),
+        os.path.expanduser(f"~/.config/{manven.__name__}/{manven.__name__}.conf"),
+    ]
 
 
-def _config_from_home():
-    file_path = os.path.expanduser(f"~/.{manven.__name__}.conf")
-    return _load_config(file_path)
+@lru_cache(maxsize=None)
+def _get_project_candidates(directory):
+    """
+    Returns the paths to ``.manven.conf`` in a directory and its parents (memoized per directory).
 
+    The walk stops below the home directory (whose file is a candidate of its own) and at mount points,
+    such that a config in a shared folder like ``/tmp`` is not picked up when working somewhere below it.
+    """
+    if directory == os.path.realpath(os.path.expanduser("~")):
+        return ()
+    parent = os.path.dirname(directory)
+    candidates = [os.path.join(directory, _config_filename)]
+    if parent != directory and not os.path.ismount(directory):
+        candidates += _get_project_candidates(parent)
+    return tuple(candidates)
 
-def _config_from_dot_config():
-    file_path = os.path.expanduser(f"~/.config/{manven.__name__}/{manven.__name__}.conf")
-    return _load_config(file_path)
+
+def _get_signature(file_path):
+    """Returns what identifies the version of a file (None if it does not exist or is owned by another user)."""
+    try:
+        stat = os.stat(file_path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    if stat.st_uid != os.getuid():
+        return None
+    return f"{stat.st_mtime_ns}-{stat.st_size}-{stat.st_ino}"
 
 
 def _load_config(file_path):
-    if os.path.exists(file_path):
-        cfg = ConfigParser()
-        cfg.read(file_path)
-        if 'manven' not in cfg:
-            raise RuntimeError("A config file must have a section ['manven'].")
-        return cfg['manven']
-    else:
-        return None
+    from configparser import ConfigParser
+
+    cfg = ConfigParser()
+    cfg.read(file_path)
+    if 'manven' not in cfg:
+        raise RuntimeError("A config file must have a section ['manven'].")
+    return dict(cfg['manven'])
+
+
+def _get_cache_file():
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser(os.path.join("~", ".cache"))
+    return os.path.join(cache_home, manven.__name__, "config")
+
+
+def _read_cache():
+    """
+    Reads the cached configs, stored as lines ``file<TAB>path<TAB>signature`` each followed
+    by the lines ``key<TAB>value`` of that file (with tabs, newlines and backslashes escaped),
+    to not need to import a parser.
+
+    Returns:
+        dict: Mapping from the path of each config file to a tuple of its signature and settings.
+    """
+    cache = {}
+    try:
+        with open(_get_cache_file(), 'r') as f:
+            lines = f.read().split('\n')
+    except (FileNotFoundError, NotADirectoryError):
+        return cache
+    if not lines or lines[0] != _cache_header:
+        return cache
+    config = None
+    for line in lines[1:]:
+        fields = [_unescape(field) for field in line.split('\t')]
+        if len(fields) == 3 and fields[0] == "file":
+            config = {}
+            cache[fields[1]] = (fields[2], config)
+        elif len(fields) == 2 and config is not None:
+            config[fields[0]] = fields[1]
+    return cache
+
+
+def _write_cache(cache):
+    """Writes the cached configs atomically, keeping the most recently parsed ones."""
+    lines = [_cache_header]
+    for file_path, (signature, config) in list(cache.items())[-_max_cached_files:]:
+        lines.append('\t'.join(["file", _escape(file_path), signature]))
+        lines += ['\t'.join([_escape(key), _escape(value)]) for key, value in config.items()]
+    cache_file = _get_cache_file()
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w') as f:
+            f.write('\n'.join(lines))
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        # The cache is only an optimization, e.g. the home directory could be read-only
+        pass
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+
+def _unescape(value):
+    if '\\' not in value:
+        return value
+    chars, i = [], 0
+    while i < len(value):
+        if value[i] == '\\' and i + 1 < len(value):
+            chars.append({'t': '\t', 'n': '\n'}.get(value[i + 1], value[i + 1]))
+            i += 2
+        else:
+            chars.append(value[i])
+            i += 1
+    return ''.join(chars)
 
 
 def _config_from_defaults():
@@ -50,6 +165,17 @@ def _config_from_defaults():
         "envs_path": "~/venvs",
         "default_pkgs": ["manven"],
         "pip_install_flags": '',
+        "pool_size": 0,
+        "pool_python": '',
+        "creation_backend": "virtualenv",
+        "requirements_cache_size": 10,
+        "dedupe_after_install": False,
+        "temp_ttl": '',
+        "temp_max_bytes": '',
+        "temp_max_count": '',
+        "clone_backend": "native",
+        "clone_hardlinks": False,
+        "installer": "pip",
     }
 
 
@@ -59,22 +185,82 @@ def _parse_default_pkgs(default_pkgs):
     elif isinstance(default_pkgs, str):
         default_pkgs = default_pkgs.lstrip('[').rstrip(']')
         default_pkgs = default_pkgs.split(',')
-        default_pkgs = [pkg.strip() for pkg in default_pkgs]
+        default_pkgs = [pkg.strip() for pkg in default_pkgs if pkg.strip()]
     else:
         raise TypeError(f"Unsupported type for, {type(default_pkgs)}, default_pkgs")
     return default_pkgs
 
 
-_config_functions = [
-    _config_from_cwd,
-    _config_from_home,
-    _config_from_dot_config,
-    _config_from_defaults,
-]
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    if value.strip().lower() in ("1", "yes", "true", "on"):
+        return True
+    if value.strip().lower() in ("", "0", "no", "false", "off"):
+        return False
+    raise ValueError(f"Expected a boolean but got {value}")
+
+
+def _parse_with_suffix(value, suffixes):
+    """Parses e.g. ``7d`` or ``10G`` given the factors of the suffixes, returns None if empty."""
+    value = str(value).strip()
+    if not value:
+        return None
+    number, factor = value, 1
+    if value[-1].lower() in suffixes:
+        number, factor = value[:-1], suffixes[value[-1].lower()]
+    try:
+        return int(float(number) * factor)
+    except ValueError:
+        raise ValueError(f"Cannot parse {value}, expected a number optionally followed by one of {list(suffixes)}")
+
+
+def _parse_duration(value):
+    return _parse_with_suffix(value, {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60, "w": 7 * 24 * 60 * 60})
+
+
+def _parse_bytes(value):
+    return _parse_with_suffix(value, {"b": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4})
 
 
-_config = _config_from_defaults()
-_config.update(_get_config())
+with span("load_config") as _span:
+    _start = time.perf_counter()
+    _config = _config_from_defaults()
+    _file_config, CONFIG_FILE, _from_cache = _get_config()
+    if _file_config is not None:
+        _config.update(_file_config)
+    _span.set(file=CONFIG_FILE, cached=_from_cache)
 ENVS_PATH = os.path.expanduser(_config["envs_path"])
 DEFAULT_PKGS = _parse_default_pkgs(_config["default_pkgs"])
 PIP_INSTALL_FLAGS = [f for f in _config['pip_install_flags'].split(' ') if f]
+POOL_SIZE = int(_config['pool_size'])
+POOL_PYTHON = _config['pool_python']
+CREATION_BACKEND = _config['creation_backend']
+REQUIREMENTS_CACHE_SIZE = int(_config['requirements_cache_size'])
+DEDUPE_AFTER_INSTALL = _parse_bool(_config['dedupe_after_install'])
+TEMP_TTL = _parse_duration(_config['temp_ttl'])
+TEMP_MAX_BYTES = _parse_bytes(_config['temp_max_bytes'])
+TEMP_MAX_COUNT = _parse_with_suffix(_config['temp_max_count'], {})
+CLONE_BACKEND = _config['clone_backend']
+CLONE_HARDLINKS = _parse_bool(_config['clone_hardlinks'])
+INSTALLER = _config['installer']
+
+# How the config was resolved, see ``explain_config``
+_resolution = {
+    "file": CONFIG_FILE,
+    "candidates": _get_candidate_files(os.getcwd()),
+    "cached": _from_cache,
+    "duration": time.perf_counter() - _start,
+}
+
+
+def explain_config():
+    """
+    Explains how the config was resolved.
+
+    Returns:
+        dict: With the keys ``file`` (the file used, None if only defaults), ``candidates``
+            (the files looked for, in order of priority), ``cached`` (whether the parsed file came from the cache),
+            ``duration`` (the time it took in seconds) and ``settings`` (the resolved settings).
+    """
+    return {**_resolution, "settings": dict(_config)}
@@ -0,0 +1,68 @@
+import os
+import sys
+import shlex
+
+from manven.state import SOURCE_EXIT_CODE, SESSION_VARIABLE, TO_EXECUTE_SUFFIX
+
+_posix_template = """\
+manven() {{
+    {session_variable}=$$ command {python} {cli} "$@"
+    local manven_status=$?
+    if [ $manven_status -eq {source_exit_code} ]; then
+        source {runtime_dir}/$${to_execute_suffix}
+        return $?
+    fi
+    return $manven_status
+}}
+"""
+
+_fish_template = """\
+function manven
+    set -lx {session_variable} $fish_pid
+    command {python} {cli} $argv
+    set -l manven_status $status
+    if test $manven_status -eq {source_exit_code}
+        source {runtime_dir}/$fish_pid{to_execute_suffix}
+        return $status
+    end
+    return $manven_status
+end
+"""
+
+_shell_templates = {
+    "bash": (_posix_template, shlex.quote),
+    "zsh": (_posix_template, shlex.quote),
+    "fish": (_fish_template, lambda value: "'" + value.replace('\\', '\\\\').replace("'", "\\'") + "'"),
+}
+
+SHELLS = sorted(_shell_templates)
+
+
+def get_init_script(shell, runtime_dir):
+    """
+    Returns the definition of a shell function ``manven`` to be evaluated in the rc file of the shell.
+
+    The function runs a single python process per command and only sources the file to execute
+    if the command asked for it, which it signals by exiting with ``SOURCE_EXIT_CODE``.
+    The interpreter and path to the package are resolved now and cached in the function,
+    which identifies the session by the pid of the shell such that concurrent shells do not share state.
+
+    Args:
+        shell (str): The name of the shell, one of ``SHELLS``.
+        runtime_dir (str): The folder with the per-session files of commands to be sourced.
+
+    Returns:
+        str: The definition of the function.
+    """
+    if shell not in _shell_templates:
+        raise ValueError(f"Unknown shell {shell}")
+    template, quote = _shell_templates[shell]
+    path_to_package = os.path.dirname(os.path.abspath(__file__))
+    return template.format(
+        python=quote(sys.executable),
+        cli=quote(os.path.join(path_to_package, "main.py")),
+        runtime_dir=quote(runtime_dir),
+        to_execute_suffix=TO_EXECUTE_SUFFIX,
+        session_variable=SESSION_VARIABLE,
+        source_exit_code=SOURCE_EXIT_CODE,
+    )
@@ -0,0 +1,252 @@
+import os
+import io
+import stat
+import json
+import time
+import gzip
+import uuid
+import shutil
+import hashlib
+import tarfile
+
+from manven.relocate import may_embed_prefix, relocate_link
+from manven.installers import get_installer
+from manven.tracing import traced
+
+SNAPSHOT_VERSION = 1
+# The first member of the archive, describing the environment
+_header_name = "manven-snapshot.json"
+# The last member of the archive, with the installed distributions and the hashes of the files
+_manifest_name = "manven-manifest.json"
+# The folder in the archive containing the files of the environment
+_files_folder = "env"
+_compress_level = 6
+_chunk_size = 1024 * 1024
+
+
+@traced()
+def create_snapshot(path_to_venv, fileobj):
+    """
+    Writes an environment to a gzipped tar archive.
+
+    The archive is streamed, i.e. written while walking the environment without staging a copy,
+    such that ``fileobj`` can also be a pipe. The header (the first member) holds the path of the environment
+    and the manifest (the last member) the installed distributions and the sha256 of each file.
+
+    Args:
+        path_to_venv (str): The (absolute) path to the environment.
+        fileobj: Binary file-like object to write the archive to.
+
+    Returns:
+        dict: The number of ``files`` and ``bytes`` (uncompressed) written.
+    """
+    hashes = {}
+    num_bytes = 0
+    with gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=_compress_level) as compressed, \
+            tarfile.open(fileobj=compressed, mode='w|', format=tarfile.PAX_FORMAT) as archive:
+        header = {
+            "version": SNAPSHOT_VERSION,
+            "name": os.path.basename(os.path.normpath(path_to_venv)),
+            "prefix": path_to_venv,
+            "created": time.time(),
+        }
+        _add_json(archive, _header_name, header)
+        for folder, subfolders, files in os.walk(path_to_venv):
+            subfolders.sort()
+            for name in sorted(subfolders + files):
+                path = os.path.join(folder, name)
+                relative_path = os.path.relpath(path, path_to_venv)
+                info = _get_tarinfo(path, f"{_files_folder}/{relative_path}")
+                if info.isreg():
+                    with open(path, 'rb') as f:
+                        reader = _HashingReader(f)
+                        archive.addfile(info, reader)
+                    hashes[relative_path] = reader.hexdigest()
+                    num_bytes += info.size
+                elif info.isdir() or info.issym():
+                    archive.addfile(info)
+                # Other types (e.g. sockets) are not part of an environment and are skipped
+        manifest = {"distributions": get_installer(path_to_venv).list_installed(), "files": hashes}
+        _add_json(archive, _manifest_name, manifest)
+    return {"files": len(hashes), "bytes": num_bytes}
+
+
+@traced()
+def restore_snapshot(fileobj, basefolder, environment_name=None):
+    """
+    Extracts a snapshot (see ``create_snapshot``) to a new environment, without accessing the network.
+
+    The archive is streamed, files are extracted to a folder next to the environment which is renamed to it
+    once every file has been checked against the manifest. The absolute path of the original environment is rewritten
+    in the files known to contain it, see ``manven.relocate.may_embed_prefix``.
+    Members with unsafe paths (absolute or outside the environment) and other types than files, folders
+    and symlinks are refused. Symlinks are created after all files, such that no file is written through one.
+
+    Args:
+        fileobj: Binary file-like object to read the archive from.
+        basefolder (str): The folder to contain the environment.
+        environment_name (str, optional): The name of the new environment (default the name in the snapshot),
+            which should not exist.
+
+    Returns:
+        dict: The header of the snapshot (with the ``name`` of the restored environment), the number of ``files``
+            and ``bytes`` extracted and the installed ``distributions``.
+
+    Raises:
+        ValueError: If the name of the environment is not a plain folder name, e.g. ``../name`` or ``.name``.
+        RuntimeError: If the interpreter the environment was created with does not exist on this machine.
+    """
+    with tarfile.open(fileobj=fileobj, mode='r|gz') as archive:
+        header = _read_header(archive)
+        if environment_name is not None:
+            header["name"] = environment_name
+        _check_name(header["name"])
+        target_path = os.path.join(basefolder, header["name"])
+        if os.path.lexists(target_path):
+            raise ValueError(f"Environment {header['name']} already exists")
+        staging_path = os.path.join(basefolder, f".{header['name']}.restoring-{uuid.uuid4().hex[:8]}")
+        os.makedirs(staging_path)
+        try:
+            stats = _extract_members(archive, header, staging_path, target_path)
+            os.rename(staging_path, target_path)
+        except BaseException:
+            shutil.rmtree(staging_path, ignore_errors=True)
+            raise
+    python = os.path.join(target_path, "bin", "python")
+    if os.path.lexists(python) and not os.path.exists(python):
+        shutil.rmtree(target_path, ignore_errors=True)
+        raise RuntimeError(f"The interpreter of the snapshot ({os.path.realpath(python)}) is not available")
+    return {**header, **stats}
+
+
+def _extract_members(archive, header, staging_path, target_path):
+    """Extracts the files of the environment and checks them against the manifest."""
+    old = os.fsencode(header["prefix"])
+    new = os.fsencode(target_path)
+    hashes = {}
+    num_bytes = 0
+    links = []
+    folders = []
+    manifest = None
+    for member in archive:
+        if member.name == _header_name:
+            # Iterating the archive starts over with the members read so far
+            continue
+        if member.name == _manifest_name:
+            manifest = json.load(archive.extractfile(member))
+            continue
+        relative_path = _get_relative_path(member.name)
+        path = os.path.join(staging_path, relative_path) if relative_path != '.' else staging_path
+        if member.isdir():
+            os.makedirs(path, exist_ok=True)
+            folders.append((path, member))
+        elif member.issym():
+            links.append((path, relocate_link(member.linkname, header["prefix"], target_path)))
+        elif member.isreg():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            hashes[relative_path] = _extract_file(archive.extractfile(member), path, may_embed_prefix(relative_path),
+                                                  old, new)
+            os.chmod(path, member.mode & 0o7777)
+            os.utime(path, (member.mtime, member.mtime))
+            num_bytes += member.size
+        else:
+            raise ValueError(f"Refusing to extract {member.name} of unsupported type")
+    if manifest is None:
+        raise ValueError("The snapshot is incomplete, it has no manifest")
+    if hashes != manifest["files"]:
+        corrupted = sorted(set(hashes.items()) ^ set(manifest["files"].items()))
+        raise ValueError(f"The snapshot is corrupted, e.g. {corrupted[0][0]} does not match its manifest")
+    for path, link in links:
+        os.symlink(link, path)
+    # Modes and times of folders are set last, since creating their content changes them
+    for path, member in reversed(folders):
+        os.chmod(path, member.mode & 0o7777)
+        os.utime(path, (member.mtime, member.mtime))
+    return {"files": len(hashes), "bytes": num_bytes, "distributions": manifest["distributions"]}
+
+
+def _extract_file(source, path, relocate, old, new):
+    """Writes a file from the archive, rewriting ``old`` by ``new`` if ``relocate``, and returns its original sha256."""
+    sha = hashlib.sha256()
+    with open(path, 'wb') as f:
+        if relocate:
+            content = source.read()
+            sha.update(content)
+            f.write(content if b'\0' in content else content.replace(old, new))
+        else:
+            for chunk in iter(lambda: source.read(_chunk_size), b''):
+                sha.update(chunk)
+                f.write(chunk)
+    return sha.hexdigest()
+
+
+def _get_relative_path(name):
+    """Returns the path of a member relative to the environment, refusing paths outside of it."""
+    parts = name.split('/')
+    if parts[0] != _files_folder or name.startswith('/') or '..' in parts:
+        raise ValueError(f"Refusing to extract {name} which is outside of the environment")
+    return os.path.join(*parts[1:]) if len(parts) > 1 and parts[1] else '.'
+
+
+def _check_name(name):
+    """Refuses names which would put the environment outside of the base folder or hide it."""
+    if not isinstance(name, str) or not name or os.sep in name or name == '..' or name.startswith('.'):
+        raise ValueError(f"Refusing to restore an environment named {name!r}")
+
+
+def _read_header(archive):
+    member = archive.next()
+    if member is None or member.name != _header_name:
+        raise ValueError("Not a snapshot of an environment")
+    header = json.load(archive.extractfile(member))
+    if header["version"] > SNAPSHOT_VERSION:
+        raise ValueError(f"The snapshot has version {header['version']}, upgrade manven to restore it")
+    return header
+
+
+def _get_tarinfo(path, arcname):
+    """
+    Returns the member for a file, folder or symlink (other types get no type).
+
+    Unlike ``TarFile.gettarinfo`` hardlinked files are stored as regular files,
+    such that a deduplicated environment (see ``manven.store``) can be extracted anywhere.
+    """
+    st = os.lstat(path)
+    info = tarfile.TarInfo(arcname)
+    info.mode = stat.S_IMODE(st.st_mode)
+    info.mtime = int(st.st_mtime)
+    if stat.S_ISREG(st.st_mode):
+        info.size = st.st_size
+    elif stat.S_ISDIR(st.st_mode):
+        info.type = tarfile.DIRTYPE
+    elif stat.S_ISLNK(st.st_mode):
+        info.type = tarfile.SYMTYPE
+        info.linkname = os.readlink(path)
+    else:
+        info.type = tarfile.FIFOTYPE
+    return info
+
+
+def _add_json(archive, name, content):
+    data = json.dumps(content, sort_keys=True).encode('utf-8')
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    info.mode = 0o644
+    archive.addfile(info, io.BytesIO(data))
+
+
+class _HashingReader:
+    """File-like object computing the sha256 of what is read from another one."""
+
+    def __init__(self, f):
+        self._f = f
+        self._sha = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self._sha.update(data)
+        return data
+
+    def hexdigest(self):
+        return self._sha.hexdigest()
@@ -0,0 +1,191 @@
+import os
+import time
+import threading
+
+# Exit code used by the CLI to tell the shell that it should source the file to execute
+SOURCE_EXIT_CODE = 100
+
+# Environment variable set by the shell integration to identify the session (otherwise the parent process is used)
+SESSION_VARIABLE = "MANVEN_SESSION"
+TO_EXECUTE_SUFFIX = ".sh"
+_last_env_suffix = ".last"
+_last_env_filename = "last_env"
+_first_usage_filename = "initialized"
+
+# Session files older than this are removed even if the process of the session still exists
+_stale_session_age = 7 * 24 * 60 * 60
+
+
+def get_runtime_dir():
+    """
+    Returns the folder where the per-session state is kept.
+
+    This is ``$XDG_RUNTIME_DIR/manven`` or, if not set, ``manven-<uid>`` in ``$TMPDIR`` (``/tmp`` by default).
+
+    Returns:
+        str: The path.
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "manven")
+    return os.path.join(os.environ.get("TMPDIR") or "/tmp", f"manven-{os.getuid()}")
+
+
+def get_state_dir():
+    """
+    Returns the folder where the per-user state is kept, i.e. ``$XDG_STATE_HOME/manven``
+    (``~/.local/state/manven`` by default).
+
+    Returns:
+        str: The path.
+    """
+    state_home = os.environ.get("XDG_STATE_HOME") or os.path.expanduser(os.path.join("~", ".local", "state"))
+    return os.path.join(state_home, "manven")
+
+
+def get_session():
+    """
+    Returns the key of the current shell session.
+
+    Returns:
+        str: The value of ``MANVEN_SESSION`` if set, otherwise the pid of the parent process (the shell).
+    """
+    session = os.environ.get(SESSION_VARIABLE) or str(os.getppid())
+    return ''.join(c if c.isalnum() or c in "-_" else '_' for c in session)
+
+
+_session = get_session()
+TO_EXECUTE_FILE = os.path.join(get_runtime_dir(), f"{_session}{TO_EXECUTE_SUFFIX}")
+LAST_ENV = os.path.join(get_runtime_dir(), f"{_session}{_last_env_suffix}")
+
+
+def reset_to_execute():
+    """
+    Resets what commands that should be executed in the shell.
+    """
+    _write_atomically(TO_EXECUTE_FILE, '')
+
+
+def has_to_execute():
+    """
+    Checks if there are commands that should be executed in the shell.
+
+    Returns:
+        bool: Whether the file with commands to be executed is non-empty.
+    """
+    return os.path.exists(TO_EXECUTE_FILE) and os.path.getsize(TO_EXECUTE_FILE) > 0
+
+
+def check_first_usage():
+    """
+    Checks if this is the first time manven is run (by this user) and prints some information.
+    """
+    marker = os.path.join(get_state_dir(), _first_usage_filename)
+    if os.path.exists(marker):
+        return
+    input("It looks like it's the first time you're using manven.\n"
+          "Next time you won't see this message.\n"
+          "Since manven sometimes needs to source certain files, "
+          "it is recommended that you add the following to the rc file of your shell:\n"
+          "\n"
+          "eval \"$(manven init bash)\"\n"
+          "\n"
+          "If you're using zsh or fish, replace bash by zsh or fish (for fish, use 'manven init fish | source').\n"
+          "\n"
+          "Press enter to continue...")
+    _write_atomically(marker, '')
+
+
+def write_execute_to_file(args):
+    """
+    Writes (replaces) commands to be executed to the file of the session.
+
+    Args:
+        args (list): The command (and its arguments) to be executed.
+    """
+    _write_atomically(TO_EXECUTE_FILE, ' '.join(args))
+
+
+def update_last_activated_environment(environment_name, basefolder):
+    """
+    Updates the last activated environment, both of the session and of the user.
+
+    Args:
+        environment_name (str): The name of the environment.
+        basefolder (str): The folder to contain the environment.
+    """
+    content = f"{environment_name}\n{basefolder}"
+    _write_atomically(LAST_ENV, content)
+    _write_atomically(os.path.join(get_state_dir(), _last_env_filename), content)
+
+
+def read_last_activated_environment():
+    """
+    Reads the last activated environment of the session, or of the user if none was activated in the session.
+
+    Returns:
+        tuple or None: The name of the environment and the folder containing it,
+            or None if no environment has been activated yet.
+    """
+    for file_path in [LAST_ENV, os.path.join(get_state_dir(), _last_env_filename)]:
+        if os.path.exists(file_path):
+            with open(file_path, 'r') as f:
+                environment_name, basefolder = f.read().split('\n')
+            return environment_name, basefolder
+    return None
+
+
+def cleanup_stale_sessions(max_age=_stale_session_age):
+    """
+    Removes the files of sessions whose shell has exited or which have not been used for a while.
+
+    Args:
+        max_age (float): The time (in seconds) after which the files of a session are removed anyway.
+
+    Returns:
+        list: list of str consisting of the removed sessions.
+    """
+    runtime_dir = get_runtime_dir()
+    if not os.path.exists(runtime_dir):
+        return []
+    now = time.time()
+    removed = set()
+    for entry in os.scandir(runtime_dir):
+        session, ext = os.path.splitext(entry.name)
+        if session == _session or ext not in (TO_EXECUTE_SUFFIX, _last_env_suffix):
+            continue
+        try:
+            stale = not _is_alive(session) or entry.stat().st_mtime < now - max_age
+            if stale:
+                os.remove(entry.path)
+                removed.add(session)
+        except FileNotFoundError:
+            # Removed by another process in the meantime
+            continue
+    return sorted(removed)
+
+
+def _is_alive(session):
+    """Checks if the process of a session (if it's a pid) still exists."""
+    if not session.isdigit():
+        return True
+    try:
+        os.kill(int(session), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _write_atomically(file_path, content):
+    """Writes a file by writing a temporary file and renaming it."""
+    folder = os.path.dirname(file_path)
+    os.makedirs(folder, mode=0o700, exist_ok=True)
+    if os.stat(folder).st_uid != os.getuid():
+        # E.g. someone else created the folder in the shared temporary folder
+        raise RuntimeError(f"The folder {folder} is not owned by the current user")
+    tmp_path = f"{file_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+    os.replace(tmp_path, file_path)
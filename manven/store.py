@@ -0,0 +1,158 @@
+import os
+import glob
+import stat
+import uuid
+import hashlib
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor
+
+from manven.settings import ENVS_PATH
+
+_store_folder_name = ".store"
+
+# Files which are written differently in each environment (or rewritten in place) and therefore never shared
+_skipped_patterns = [
+    "*.pth",
+    "RECORD",
+    "INSTALLER",
+    "REQUESTED",
+    "direct_url.json",
+    "*.egg-link",
+    "__editable__*",
+]
+
+_chunk_size = 1 << 20
+# Number of times linking a file to the store is tried, if the file in the store is removed in the meantime
+_link_attempts = 3
+
+
+def get_store_path(basefolder=ENVS_PATH):
+    """
+    Returns the path to the store of files shared (hardlinked) between environments.
+
+    Args:
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        str: The path.
+    """
+    return os.path.join(basefolder, _store_folder_name)
+
+
+def dedupe_environment(path_to_venv, basefolder=ENVS_PATH):
+    """
+    Replaces the files in the site-packages of an environment by hardlinks to identical files in the store.
+
+    Files not yet in the store are added to it. Files are identified by the hash of their content and their
+    permissions, and files which are rewritten per environment (``.pth``, ``RECORD``, ...) are skipped.
+
+    Args:
+        path_to_venv (str): The path to the environment.
+        basefolder (str): The folder containing the environments (and the store).
+
+    Returns:
+        tuple: The number of files replaced by hardlinks and the number of bytes reclaimed.
+    """
+    store_path = get_store_path(basefolder=basefolder)
+    linked, reclaimed = 0, 0
+    for site_packages in glob.glob(os.path.join(path_to_venv, "lib", "python*", "site-packages")):
+        for root, _, files in os.walk(site_packages):
+            for filename in files:
+                if _is_skipped(filename):
+                    continue
+                size = _dedupe_file(os.path.join(root, filename), store_path)
+                if size is not None:
+                    linked += 1
+                    reclaimed += size
+    return linked, reclaimed
+
+
+def dedupe_environments(paths, jobs=None, basefolder=ENVS_PATH):
+    """
+    Deduplicates the files of many environments in parallel, see ``dedupe_environment``.
+
+    Args:
+        paths (list): The paths to the environments.
+        jobs (int, optional): The number of threads to use (default decided by ``ThreadPoolExecutor``).
+        basefolder (str): The folder containing the environments (and the store).
+
+    Returns:
+        tuple: The total number of files replaced by hardlinks and the total number of bytes reclaimed.
+    """
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = list(executor.map(lambda path: dedupe_environment(path, basefolder=basefolder), paths))
+    return sum(linked for linked, _ in results), sum(reclaimed for _, reclaimed in results)
+
+
+def gc_store(basefolder=ENVS_PATH):
+    """
+    Deletes the files in the store which are not used by any environment anymore.
+
+    Args:
+        basefolder (str): The folder containing the environments (and the store).
+
+    Returns:
+        int: The number of bytes freed.
+    """
+    store_path = get_store_path(basefolder=basefolder)
+    freed = 0
+    for root, _, files in os.walk(store_path):
+        for filename in files:
+            file_path = os.path.join(root, filename)
+            file_stat = os.lstat(file_path)
+            if file_stat.st_nlink == 1:
+                os.remove(file_path)
+                freed += file_stat.st_size
+    return freed
+
+
+def _dedupe_file(file_path, store_path):
+    """
+    Links a file to its copy in the store.
+
+    Returns:
+        int or None: The size of the file if it was replaced by a hardlink, otherwise None.
+    """
+    file_stat = os.lstat(file_path)
+    if not stat.S_ISREG(file_stat.st_mode):
+        return None
+    digest = _hash_file(file_path)
+    store_file = os.path.join(store_path, digest[:2], f"{digest}.{stat.S_IMODE(file_stat.st_mode):o}")
+    os.makedirs(os.path.dirname(store_file), exist_ok=True)
+    for _ in range(_link_attempts):
+        try:
+            # The first environment with this file provides it to the store
+            os.link(file_path, store_file)
+            return None
+        except FileExistsError:
+            pass
+        except OSError:
+            # E.g. the store is on another filesystem
+            return None
+        tmp_path = f"{file_path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            store_stat = os.stat(store_file)
+            if (store_stat.st_dev, store_stat.st_ino) == (file_stat.st_dev, file_stat.st_ino):
+                return None
+            os.link(store_file, tmp_path)
+        except FileNotFoundError:
+            # Removed by a concurrent ``gc_store``, this file then provides it to the store
+            continue
+        os.replace(tmp_path, file_path)
+        # Space is only reclaimed if this was the last link to the content
+        return file_stat.st_size if file_stat.st_nlink == 1 else 0
+    return None
+
+
+def _hash_file(file_path):
+    """Returns the sha256 of the content of a file."""
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _is_skipped(filename):
+    """Checks if a file is rewritten per environment."""
+    return any(fnmatch.fnmatch(filename, pattern) for pattern in _skipped_patterns)
@@ -1,37 +1,47 @@
 import os
-from subprocess import check_output, CalledProcessError
+import re
+import shutil
+from functools import lru_cache
 
 from manven.settings import ENVS_PATH
 
+_shell_to_script_name = {
+    "sh": "activate",
+    "bash": "activate",
+    "zsh": "activate",
+    "dash": "activate",
+    "csh": "activate.csh",
+    "fish": "activate.fish",
+}
+
 
 def has_binary(binary_name):
     """
     Checks if a given binary is in the PATH.
 
-    This is done by checking what ``which binary_name`` returns.
-
     Args:
         binary_name (str): The name of the binary.
 
     Returns:
         bool: Whether the binary is in the PATH.
     """
-    try:
-        check_output(["which", binary_name])
-    except CalledProcessError:
-        return False
-    else:
-        return True
+    return find_binary(binary_name) is not None
 
 
-def has_virtualenv():
+@lru_cache(maxsize=None)
+def find_binary(binary_name):
     """
-    Checks if virtualenv is installed.
+    Returns the path to a given binary in the PATH.
+
+    The PATH is searched (without starting a process) once per binary and the result is cached.
+
+    Args:
+        binary_name (str): The name of the binary.
 
     Returns:
-        bool: Whether the virtualenv is installed.
+        str or None: The path to the binary or None if it's not in the PATH.
     """
-    return has_binary("virtualenv")
+    return shutil.which(binary_name)
 
 
 def current_env():
@@ -59,3 +69,85 @@ def is_current_temp():
     if current is None:
         return False
     return current.startswith(".temp/")
+
+
+def get_activate_script_name():
+    """
+    Gets the name of the activate script based on what's the current shell is.
+
+    Returns:
+        str: The name of the file.
+    """
+    shell = get_current_shell()
+    script_name = _shell_to_script_name.get(shell)
+    if script_name is None:
+        raise ValueError(f"Unknown shell {shell}")
+
+    return script_name
+
+
+def get_current_shell():
+    """
+    Returns the current shell set by the environment variable $SHELL.
+
+    Returns:
+        str: The name of the current shell.
+    """
+    if 'SHELL' not in os.environ:
+        # default to bash
+        return 'bash'
+    return os.environ['SHELL'].split('/')[-1]
+
+
+def read_pyvenv_cfg(path_to_venv):
+    """
+    Reads the ``pyvenv.cfg`` file of an environment.
+
+    Args:
+        path_to_venv (str): The path to the environment.
+
+    Returns:
+        dict: The values in the file (empty if there is no such file).
+    """
+    values = {}
+    pyvenv_cfg = os.path.join(path_to_venv, "pyvenv.cfg")
+    if not os.path.exists(pyvenv_cfg):
+        return values
+    with open(pyvenv_cfg, 'r') as f:
+        for line in f:
+            key, _, value = line.partition('=')
+            values[key.strip()] = value.strip()
+    return values
+
+
+def format_size(num_bytes):
+    """
+    Formats a number of bytes to be read by humans.
+
+    Args:
+        num_bytes (int): The number of bytes.
+
+    Returns:
+        str: E.g. ``1.5 MB``.
+    """
+    size = float(num_bytes)
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(size) < 1024:
+            break
+        size /= 1024
+    else:
+        unit = "TB"
+    return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+
+
+def normalize_name(name):
+    """
+    Normalizes the name of a distribution (see PEP 503).
+
+    Args:
+        name (str): The name, e.g. ``Typing_Extensions``.
+
+    Returns:
+        str: The normalized name, e.g. ``typing-extensions``.
+    """
+    return re.sub(r"[-_.]+", "-", name).lower()
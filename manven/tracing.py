@@ -0,0 +1,178 @@
+import os
+import sys
+import time
+import functools
+import threading
+
+# Set to 1 (or stderr) to write spans to stderr or to the path of a file to append them to
+TRACE_VARIABLE = "MANVEN_TRACE"
+
+_lock = threading.Lock()
+_local = threading.local()
+_target = None
+_next_id = 0
+
+
+class _NullSpan:
+    """Span doing nothing, used when tracing is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+_null_span = _NullSpan()
+
+
+class _Span:
+    """Span timing the code in a with-statement."""
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        global _next_id
+        with _lock:
+            self.id = _next_id
+            _next_id += 1
+        stack = _get_stack()
+        self.parent = stack[-1].id if stack else None
+        stack.append(self)
+        self.start = time.time()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        self._children_cpu = _get_children_cpu()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        record = {
+            "name": self.name,
+            "id": self.id,
+            "parent": self.parent,
+            "pid": os.getpid(),
+            "start": self.start,
+            "wall": time.perf_counter() - self._wall,
+            "cpu": time.process_time() - self._cpu,
+            "children_cpu": _get_children_cpu() - self._children_cpu,
+        }
+        record.update(self.attributes)
+        if exc_type is SystemExit:
+            record["exit_code"] = exc_value.code
+        elif exc_type is not None:
+            record["error"] = f"{exc_type.__name__}: {exc_value}"
+        _get_stack().pop()
+        _write(record)
+        return False
+
+    def set(self, **attributes):
+        """Adds attributes to the span."""
+        self.attributes.update(attributes)
+
+
+def enable(target="stderr"):
+    """
+    Enables tracing, such that each span is written as a line of JSON when it ends.
+
+    A span has a name, an id, the id of its parent, the start time, the wall and CPU time (in seconds)
+    and its attributes, e.g. the command line and exit code of a subprocess.
+
+    Args:
+        target (str): ``stderr`` or the path to a file the spans are appended to.
+    """
+    global _target
+    _target = target
+
+
+def is_enabled():
+    """
+    Returns:
+        bool: Whether tracing is enabled.
+    """
+    return _target is not None
+
+
+def span(name, **attributes):
+    """
+    Returns a context manager timing a phase.
+
+    When tracing is off, a shared span doing nothing is returned such that instrumented code costs (almost) nothing.
+
+    Args:
+        name (str): The name of the phase.
+        attributes: Additional values to record, more can be added by calling ``set`` on the span.
+
+    Returns:
+        The span.
+    """
+    if _target is None:
+        return _null_span
+    return _Span(name, attributes)
+
+
+def traced(name=None):
+    """
+    Decorator recording each call of a function in a span.
+
+    Args:
+        name (str, optional): The name of the span (default the name of the function).
+    """
+    def decorator(function):
+        span_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _target is None:
+                return function(*args, **kwargs)
+            with _Span(span_name, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def run(args, **kwargs):
+    """
+    Same as ``subprocess.run`` but recorded in a span with the command line and exit code.
+    """
+    import subprocess
+    with span("subprocess", args=[str(arg) for arg in args]) as s:
+        output = subprocess.run(args, **kwargs)
+        s.set(returncode=output.returncode)
+    return output
+
+
+def _get_stack():
+    """Returns the stack of open spans of the current thread."""
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _get_children_cpu():
+    """Returns the CPU time used by the terminated child processes."""
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _write(record):
+    """Writes a span as a line of JSON."""
+    import json
+    line = json.dumps(record, default=str) + '\n'
+    with _lock:
+        if _target == "stderr":
+            sys.stderr.write(line)
+            sys.stderr.flush()
+        else:
+            with open(_target, 'a') as f:
+                f.write(line)
+
+
+_value = os.environ.get(TRACE_VARIABLE)
+if _value:
+    enable("stderr" if _value in ("1", "stderr") else _value)
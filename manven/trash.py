@@ -0,0 +1,131 @@
+import os
+import sys
+import uuid
+import fcntl
+import shutil
+from subprocess import Popen, DEVNULL
+from concurrent.futures import ThreadPoolExecutor
+
+from manven.settings import ENVS_PATH
+
+_trash_folder_name = ".trash"
+_lock_filename = ".lock"
+# Run by the worker, the base folder is set before importing the modules using it
+_worker_code = "from manven import settings; settings.ENVS_PATH = {basefolder!r}; " \
+    "from manven.trash import empty_trash; empty_trash()"
+
+
+def get_trash_path(basefolder=ENVS_PATH):
+    """
+    Returns the path to where removed environments are put before being deleted.
+
+    Args:
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        str: The path.
+    """
+    return os.path.join(basefolder, _trash_folder_name)
+
+
+def move_to_trash(path, basefolder=ENVS_PATH):
+    """
+    Moves a file or folder to the trash (atomically), such that it can be deleted later.
+
+    The path should be on the same filesystem as the trash, i.e. in the folder containing the environments.
+
+    Args:
+        path (str): The path to the file or folder.
+        basefolder (str): The folder containing the environments.
+    """
+    trash_path = get_trash_path(basefolder=basefolder)
+    os.makedirs(trash_path, exist_ok=True)
+    name = os.path.basename(os.path.normpath(path))
+    os.rename(path, os.path.join(trash_path, f"{name}-{uuid.uuid4().hex[:8]}"))
+
+
+def list_trash(basefolder=ENVS_PATH):
+    """
+    Returns the entries in the trash.
+
+    Args:
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        list: list of str consisting of the names of the entries.
+    """
+    trash_path = get_trash_path(basefolder=basefolder)
+    if not os.path.exists(trash_path):
+        return []
+    return sorted(entry for entry in os.listdir(trash_path) if not entry.startswith('.'))
+
+
+def is_emptying(basefolder=ENVS_PATH):
+    """
+    Checks if some process is currently emptying the trash.
+
+    Args:
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        bool: Whether the trash is being emptied.
+    """
+    lock_file = os.path.join(get_trash_path(basefolder=basefolder), _lock_filename)
+    if not os.path.exists(lock_file):
+        return False
+    with open(lock_file, 'r') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(f, fcntl.LOCK_UN)
+    return False
+
+
+def empty_trash(jobs=None, basefolder=ENVS_PATH):
+    """
+    Deletes everything in the trash, in parallel.
+
+    Waits for any other process emptying the trash to finish first.
+
+    Args:
+        jobs (int, optional): The number of threads to use (default decided by ``ThreadPoolExecutor``).
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        int: The number of entries that were deleted.
+    """
+    trash_path = get_trash_path(basefolder=basefolder)
+    if not os.path.exists(trash_path):
+        return 0
+    with open(os.path.join(trash_path, _lock_filename), 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        entries = [os.path.join(trash_path, entry) for entry in list_trash(basefolder=basefolder)]
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            list(executor.map(_delete, entries))
+    return len(entries)
+
+
+def spawn_trash_worker(basefolder=ENVS_PATH):
+    """
+    Starts a detached process which empties the trash.
+
+    Args:
+        basefolder (str): The folder containing the environments, whose trash is emptied
+            (whatever the config resolved from the working directory of the process).
+    """
+    Popen(
+        [sys.executable, "-c", _worker_code.format(basefolder=os.path.abspath(basefolder))],
+        stdin=DEVNULL,
+        stdout=DEVNULL,
+        stderr=DEVNULL,
+        start_new_session=True,
+    )
+
+
+def _delete(path):
+    """Effectively does ``rm -rf path``, ignoring errors."""
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.lexists(path):
+        os.remove(path)
@@ -0,0 +1,90 @@
+import os
+import glob
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from manven.settings import ENVS_PATH
+from manven.index import get_state_path
+
+_cache_filename = "du.json"
+
+
+def get_disk_usage(paths, jobs=None, basefolder=ENVS_PATH):
+    """
+    Returns the disk usage of environments, walking them in parallel.
+
+    The usage of each environment is cached (in the state folder next to the environments) and only measured again
+    if the modification time of the environment or of its site-packages changed.
+
+    Args:
+        paths (list): The paths to the environments.
+        jobs (int, optional): The number of threads to use (default decided by ``ThreadPoolExecutor``).
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        dict: Mapping from the path of each environment to a dictionary with the keys ``size`` (in bytes)
+            and ``files``.
+    """
+    cache = _read_cache(basefolder)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        entries = dict(zip(paths, executor.map(lambda path: _get_entry(path, cache.get(path)), paths)))
+    if any(cache.get(path) != entry for path, entry in entries.items()):
+        cache = {path: entry for path, entry in cache.items() if os.path.exists(path)}
+        cache.update(entries)
+        _write_cache(cache, basefolder)
+    return {path: {"size": entry["size"], "files": entry["files"]} for path, entry in entries.items()}
+
+
+def _get_entry(path_to_venv, cached):
+    """Returns the cached entry of an environment if still valid, otherwise measures it."""
+    key = _get_cache_key(path_to_venv)
+    if cached is not None and cached["key"] == key:
+        return cached
+    size, files = _measure(path_to_venv)
+    return {"key": key, "size": size, "files": files}
+
+
+def _get_cache_key(path_to_venv):
+    """Returns the modification times of an environment and its site-packages."""
+    folders = [path_to_venv] + sorted(glob.glob(os.path.join(path_to_venv, "lib", "python*", "site-packages")))
+    return [os.stat(folder).st_mtime_ns for folder in folders]
+
+
+def _measure(path_to_venv):
+    """Returns the disk usage (counting each hardlinked file once) and number of files of a folder."""
+    size, files = 0, 0
+    seen = set()
+    for root, _, filenames in os.walk(path_to_venv):
+        for filename in filenames:
+            try:
+                stat = os.lstat(os.path.join(root, filename))
+            except FileNotFoundError:
+                continue
+            files += 1
+            if stat.st_nlink > 1:
+                if (stat.st_dev, stat.st_ino) in seen:
+                    continue
+                seen.add((stat.st_dev, stat.st_ino))
+            size += stat.st_blocks * 512
+    return size, files
+
+
+def _read_cache(basefolder):
+    """Reads the cache file, returns an empty cache if there is none or it cannot be parsed."""
+    cache_file = os.path.join(get_state_path(basefolder), _cache_filename)
+    try:
+        with open(cache_file, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_cache(cache, basefolder):
+    """Writes the cache file atomically."""
+    state_path = get_state_path(basefolder)
+    os.makedirs(state_path, exist_ok=True)
+    cache_file = os.path.join(state_path, _cache_filename)
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp_file, cache_file)
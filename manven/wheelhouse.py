@@ -0,0 +1,152 @@
+import os
+import re
+import json
+import fcntl
+
+from manven.settings import ENVS_PATH
+from manven.toolbox import read_pyvenv_cfg, normalize_name
+
+_wheelhouse_folder_name = ".wheelhouse"
+_stats_filename = "stats.json"
+_implementation_abbreviations = {
+    "cpython": "cp",
+    "pypy": "pp",
+}
+_requirement_name_regex = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*(\[[^\]]*\])?\s*([<>=!~;,].*)?$")
+
+
+def get_wheelhouse_path(abi_tag=None, basefolder=ENVS_PATH):
+    """
+    Returns the path to the wheelhouse (for a given interpreter ABI tag).
+
+    Args:
+        abi_tag (str, optional): The ABI tag of the interpreter, e.g. ``cp38``.
+            If None the folder containing all wheelhouses is returned.
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        str: The path.
+    """
+    wheelhouse_path = os.path.join(basefolder, _wheelhouse_folder_name)
+    if abi_tag is None:
+        return wheelhouse_path
+    return os.path.join(wheelhouse_path, abi_tag)
+
+
+def format_abi_tag(implementation, major, minor):
+    """
+    Formats the ABI tag of an interpreter.
+
+    Args:
+        implementation (str): The name of the implementation, e.g. ``CPython``.
+        major (int): The major version.
+        minor (int): The minor version.
+
+    Returns:
+        str: The tag, e.g. ``cp38``.
+    """
+    implementation = implementation.lower()
+    implementation = _implementation_abbreviations.get(implementation, implementation)
+    return f"{implementation}{major}{minor}"
+
+
+def get_environment_abi_tag(path_to_venv):
+    """
+    Returns the ABI tag of the interpreter of an environment, by reading its ``pyvenv.cfg``.
+
+    Args:
+        path_to_venv (str): The path to the environment.
+
+    Returns:
+        str or None: The tag or None if it cannot be determined.
+    """
+    values = read_pyvenv_cfg(path_to_venv)
+    version = values.get("version_info") or values.get("version")
+    if not version:
+        return None
+    major, minor = version.split('.')[:2]
+    return format_abi_tag(values.get("implementation", "CPython"), major, minor)
+
+
+def can_serve(packages, abi_tag, basefolder=ENVS_PATH):
+    """
+    Checks if all the given requirements have a wheel in the wheelhouse.
+
+    Only the names of the requirements are compared, pip still checks the versions
+    when installing from the wheelhouse.
+
+    Args:
+        packages (list): List of strings specifying python packages to install.
+        abi_tag (str): The ABI tag of the interpreter.
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        bool: Whether all the requirements can be served locally.
+    """
+    wheelhouse_path = get_wheelhouse_path(abi_tag, basefolder=basefolder)
+    if not os.path.isdir(wheelhouse_path):
+        return False
+    available = {
+        normalize_name(file_name.split('-')[0])
+        for file_name in os.listdir(wheelhouse_path) if file_name.endswith(".whl")
+    }
+    for package in packages:
+        match = _requirement_name_regex.match(package)
+        if match is None or normalize_name(match.group(1)) not in available:
+            return False
+    return True
+
+
+def record_install(hit, basefolder=ENVS_PATH):
+    """
+    Records if an install was served by the wheelhouse (does nothing if there is no wheelhouse).
+
+    Args:
+        hit (bool): Whether the install was served by the wheelhouse.
+        basefolder (str): The folder containing the environments.
+    """
+    wheelhouse_path = get_wheelhouse_path(basefolder=basefolder)
+    if not os.path.isdir(wheelhouse_path):
+        return
+    with open(os.path.join(wheelhouse_path, _stats_filename), 'a+') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        content = f.read()
+        stats = json.loads(content) if content else {"hits": 0, "misses": 0}
+        stats["hits" if hit else "misses"] += 1
+        f.seek(0)
+        f.truncate()
+        json.dump(stats, f)
+
+
+def get_stats(basefolder=ENVS_PATH):
+    """
+    Returns the number of installs served (hits) and not served (misses) by the wheelhouse.
+
+    Args:
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        dict: With the keys ``hits`` and ``misses``.
+    """
+    stats_file = os.path.join(get_wheelhouse_path(basefolder=basefolder), _stats_filename)
+    if not os.path.exists(stats_file):
+        return {"hits": 0, "misses": 0}
+    with open(stats_file, 'r') as f:
+        return json.load(f)
+
+
+def list_abi_tags(basefolder=ENVS_PATH):
+    """
+    Returns the ABI tags for which there is a wheelhouse.
+
+    Args:
+        basefolder (str): The folder containing the environments.
+
+    Returns:
+        list: list of str consisting of the tags.
+    """
+    wheelhouse_path = get_wheelhouse_path(basefolder=basefolder)
+    if not os.path.exists(wheelhouse_path):
+        return []
+    return sorted(tag for tag in os.listdir(wheelhouse_path) if os.path.isdir(os.path.join(wheelhouse_path, tag)))
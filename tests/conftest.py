@@ -1,8 +1,18 @@
 import os
+import atexit
 import shutil
+import tempfile
 import pytest
 
-from manven import settings
+# Keep the per-session and per-user state of the tests separate from the ones of the user
+_state_dir = tempfile.mkdtemp(prefix="manven-tests-")
+atexit.register(shutil.rmtree, _state_dir, ignore_errors=True)
+os.environ["XDG_RUNTIME_DIR"] = os.path.join(_state_dir, "runtime")
+os.environ["XDG_STATE_HOME"] = os.path.join(_state_dir, "state")
+os.environ["XDG_CACHE_HOME"] = os.path.join(_state_dir, "cache")
+os.environ["MANVEN_SESSION"] = "tests"
+
+from manven import settings  # noqa: E402
 # Set a temporary directory to use for the tests
 path_to_here = os.path.dirname(os.path.abspath(__file__))
 settings.ENVS_PATH = os.path.join(path_to_here, ".tmp")
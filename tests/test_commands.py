@@ -1,11 +1,15 @@
 import os
 import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+from manven import commands
 
 from manven.commands import create_environment, activate_environment, list_environments,\
     remove_environment, deactivate_environment, reset_to_execute,\
-    activate_temp_environment, prune_temp_environments,\
-    TO_EXECUTE_FILE, _get_activate_script_name
+    activate_temp_environment, prune_temp_environments, create_template, list_templates, remove_template,\
+    TO_EXECUTE_FILE
 from manven.settings import ENVS_PATH
+from manven.toolbox import get_activate_script_name
 
 ########################################################################
 # NOTE: in conftest.py we set a different path to be used such that we #
@@ -53,7 +57,7 @@ def test_activate_environment(environment_name, teardown):
     # Check that the content of the file is correct
     assert len(lines) == 1
     line = lines[0]
-    activate_script_name = _get_activate_script_name()
+    activate_script_name = get_activate_script_name()
     activate_script_path = os.path.join(ENVS_PATH, environment_name, "bin", activate_script_name)
     assert line == f"source {activate_script_path}"
 
@@ -83,6 +87,24 @@ def test_list_environments(environment_names, num_temp_envs, teardown):
     assert sorted(environments) == sorted(environment_names)
 
 
+def test_concurrent_temp_environments(teardown, monkeypatch):
+    def create_fake_environment(environment_name, **kwargs):
+        path_to_venv = os.path.join(ENVS_PATH, environment_name)
+        # The name is claimed by an empty folder before creating the environment
+        assert os.listdir(path_to_venv) == []
+        os.makedirs(os.path.join(path_to_venv, "bin"))
+        with open(os.path.join(path_to_venv, "bin", get_activate_script_name()), 'w'):
+            pass
+
+    monkeypatch.setattr(commands, "_create_an_environment", create_fake_environment)
+    num_temp_envs = 50
+    with ThreadPoolExecutor(max_workers=num_temp_envs) as executor:
+        names = list(executor.map(lambda _: activate_temp_environment(default_pkgs=[]), range(num_temp_envs)))
+
+    assert len(set(names)) == num_temp_envs
+    assert sorted(list_environments(include_temporary=True)) == sorted(names)
+
+
 @pytest.mark.parametrize("environment_names, to_remove", [
     (["test"], []),
     (["test"], ["test"]),
@@ -94,12 +116,74 @@ def test_remove_environments(environment_names, to_remove, teardown):
     for environment_name in to_remove:
         remove_environment(environment_name)
 
-    environments_left = os.listdir(ENVS_PATH)
+    # Removed environments are moved to the (hidden) trash folder
+    environments_left = [venv for venv in os.listdir(ENVS_PATH) if not venv.startswith('.')]
     environments_left_expected = set(environment_names) - set(to_remove)
 
     assert sorted(environments_left) == sorted(environments_left_expected)
 
 
+def test_create_from_template(teardown):
+    create_template("base", default_pkgs=[])
+    assert list_templates() == ["base"]
+
+    create_environment("test", template="base", default_pkgs=[])
+    path_to_venv = os.path.join(ENVS_PATH, "test")
+    template_path = os.path.join(ENVS_PATH, ".templates", "base")
+    for file_name in ["pyvenv.cfg", os.path.join("bin", "activate")]:
+        with open(os.path.join(path_to_venv, file_name), 'r') as f:
+            content = f.read()
+        assert path_to_venv in content
+        assert template_path not in content
+    assert list_environments() == ["test"]
+
+    # The environment is independent of the template
+    remove_template("base")
+    assert list_templates() == []
+    assert os.path.exists(os.path.join(path_to_venv, "bin", "activate"))
+
+
+def test_template_with_packages(monkeypatch, teardown):
+    create_template("base", default_pkgs=[])
+    installed = []
+    monkeypatch.setattr(commands, "_install_packages", lambda environment_name, packages, **kwargs: installed.append(
+        (environment_name, packages, kwargs["pip_install_flags"])))
+    # Only the packages missing from the template are installed
+    create_environment("test", template="base", default_pkgs=["pip", "requests"], pip_install_flags=["--no-index"])
+    assert installed == [("test", ["requests"], ["--no-index"])]
+
+    with pytest.raises(ValueError):
+        create_environment("other", template="base", python="python3")
+    assert list_environments() == ["test"]
+
+
+def test_clone_environment(teardown):
+    create_environment("base", default_pkgs=[])
+    clone_stats = create_environment("test", clone="base")
+    assert clone_stats["files"] > 0 and clone_stats["bytes"] > 0
+    path_to_venv = os.path.join(ENVS_PATH, "test")
+    with open(os.path.join(path_to_venv, "bin", "activate"), 'r') as f:
+        content = f.read()
+    assert path_to_venv in content
+    assert os.path.join(ENVS_PATH, "base") not in content
+    assert list_environments() == ["base", "test"]
+
+    with pytest.raises(ValueError):
+        create_environment("other", clone="missing")
+
+
+def test_clone_with_relative_basefolder(monkeypatch, teardown):
+    create_environment("base", default_pkgs=[])
+    monkeypatch.chdir(os.path.dirname(ENVS_PATH))
+    commands._create_an_environment("test", clone="base", basefolder=os.path.basename(ENVS_PATH))
+    path_to_venv = os.path.join(ENVS_PATH, "test")
+    with open(os.path.join(path_to_venv, "bin", "activate"), 'r') as f:
+        content = f.read()
+    # The absolute path of the source is rewritten to the absolute path of the clone
+    assert path_to_venv in content
+    assert os.path.join(ENVS_PATH, "base") not in content
+
+
 def test_deactivate():
     deactivate_environment()
 
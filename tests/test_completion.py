@@ -0,0 +1,58 @@
+import os
+import sys
+import shutil
+import subprocess
+import pytest
+
+from manven.commands import create_environment, activate_temp_environment, remove_environment
+from manven.completion import read_completions, update_commands, update_environments
+from manven.settings import ENVS_PATH
+
+path_to_repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+path_to_main = os.path.join(path_to_repo, "manven", "main.py")
+
+
+def test_completions_follow_environments(teardown):
+    create_environment("test", default_pkgs=[])
+    create_environment("hello", default_pkgs=[])
+    temp_env_name = activate_temp_environment(default_pkgs=[])
+    completions = read_completions()
+    assert completions["env"] == [("hello", ''), ("test", '')]
+    assert completions["temp"] == [(temp_env_name, '')]
+
+    remove_environment("hello")
+    assert read_completions()["env"] == [("test", '')]
+
+
+def test_commands_are_kept(teardown):
+    update_commands({"activate": "Activates an environment."})
+    create_environment("test", default_pkgs=[])
+    completions = read_completions()
+    assert completions["command"] == [("activate", "Activates an environment.")]
+    assert completions["env"] == [("test", '')]
+
+
+def test_completions_per_folder(tmp_path, teardown):
+    create_environment("test", default_pkgs=[])
+    update_environments(["other"], basefolder=str(tmp_path))
+    # Each folder of environments has its own completions
+    assert read_completions()["env"] == [("test", '')]
+    assert read_completions(basefolder=str(tmp_path))["env"] == [("other", '')]
+
+
+def test_bash_completion(tmp_path, teardown):
+    if shutil.which("bash") is None:
+        pytest.skip("bash is not installed")
+    update_commands({"activate": "Activates an environment.", "create": "Creates an environment."})
+    create_environment("test", default_pkgs=[])
+    # The environments are read from the folder given by the CLI for the config of the current directory
+    with open(tmp_path / ".manven.conf", 'w') as f:
+        f.write(f"[manven]\nENVS_PATH = {ENVS_PATH}\n")
+    script = (
+        f"manven() {{ PYTHONPATH={path_to_repo} {sys.executable} {path_to_main} \"$@\"; }}\n"
+        f"source {os.path.join(path_to_repo, 'completions', 'manven.bash')}\n"
+        "COMP_WORDS=(manven a); COMP_CWORD=1; _manven; echo \"${COMPREPLY[@]}\"\n"
+        "COMP_WORDS=(manven activate t); COMP_CWORD=2; _manven; echo \"${COMPREPLY[@]}\"\n"
+    )
+    output = subprocess.run(["bash", "-c", script], capture_output=True, check=True, cwd=tmp_path)
+    assert output.stdout.decode().splitlines() == ["activate", "test"]
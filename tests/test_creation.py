@@ -0,0 +1,36 @@
+import os
+import sys
+import pytest
+
+from manven.creation import create_virtual_environment, has_backend, format_options, BACKENDS
+from manven.settings import ENVS_PATH
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_create_virtual_environment(backend, teardown):
+    assert has_backend(backend)
+    path_to_venv = os.path.join(ENVS_PATH, "test")
+    create_virtual_environment(path_to_venv, backend=backend, no_pip=True, python="")
+    assert os.path.exists(os.path.join(path_to_venv, "bin", "activate"))
+    assert os.path.exists(os.path.join(path_to_venv, "pyvenv.cfg"))
+
+
+def test_venv_backend_current_python(teardown):
+    # venv can only create environments for the current interpreter, which can be given explicitly
+    path_to_venv = os.path.join(ENVS_PATH, "test")
+    create_virtual_environment(path_to_venv, backend="venv", no_pip=True, python=sys.executable)
+    assert os.path.exists(os.path.join(path_to_venv, "bin", "activate"))
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_virtual_environment(os.path.join(ENVS_PATH, "test"), backend="conda")
+
+
+@pytest.mark.parametrize("virtualenv_ops, expected", [
+    ({}, []),
+    ({"clear": True, "no_pip": False}, ["--clear"]),
+    ({"python": "python3.8", "prompt": ""}, ["--python=python3.8"]),
+])
+def test_format_options(virtualenv_ops, expected):
+    assert format_options(virtualenv_ops) == expected
@@ -0,0 +1,74 @@
+import os
+import glob
+import pytest
+
+from manven import commands, doctor
+from manven.commands import create_environment, activate_environment, diagnose, queue_rebuild, run_job,\
+    list_environments
+from manven.jobs import queue_job
+from manven.settings import ENVS_PATH
+
+
+def _break_interpreter(path_to_venv):
+    python = os.path.join(path_to_venv, "bin", "python")
+    os.remove(python)
+    os.symlink("/nonexistent/python3", python)
+
+
+def test_healthy_environment_is_cached(teardown, monkeypatch):
+    create_environment("test", default_pkgs=[])
+    assert diagnose() == [{"name": "test", "path": os.path.join(ENVS_PATH, "test"), "problems": []}]
+
+    def fail(path_to_venv):
+        raise AssertionError("Should use the cache")
+    monkeypatch.setattr(doctor, "_diagnose", fail)
+    assert diagnose()[0]["problems"] == []
+
+
+def test_broken_environments(teardown):
+    create_environment("test", default_pkgs=[])
+    create_environment("other", default_pkgs=[])
+    assert all(not environment["problems"] for environment in diagnose())
+
+    _break_interpreter(os.path.join(ENVS_PATH, "test"))
+    with open(os.path.join(ENVS_PATH, "other", "bin", "tool"), 'w') as f:
+        f.write("#!/nonexistent/python\n")
+    problems = {environment["name"]: environment["problems"] for environment in diagnose()}
+    assert problems["test"] == ["bin/python points to /nonexistent/python3 which does not exist"]
+    assert problems["other"] == ["bin/tool runs /nonexistent/python which does not exist"]
+
+    with pytest.raises(ValueError):
+        activate_environment("test")
+
+
+def test_queue_rebuild(teardown, monkeypatch):
+    create_environment("test", default_pkgs=[])
+    calls = []
+    monkeypatch.setattr(commands, "create_environment_in_background", lambda *args, **kwargs: calls.append(kwargs))
+    site_packages = glob.glob(os.path.join(ENVS_PATH, "test", "lib", "python*", "site-packages"))[0]
+    os.makedirs(os.path.join(site_packages, "local-1.0.dist-info"))
+    with open(os.path.join(site_packages, "local-1.0.dist-info", "direct_url.json"), 'w') as f:
+        f.write('{"url": "file:///src/local", "dir_info": {"editable": true}}')
+    queue_rebuild("test")
+    assert calls[0]["replace"] and calls[0]["swap"]
+    assert not any(package.startswith("pip==") for package in calls[0]["default_pkgs"])
+    # Installed from a local path, cannot be installed again by version
+    assert "local==1.0" not in calls[0]["default_pkgs"]
+
+
+def test_failed_rebuild_keeps_environment(teardown):
+    create_environment("test", default_pkgs=[])
+    inode = os.stat(os.path.join(ENVS_PATH, "test")).st_ino
+    queue_job("test", {"swap": True, "default_pkgs": ["missing-package==0"], "pip_install_flags": ["--no-index"]})
+    with pytest.raises(RuntimeError):
+        run_job("test")
+    assert os.stat(os.path.join(ENVS_PATH, "test")).st_ino == inode
+    assert list_environments() == ["test"]
+
+    queue_job("test", {"swap": True, "default_pkgs": []})
+    run_job("test")
+    path_to_venv = os.path.join(ENVS_PATH, "test")
+    assert os.stat(path_to_venv).st_ino != inode
+    with open(os.path.join(path_to_venv, "bin", "activate"), 'r') as f:
+        assert ".rebuilding-" not in f.read()
+    assert list_environments() == ["test"]
@@ -0,0 +1,60 @@
+import os
+import pytest
+
+from manven.commands import activate_temp_environment, evict_temp_environments, list_environments
+from manven.eviction import select_evictions
+from manven.index import update_index
+from manven.settings import ENVS_PATH, _parse_duration, _parse_bytes
+
+
+def _environments(*sizes):
+    return [{"name": f"env_{i}", "last_used": i, "size": size} for i, size in enumerate(sizes)]
+
+
+def test_select_by_ttl():
+    assert select_evictions(_environments(1, 1, 1), now=10, ttl=8.5) == ["env_0", "env_1"]
+
+
+def test_select_by_count():
+    assert select_evictions(_environments(1, 1, 1), now=10, max_count=1) == ["env_0", "env_1"]
+    assert select_evictions(_environments(1, 1, 1), now=10, max_count=3) == []
+
+
+def test_select_by_bytes():
+    assert select_evictions(_environments(5, 1, 3), now=10, max_bytes=4) == ["env_0"]
+    assert select_evictions(_environments(5, 1, 3), now=10, max_bytes=3) == ["env_0", "env_1"]
+
+
+def test_select_keeps():
+    environments = _environments(1, 1, 1)
+    assert select_evictions(environments, now=10, ttl=0, keep=["env_0"]) == ["env_1", "env_2"]
+    assert select_evictions(environments, now=10, max_count=2, keep=["env_0"]) == ["env_1"]
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("", None),
+    ("90", 90),
+    ("2h", 2 * 60 * 60),
+    ("7d", 7 * 24 * 60 * 60),
+])
+def test_parse_duration(value, expected):
+    assert _parse_duration(value) == expected
+
+
+def test_parse_bytes():
+    assert _parse_bytes("10G") == 10 * 1024 ** 3
+    assert _parse_bytes("512k") == 512 * 1024
+    with pytest.raises(ValueError):
+        _parse_bytes("lots")
+
+
+def test_evict_temp_environments(teardown, monkeypatch):
+    names = [activate_temp_environment(default_pkgs=[]) for _ in range(3)]
+    for i, name in enumerate(names):
+        update_index(name, last_activated=i)
+
+    # The active environment is never evicted
+    monkeypatch.setenv("VIRTUAL_ENV", os.path.join(ENVS_PATH, names[0]))
+    assert evict_temp_environments(max_count=2) == [names[1]]
+    assert list_environments(include_temporary=True) == [names[0], names[2]]
+    assert evict_temp_environments() == []
@@ -0,0 +1,48 @@
+import os
+import json
+
+from manven.commands import create_environment, activate_environment, remove_environment, list_environments
+from manven.index import load_index, rebuild_index, get_index_name, get_state_path
+from manven.settings import ENVS_PATH
+
+
+def test_index_is_updated(teardown):
+    create_environment("test", default_pkgs=[])
+    index = load_index()
+    assert list(index) == ["test"]
+    entry = index["test"]
+    assert entry["path"] == os.path.join(ENVS_PATH, "test")
+    assert entry["python"] is not None
+    assert entry["last_activated"] is None
+
+    activate_environment("test")
+    assert load_index()["test"]["last_activated"] >= entry["created"]
+
+    remove_environment("test")
+    assert load_index() == {}
+
+
+def test_index_is_revalidated(teardown):
+    create_environment("test", default_pkgs=[])
+    activate_environment("test")
+    # Environments created outside of manven are picked up since the folder changed
+    os.makedirs(os.path.join(ENVS_PATH, "other", "bin"))
+    with open(os.path.join(ENVS_PATH, "other", "bin", "activate"), 'w'):
+        pass
+    assert list_environments() == ["other", "test"]
+    # Known values are kept
+    assert load_index()["test"]["last_activated"] is not None
+
+
+def test_rebuild_index(teardown):
+    create_environment("test", default_pkgs=[])
+    with open(os.path.join(get_state_path(), "index.json"), 'w') as f:
+        json.dump({"mtimes": [], "environments": {"gone": {}}}, f)
+    assert list(rebuild_index()) == ["test"]
+
+
+def test_get_index_name():
+    assert get_index_name(os.path.join(ENVS_PATH, "test")) == "test"
+    assert get_index_name(os.path.join(ENVS_PATH, ".temp", "temp_venv_0")) == ".temp/temp_venv_0"
+    assert get_index_name(os.path.join(ENVS_PATH, ".templates", "base")) is None
+    assert get_index_name("/somewhere/else") is None
@@ -0,0 +1,57 @@
+import os
+import pytest
+from subprocess import CompletedProcess
+
+from manven import installers
+from manven.commands import create_environment
+from manven.installers import get_installer, PipInstaller, UvInstaller
+from manven.settings import ENVS_PATH
+
+
+@pytest.mark.parametrize("flags, expected", [
+    ([], []),
+    (["--index-url", "https://example.com"], ["--index-url", "https://example.com"]),
+    (["-i=https://example.com", "--pre", "--no-cache-dir"],
+     ["--index-url=https://example.com", "--prerelease=allow", "--no-cache"]),
+    (["--trusted-host", "example.com", "--disable-pip-version-check"], ["--allow-insecure-host", "example.com"]),
+])
+def test_uv_flags(flags, expected):
+    assert UvInstaller("venv").translate_flags(flags) == expected
+
+
+def test_get_installer(monkeypatch):
+    monkeypatch.setattr(installers, "find_binary", lambda name: None)
+    # Falls back to pip when uv is not installed
+    assert isinstance(get_installer("venv", installer="uv"), PipInstaller)
+
+    monkeypatch.setattr(installers, "find_binary", lambda name: f"/usr/bin/{name}")
+    assert isinstance(get_installer("venv", installer="uv"), UvInstaller)
+    assert isinstance(get_installer("venv", installer="pip"), PipInstaller)
+    # or when a flag is not supported by uv
+    assert isinstance(get_installer("venv", flags=["--user"], installer="uv"), PipInstaller)
+    with pytest.raises(ValueError):
+        get_installer("venv", installer="conda")
+
+
+def test_uv_install(monkeypatch):
+    calls = []
+    monkeypatch.setattr(installers, "find_binary", lambda name: f"/usr/bin/{name}")
+    monkeypatch.setattr(installers, "run", lambda args: calls.append(args) or CompletedProcess(args, 0))
+    UvInstaller("venv").install(["numpy"], flags=["-U"])
+    UvInstaller("venv").install_requirements("requirements.txt")
+    assert calls == [
+        ["/usr/bin/uv", "pip", "install", "--python", os.path.join("venv", "bin", "python"), "--upgrade", "numpy"],
+        ["/usr/bin/uv", "pip", "install", "--python", os.path.join("venv", "bin", "python"),
+         "-r", os.path.abspath("requirements.txt")],
+    ]
+
+    monkeypatch.setattr(installers, "run", lambda args: CompletedProcess(args, 1))
+    with pytest.raises(RuntimeError):
+        UvInstaller("venv").install(["numpy"])
+
+
+def test_list_installed(teardown):
+    create_environment("test", default_pkgs=[])
+    installed = PipInstaller(os.path.join(ENVS_PATH, "test")).list_installed()
+    assert "pip" in installed
+    assert installed["pip"][0].isdigit()
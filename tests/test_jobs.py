@@ -0,0 +1,90 @@
+import os
+import json
+import pytest
+
+from manven import jobs, commands
+from manven.main import _get_fast_handler
+from manven.commands import create_environment, create_environment_in_background, run_job, wait_for_environment
+from manven.activation import has_environment
+from manven.jobs import queue_job, get_job, list_jobs, is_pending, clear_jobs, get_jobs_path, wait_for_job,\
+    DONE, FAILED, RUNNING, QUEUED
+from manven.settings import ENVS_PATH
+
+path_to_repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_run_job(teardown):
+    queue_job("test", {"default_pkgs": []})
+    assert is_pending("test")
+    run_job("test")
+    assert has_environment("test")
+    assert not is_pending("test")
+    job = get_job("test")
+    assert job["state"] == DONE
+    assert job["started"] <= job["finished"]
+    assert wait_for_environment("test")
+
+
+def test_failed_job(teardown):
+    queue_job("test", {"clone": "missing"})
+    with pytest.raises(ValueError):
+        run_job("test")
+    assert not has_environment("test")
+    assert get_job("test")["state"] == FAILED
+    with pytest.raises(RuntimeError):
+        wait_for_environment("test")
+
+    assert clear_jobs() == 1
+    assert list_jobs() == []
+
+
+def test_stopped_worker(teardown):
+    queue_job("test", {})
+    with open(os.path.join(get_jobs_path(), "test.json"), 'r') as f:
+        record = json.load(f)
+    record["state"] = RUNNING
+    with open(os.path.join(get_jobs_path(), "test.json"), 'w') as f:
+        json.dump(record, f)
+    # No worker holds the lock
+    assert get_job("test")["state"] == FAILED
+
+
+def test_activate_waits_for_build(teardown):
+    create_environment("test", default_pkgs=[])
+    assert _get_fast_handler(["activate", "test"]) is not None
+    queue_job("test", {"replace": True})
+    # Falls through to the full CLI which waits for the build
+    assert _get_fast_handler(["activate", "test"]) is None
+    with pytest.raises(ValueError):
+        queue_job("test", {})
+
+
+def test_unstarted_worker(monkeypatch, teardown):
+    queue_job("test", {})
+    # The worker is still being started
+    assert get_job("test")["state"] == QUEUED
+    # The process starting the worker stopped
+    monkeypatch.setattr(jobs, "_spawn_grace_period", 0)
+    assert get_job("test")["state"] == FAILED
+    assert wait_for_job("test")["state"] == FAILED
+    assert not is_pending("test")
+
+
+def test_failed_spawn(monkeypatch, teardown):
+    def fail(environment_name, basefolder=ENVS_PATH):
+        raise OSError("Cannot start the worker")
+    monkeypatch.setattr(commands, "spawn_job_worker", fail)
+    with pytest.raises(OSError):
+        create_environment_in_background("test", default_pkgs=[])
+    assert not is_pending("test")
+    assert get_job("test") is None
+
+
+def test_background_worker(tmp_path, monkeypatch, teardown):
+    # The worker builds in ENVS_PATH, whatever the config of its working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PYTHONPATH", path_to_repo)
+    assert create_environment_in_background("test", default_pkgs=[])
+    assert wait_for_environment("test", timeout=120)
+    assert has_environment("test")
+    assert not create_environment_in_background("test", default_pkgs=[])
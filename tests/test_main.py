@@ -0,0 +1,75 @@
+import os
+import sys
+import subprocess
+import pytest
+
+from manven.main import main, _get_fast_handler
+from manven.commands import create_environment, TO_EXECUTE_FILE
+from manven.settings import ENVS_PATH
+from manven.state import SOURCE_EXIT_CODE
+
+path_to_repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+path_to_main = os.path.join(path_to_repo, "manven", "main.py")
+
+# Budget (in microseconds) for the total time spent importing modules for the hot commands
+IMPORT_TIME_BUDGET = 100000
+
+
+def test_fast_path_deactivate():
+    with pytest.raises(SystemExit) as exc_info:
+        main(["deactivate"])
+    assert exc_info.value.code == SOURCE_EXIT_CODE
+    with open(TO_EXECUTE_FILE, 'r') as f:
+        assert f.read() == "deactivate"
+
+
+@pytest.mark.parametrize("argv, fast", [
+    (["deactivate"], True),
+    (["last"], True),
+    (["activate", "test"], True),
+    (["activate", "other"], False),
+    (["activate", "test", "--new"], False),
+    (["deactivate", "-h"], False),
+    (["get", "path"], True),
+    (["get", "config"], False),
+    (["list"], False),
+    ([], False),
+])
+def test_get_fast_handler(argv, fast, teardown):
+    create_environment("test", default_pkgs=[])
+    assert (_get_fast_handler(argv) is not None) == fast
+
+
+def _imported_modules(args, cwd):
+    """Runs manven with ``-X importtime`` and returns the imported modules and the total import time."""
+    env = dict(os.environ, PYTHONPATH=path_to_repo)
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", path_to_main, *args],
+        cwd=cwd, env=env, stdin=subprocess.DEVNULL, capture_output=True,
+    )
+    assert output.returncode in (0, SOURCE_EXIT_CODE), output.stderr.decode()
+    modules = {}
+    for line in output.stderr.decode().splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_time, _, module = line[len("import time:"):].split('|')
+        modules[module.strip()] = int(self_time)
+    return modules
+
+
+@pytest.mark.parametrize("args", [
+    ["deactivate"],
+    ["activate", "test"],
+    ["last"],
+])
+def test_import_time_budget(args, tmp_path, teardown):
+    with open(tmp_path / ".manven.conf", 'w') as f:
+        f.write(f"[manven]\nENVS_PATH={ENVS_PATH}\n")
+    create_environment("test", default_pkgs=[])
+
+    modules = _imported_modules(args, cwd=tmp_path)
+    assert "click" not in modules
+    if args == ["deactivate"]:
+        # The config is not loaded
+        assert "manven.settings" not in modules
+    assert sum(modules.values()) < IMPORT_TIME_BUDGET
@@ -0,0 +1,90 @@
+import os
+import pytest
+
+from manven.commands import list_environments, create_environment
+from manven.manifest import load_manifest, apply_manifest
+from manven.settings import ENVS_PATH, PIP_INSTALL_FLAGS
+
+MANIFEST = """
+[envs.test]
+packages = []
+
+[envs.hello]
+packages = []
+pip_flags = "--no-cache-dir --quiet"
+no_wheel = true
+"""
+
+
+@pytest.fixture()
+def manifest_file(tmp_path):
+    file_path = tmp_path / "manifest.toml"
+    with open(file_path, 'w') as f:
+        f.write(MANIFEST)
+    return file_path
+
+
+def test_load_manifest(manifest_file):
+    environments = load_manifest(manifest_file)
+    assert environments == {
+        "test": {"default_pkgs": [], "pip_install_flags": PIP_INSTALL_FLAGS},
+        "hello": {"default_pkgs": [], "pip_install_flags": ["--no-cache-dir", "--quiet"], "no_wheel": True},
+    }
+
+
+def test_load_invalid_manifest(tmp_path):
+    file_path = tmp_path / "manifest.toml"
+    with open(file_path, 'w') as f:
+        f.write("[test]\npackages = []\n")
+    with pytest.raises(ValueError):
+        load_manifest(file_path)
+
+
+@pytest.mark.parametrize("entry", [
+    "pakages = []",
+    "packages = 1",
+    "pip_flags = [1]",
+])
+def test_invalid_entry(tmp_path, entry):
+    file_path = tmp_path / "manifest.toml"
+    with open(file_path, 'w') as f:
+        f.write(f"[envs.test]\n{entry}\n")
+    with pytest.raises(ValueError):
+        load_manifest(file_path)
+
+
+def test_packages_as_string(tmp_path):
+    file_path = tmp_path / "manifest.toml"
+    with open(file_path, 'w') as f:
+        f.write('[envs.test]\npackages = "six  numpy"\n')
+    assert load_manifest(file_path)["test"]["default_pkgs"] == ["six", "numpy"]
+
+
+def test_existing_environment_is_conflict(teardown):
+    create_environment("test", default_pkgs=[])
+    inode = os.stat(os.path.join(ENVS_PATH, "test")).st_ino
+    environments = {"test": {"default_pkgs": []}}
+    results = {name: action for name, action, _, error in apply_manifest(environments)}
+    assert results == {"test": "conflict"}
+    assert os.stat(os.path.join(ENVS_PATH, "test")).st_ino == inode
+
+    results = {name: action for name, action, _, error in apply_manifest(environments, force=True)}
+    assert results == {"test": "updated"}
+    assert os.stat(os.path.join(ENVS_PATH, "test")).st_ino != inode
+
+
+def test_apply_manifest(manifest_file, teardown):
+    environments = load_manifest(manifest_file)
+    results = {name: action for name, action, _, error in apply_manifest(environments, jobs=2)}
+    assert results == {"test": "created", "hello": "created"}
+    assert list_environments() == ["hello", "test"]
+
+    # Applying the same manifest again does nothing
+    results = {name: action for name, action, _, error in apply_manifest(environments, jobs=2)}
+    assert results == {"test": "skipped", "hello": "skipped"}
+
+    # Changed entries are updated
+    environments["test"]["no_wheel"] = True
+    results = {name: action for name, action, _, error in apply_manifest(environments, jobs=2)}
+    assert results == {"test": "updated", "hello": "skipped"}
+    assert os.path.exists(os.path.join(ENVS_PATH, "test", "bin", "activate"))
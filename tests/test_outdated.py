@@ -0,0 +1,47 @@
+import pytest
+
+from manven import outdated, commands
+from manven.commands import create_environment, sync_default_packages
+from manven.outdated import get_outdated
+
+installed = {"numpy": "1.26.4", "typing-extensions": "4.9.0", "pip": "24.0"}
+
+
+@pytest.mark.parametrize("use_packaging", [True, False])
+@pytest.mark.parametrize("requirement, is_outdated", [
+    ("numpy", False),
+    ("numpy==1.26.4", False),
+    ("numpy==2.0.0", True),
+    ("Typing_Extensions == 4.9.0", False),
+    ("scipy", True),
+    ("scipy==1.0", True),
+])
+def test_get_outdated(requirement, is_outdated, use_packaging, monkeypatch):
+    if not use_packaging:
+        monkeypatch.setattr(outdated, "Requirement", None)
+    assert get_outdated([requirement], installed) == ([requirement] if is_outdated else [])
+
+
+@pytest.mark.parametrize("requirement, is_outdated", [
+    ("numpy>=2", True),
+    ("numpy>=1.20,<2", False),
+    ("pip~=24.0", False),
+    ("scipy; python_version < '3.0'", False),
+])
+def test_get_outdated_specifiers(requirement, is_outdated):
+    pytest.importorskip("packaging")
+    assert get_outdated([requirement], installed, python_version="3.11") == ([requirement] if is_outdated else [])
+
+
+def test_sync_default_packages(teardown, monkeypatch):
+    create_environment("test", default_pkgs=[])
+    create_environment("other", default_pkgs=[])
+    results = sync_default_packages(default_pkgs=["pip"], dry_run=True)
+    assert [result["outdated"] for result in results] == [[], []]
+
+    installs = []
+    monkeypatch.setattr(commands, "_install_packages",
+                        lambda environment_name, packages, **kwargs: installs.append((environment_name, packages)))
+    results = sync_default_packages(default_pkgs=["pip==0.1"], jobs=2)
+    assert sorted(installs) == [("other", ["pip==0.1"]), ("test", ["pip==0.1"])]
+    assert all(result["error"] is None for result in results)
@@ -0,0 +1,50 @@
+import os
+import time
+
+from manven.commands import activate_temp_environment, fill_pool, drain_pool, pool_status, TO_EXECUTE_FILE
+from manven.pool import get_pool_key, get_pool_path, spawn_replenisher
+from manven.settings import ENVS_PATH
+
+path_to_repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_fill_and_drain_pool(teardown):
+    key = get_pool_key(default_pkgs=[])
+    assert fill_pool(size=2, default_pkgs=[]) == 2
+    assert pool_status() == {key: 2}
+    # Filling an already full pool does nothing
+    assert fill_pool(size=2, default_pkgs=[]) == 0
+
+    drain_pool()
+    assert pool_status() == {}
+
+
+def test_temp_environment_from_pool(teardown):
+    fill_pool(size=1, default_pkgs=[])
+    activate_temp_environment(default_pkgs=[], pool_size=1)
+
+    # The pooled environment was claimed and moved
+    assert pool_status() == {get_pool_key(default_pkgs=[]): 0}
+    path_to_venv = os.path.join(ENVS_PATH, ".temp", "temp_venv_0")
+    with open(TO_EXECUTE_FILE, 'r') as f:
+        assert f.read().startswith(f"source {path_to_venv}/bin/")
+
+    # The absolute paths in the environment are rewritten
+    with open(os.path.join(path_to_venv, "bin", "activate"), 'r') as f:
+        content = f.read()
+    assert path_to_venv in content
+    assert get_pool_path() not in content
+
+
+def test_replenisher(tmp_path, monkeypatch, teardown):
+    # The replenisher fills the pool of ENVS_PATH, even if the config of its working directory sets another folder
+    with open(tmp_path / ".manven.conf", 'w') as f:
+        f.write(f"[manven]\nENVS_PATH={tmp_path / 'other'}\nPOOL_SIZE=1\nDEFAULT_PKGS=[]\n")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PYTHONPATH", path_to_repo)
+    spawn_replenisher()
+    start = time.time()
+    while sum(pool_status().values()) < 1 and time.time() - start < 120:
+        time.sleep(0.2)
+    assert sum(pool_status().values()) == 1
+    assert not os.path.exists(tmp_path / "other")
@@ -0,0 +1,66 @@
+import os
+import pytest
+
+from manven import relocate
+from manven.relocate import clone_environment
+
+
+def _make_environment(path):
+    (path / "bin").mkdir(parents=True)
+    (path / "lib" / "site-packages" / "pkg-1.0.dist-info").mkdir(parents=True)
+    (path / "pyvenv.cfg").write_text(f"home = /usr/bin\nprompt = {path}\n")
+    (path / "bin" / "tool").write_text(f"#!{path}/bin/python\nimport pkg\n")
+    (path / "bin" / "tool").chmod(0o755)
+    (path / "bin" / "binary").write_bytes(f"\0{path}".encode())
+    (path / "lib" / "site-packages" / "pkg.pth").write_text(f"{path}/src\n")
+    (path / "lib" / "site-packages" / "pkg-1.0.dist-info" / "RECORD").write_text(f"{path}/bin/tool,,\n")
+    (path / "lib" / "site-packages" / "module.py").write_text(f"PATH = '{path}'\n")
+    os.symlink("lib", path / "lib64")
+    os.symlink(str(path / "bin" / "tool"), path / "bin" / "absolute")
+
+
+def test_clone_environment(tmp_path):
+    source, target = tmp_path / "source", tmp_path / "target"
+    _make_environment(source)
+    stats = clone_environment(str(source), str(target), jobs=4)
+    assert stats["files"] == 6
+    assert stats["bytes"] == sum(f.stat().st_size for f in source.rglob("*") if f.is_file() and not f.is_symlink())
+
+    assert (target / "pyvenv.cfg").read_text() == f"home = /usr/bin\nprompt = {target}\n"
+    assert (target / "bin" / "tool").read_text() == f"#!{target}/bin/python\nimport pkg\n"
+    assert os.access(target / "bin" / "tool", os.X_OK)
+    assert (target / "lib" / "site-packages" / "pkg.pth").read_text() == f"{target}/src\n"
+    assert (target / "lib" / "site-packages" / "pkg-1.0.dist-info" / "RECORD").read_text() == f"{target}/bin/tool,,\n"
+    # Binary files and files not known to embed the path are copied as is
+    assert (target / "bin" / "binary").read_bytes() == f"\0{source}".encode()
+    assert (target / "lib" / "site-packages" / "module.py").read_text() == f"PATH = '{source}'\n"
+    assert os.readlink(target / "lib64") == "lib"
+    assert os.readlink(target / "bin" / "absolute") == str(target / "bin" / "tool")
+
+
+def test_clone_environment_with_hardlinks(tmp_path):
+    source, target = tmp_path / "source", tmp_path / "target"
+    _make_environment(source)
+    clone_environment(str(source), str(target), hardlinks=True)
+    module = target / "lib" / "site-packages" / "module.py"
+    # Either reflinked (if supported) or hardlinked, the rewritten files are never shared
+    assert module.read_text() == f"PATH = '{source}'\n"
+    assert (target / "bin" / "tool").stat().st_ino != (source / "bin" / "tool").stat().st_ino
+
+
+def test_failed_clone_is_removed(tmp_path, monkeypatch):
+    source, target = tmp_path / "source", tmp_path / "target"
+    _make_environment(source)
+
+    def fail(source, target, old, new):
+        raise OSError("No space left on device")
+    monkeypatch.setattr(relocate, "_copy_relocated", fail)
+    with pytest.raises(OSError):
+        clone_environment(str(source), str(target))
+    assert not target.exists()
+
+    # An existing target is left untouched
+    target.mkdir()
+    with pytest.raises(FileExistsError):
+        clone_environment(str(source), str(target))
+    assert target.exists()
@@ -0,0 +1,58 @@
+import os
+
+from manven.commands import activate_requirements_environment, TO_EXECUTE_FILE
+from manven.requirements import normalize_requirements, get_requirements_hash, get_requirements_path,\
+    list_cached_environments
+from manven.trash import list_trash
+
+
+def _write_requirements(tmp_path, name, content):
+    file_path = tmp_path / name
+    file_path.write_text(content)
+    return str(file_path)
+
+
+def test_normalize_requirements(tmp_path):
+    first = _write_requirements(tmp_path, "first.txt", "# pinned\nrequests==2.0\n\nclick  >= 7  # cli\n")
+    second = _write_requirements(tmp_path, "second.txt", "click >= 7\nrequests==2.0\nrequests==2.0\n")
+    assert normalize_requirements(first) == ["click >= 7", "requests==2.0"]
+    assert normalize_requirements(first) == normalize_requirements(second)
+
+
+def test_requirements_hash():
+    key = get_requirements_hash(["click"])
+    assert key == get_requirements_hash(["click"])
+    assert key != get_requirements_hash(["click", "requests"])
+    assert key != get_requirements_hash(["click"], pip_install_flags=["--no-cache-dir"])
+    assert key != get_requirements_hash(["click"], default_pkgs=["manven"])
+
+
+def test_requirements_environment_is_reused(tmp_path, teardown):
+    requirements_file = _write_requirements(tmp_path, "requirements.txt", "# nothing to install\n")
+    key = activate_requirements_environment(requirements_file, default_pkgs=[])
+    path_to_venv = os.path.join(get_requirements_path(), key)
+    with open(TO_EXECUTE_FILE, 'r') as f:
+        assert f.read().startswith(f"source {path_to_venv}/bin/")
+
+    # The environment is not created again
+    os.mkdir(os.path.join(path_to_venv, "tmp_folder"))
+    assert activate_requirements_environment(requirements_file, default_pkgs=[]) == key
+    assert os.path.exists(os.path.join(path_to_venv, "tmp_folder"))
+
+
+def test_requirements_cache_size(tmp_path, teardown):
+    keys = []
+    for i in range(3):
+        requirements_file = _write_requirements(tmp_path, f"requirements_{i}.txt", f"--trusted-host host{i}\n")
+        keys.append(activate_requirements_environment(requirements_file, default_pkgs=[], cache_size=2))
+        # Make the order of use unambiguous
+        os.utime(os.path.join(get_requirements_path(), keys[-1], ".manven-requirements"), (i, i))
+    keys.append(activate_requirements_environment(
+        _write_requirements(tmp_path, "requirements_3.txt", "--trusted-host host3\n"),
+        default_pkgs=[],
+        cache_size=2,
+    ))
+
+    # The least recently used environments are evicted
+    assert list_cached_environments() == [keys[3], keys[2]]
+    assert len(list_trash()) == 2
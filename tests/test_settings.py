@@ -0,0 +1,80 @@
+import os
+
+from manven import settings
+
+
+def _write_config(folder, envs_path):
+    with open(os.path.join(folder, ".manven.conf"), 'w') as f:
+        f.write(f"[manven]\nENVS_PATH={envs_path}\n")
+
+
+def test_config_found_in_parent(tmp_path, monkeypatch):
+    project = tmp_path / "project"
+    nested = project / "src" / "package"
+    nested.mkdir(parents=True)
+    _write_config(project, "/first")
+    monkeypatch.chdir(nested)
+
+    candidates = settings._get_candidate_files(str(nested))
+    assert candidates[:3] == [str(nested / ".manven.conf"), str(project / "src" / ".manven.conf"),
+                              str(project / ".manven.conf")]
+    config, file_path, cached = settings._get_config()
+    assert config["envs_path"] == "/first"
+    assert file_path == str(project / ".manven.conf")
+    assert not cached
+
+
+def test_config_search_stops_at_home(tmp_path, monkeypatch):
+    nested = tmp_path / "home" / "project"
+    nested.mkdir(parents=True)
+    _write_config(tmp_path, "/shared")
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    settings._get_project_candidates.cache_clear()
+
+    candidates = settings._get_candidate_files(str(nested))
+    assert str(tmp_path / ".manven.conf") not in candidates
+    assert candidates == [str(nested / ".manven.conf"), str(tmp_path / "home" / ".manven.conf"),
+                          str(tmp_path / "home" / ".config" / "manven" / "manven.conf")]
+    settings._get_project_candidates.cache_clear()
+
+
+def test_config_of_other_user_ignored(tmp_path, monkeypatch):
+    _write_config(tmp_path, "/other")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(os, "getuid", lambda: os.stat(tmp_path / ".manven.conf").st_uid + 1)
+    assert settings._get_signature(str(tmp_path / ".manven.conf")) is None
+    _, file_path, _ = settings._get_config()
+    assert file_path != str(tmp_path / ".manven.conf")
+
+
+def test_config_is_cached(tmp_path, monkeypatch):
+    _write_config(tmp_path, "/first")
+    monkeypatch.chdir(tmp_path)
+    settings._get_config()
+
+    def fail(file_path):
+        raise AssertionError("Should use the cache")
+    with monkeypatch.context() as m:
+        m.setattr(settings, "_load_config", fail)
+        config, _, cached = settings._get_config()
+    assert cached
+    assert config["envs_path"] == "/first"
+
+    # Parsed again when the file changes
+    _write_config(tmp_path, "/second/path")
+    config, _, cached = settings._get_config()
+    assert not cached
+    assert config["envs_path"] == "/second/path"
+
+
+def test_escape():
+    value = "with\ttab\nnewline and \\backslash\\t"
+    assert settings._unescape(settings._escape(value)) == value
+    assert '\t' not in settings._escape(value) and '\n' not in settings._escape(value)
+
+
+def test_explain_config():
+    explanation = settings.explain_config()
+    assert explanation["settings"]["envs_path"]
+    assert explanation["candidates"]
+    assert explanation["duration"] >= 0
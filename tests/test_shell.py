@@ -0,0 +1,30 @@
+import sys
+import shutil
+import subprocess
+import pytest
+
+from manven.shell import get_init_script, SHELLS, SOURCE_EXIT_CODE
+from manven.state import SESSION_VARIABLE
+
+
+@pytest.mark.parametrize("shell", SHELLS)
+def test_get_init_script(shell):
+    script = get_init_script(shell, "/path with space/manven")
+    assert sys.executable in script
+    assert "main.py" in script
+    assert str(SOURCE_EXIT_CODE) in script
+    assert "'/path with space/manven'/$" in script
+    assert SESSION_VARIABLE in script
+
+
+@pytest.mark.parametrize("shell", ["bash", "zsh", "fish"])
+def test_init_script_syntax(shell):
+    if shutil.which(shell) is None:
+        pytest.skip(f"{shell} is not installed")
+    script = get_init_script(shell, "/tmp/manven")
+    subprocess.run([shell, "-n", "-c", script], check=True)
+
+
+def test_unknown_shell():
+    with pytest.raises(ValueError):
+        get_init_script("powershell", "/tmp/manven")
@@ -0,0 +1,68 @@
+import io
+import os
+import json
+import gzip
+import tarfile
+import subprocess
+import pytest
+
+from manven.commands import create_environment, snapshot_environment, restore_environment, list_environments
+from manven.settings import ENVS_PATH
+
+
+def test_snapshot_and_restore(teardown):
+    create_environment("test", default_pkgs=[])
+    archive = io.BytesIO()
+    stats = snapshot_environment("test", archive)
+    assert stats["files"] > 0
+
+    archive.seek(0)
+    restored = restore_environment(archive, environment_name="copy")
+    assert restored["name"] == "copy"
+    assert restored["files"] == stats["files"]
+    assert "pip" in restored["distributions"]
+    assert list_environments() == ["copy", "test"]
+
+    path_to_copy = os.path.join(ENVS_PATH, "copy")
+    with open(os.path.join(path_to_copy, "pyvenv.cfg"), 'r') as f:
+        assert os.path.join(ENVS_PATH, "test") not in f.read()
+    output = subprocess.run([os.path.join(path_to_copy, "bin", "python"), "-c", "import sys; print(sys.prefix)"],
+                            capture_output=True, check=True)
+    assert output.stdout.decode().strip() == path_to_copy
+
+    # Existing environments are not overwritten
+    archive.seek(0)
+    with pytest.raises(ValueError):
+        restore_environment(archive)
+
+
+def _make_archive(members, manifest, name="test"):
+    archive = io.BytesIO()
+    with gzip.GzipFile(fileobj=archive, mode='wb') as compressed, \
+            tarfile.open(fileobj=compressed, mode='w|') as tar:
+        header = {"version": 1, "name": name, "prefix": "/old/test", "created": 0}
+        for name, content in [("manven-snapshot.json", json.dumps(header).encode()), *members,
+                              ("manven-manifest.json", json.dumps(manifest).encode())]:
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+    archive.seek(0)
+    return archive
+
+
+@pytest.mark.parametrize("members, manifest, name, environment_name", [
+    ([("env/file", b"content")], {"distributions": {}, "files": {"file": "0" * 64}}, "test", None),
+    ([("env/../file", b"content")], {"distributions": {}, "files": {}}, "test", None),
+    ([("/file", b"content")], {"distributions": {}, "files": {}}, "test", None),
+    ([("env/file", b"content")], {"distributions": {}, "files": {}}, "../file", None),
+    ([("env/file", b"content")], {"distributions": {}, "files": {}}, "..", None),
+    ([("env/file", b"content")], {"distributions": {}, "files": {}}, ".hidden", None),
+    ([("env/file", b"content")], {"distributions": {}, "files": {}}, "test", "../file"),
+    ([("env/file", b"content")], {"distributions": {}, "files": {}}, "test", ".hidden"),
+])
+def test_refuse_snapshot(members, manifest, name, environment_name, teardown):
+    with pytest.raises(ValueError):
+        restore_environment(_make_archive(members, manifest, name=name), environment_name=environment_name)
+    # Nothing is left behind
+    assert os.listdir(ENVS_PATH) == []
+    assert not os.path.exists(os.path.join(os.path.dirname(ENVS_PATH), "file"))
@@ -0,0 +1,55 @@
+import os
+import sys
+import subprocess
+
+from manven.commands import create_environment
+from manven.settings import ENVS_PATH
+from manven.state import get_runtime_dir, cleanup_stale_sessions, read_last_activated_environment,\
+    update_last_activated_environment, LAST_ENV, SOURCE_EXIT_CODE
+
+path_to_repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+path_to_main = os.path.join(path_to_repo, "manven", "main.py")
+
+
+def _run_in_session(session, args, cwd):
+    env = dict(os.environ, PYTHONPATH=path_to_repo, MANVEN_SESSION=session)
+    output = subprocess.run([sys.executable, path_to_main, *args], cwd=cwd, env=env, stdin=subprocess.DEVNULL)
+    assert output.returncode == SOURCE_EXIT_CODE
+    with open(os.path.join(get_runtime_dir(), f"{session}.sh"), 'r') as f:
+        return f.read()
+
+
+def test_sessions_are_separate(tmp_path, teardown):
+    with open(tmp_path / ".manven.conf", 'w') as f:
+        f.write(f"[manven]\nENVS_PATH={ENVS_PATH}\n")
+    create_environment("test", default_pkgs=[])
+
+    assert _run_in_session("first", ["activate", "test"], cwd=tmp_path).startswith("source ")
+    assert _run_in_session("second", ["deactivate"], cwd=tmp_path) == "deactivate"
+    # The first session still has its own file
+    with open(os.path.join(get_runtime_dir(), "first.sh"), 'r') as f:
+        assert f.read().startswith("source ")
+
+
+def test_last_environment_falls_back_to_user():
+    update_last_activated_environment("test", ENVS_PATH)
+    assert read_last_activated_environment() == ("test", ENVS_PATH)
+
+    # Another session which has not activated anything gets the last one of the user
+    os.remove(LAST_ENV)
+    assert read_last_activated_environment() == ("test", ENVS_PATH)
+
+
+def test_cleanup_stale_sessions():
+    runtime_dir = get_runtime_dir()
+    os.makedirs(runtime_dir, exist_ok=True)
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    dead, alive, old = str(process.pid), str(os.getpid()), "old"
+    for session in [dead, alive, old]:
+        with open(os.path.join(runtime_dir, f"{session}.sh"), 'w'):
+            pass
+    os.utime(os.path.join(runtime_dir, f"{old}.sh"), (0, 0))
+
+    assert cleanup_stale_sessions() == sorted([dead, old])
+    assert os.path.exists(os.path.join(runtime_dir, f"{alive}.sh"))
@@ -0,0 +1,76 @@
+import os
+
+from manven import store
+from manven.store import dedupe_environment, dedupe_environments, gc_store, get_store_path
+from manven.settings import ENVS_PATH
+
+
+def _make_environment(name, files):
+    path_to_venv = os.path.join(ENVS_PATH, name)
+    site_packages = os.path.join(path_to_venv, "lib", "python3.8", "site-packages")
+    for file_path, content in files.items():
+        file_path = os.path.join(site_packages, file_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'w') as f:
+            f.write(content)
+    return path_to_venv, site_packages
+
+
+def test_dedupe_environments(teardown):
+    files = {
+        "pkg/__init__.py": "x = 1\n" * 100,
+        "pkg-1.0.dist-info/RECORD": "pkg/__init__.py\n",
+        "pkg.pth": "/some/path\n",
+    }
+    first, first_site_packages = _make_environment("first", files)
+    second, second_site_packages = _make_environment("second", files)
+
+    # The first environment only populates the store
+    assert dedupe_environment(first) == (0, 0)
+    linked, reclaimed = dedupe_environment(second)
+    assert linked == 1
+    assert reclaimed == len(files["pkg/__init__.py"])
+
+    first_stat = os.stat(os.path.join(first_site_packages, "pkg", "__init__.py"))
+    second_stat = os.stat(os.path.join(second_site_packages, "pkg", "__init__.py"))
+    assert first_stat.st_ino == second_stat.st_ino
+    assert first_stat.st_nlink == 3
+
+    # Files rewritten per environment are not shared
+    for filename in ["pkg.pth", os.path.join("pkg-1.0.dist-info", "RECORD")]:
+        assert os.stat(os.path.join(second_site_packages, filename)).st_nlink == 1
+
+    # Running again does nothing
+    assert dedupe_environments([first, second]) == (0, 0)
+
+
+def test_gc_store(teardown):
+    files = {"pkg/__init__.py": "x = 1\n"}
+    first, _ = _make_environment("first", files)
+    dedupe_environment(first)
+    assert gc_store() == 0
+
+    os.remove(os.path.join(first, "lib", "python3.8", "site-packages", "pkg", "__init__.py"))
+    assert gc_store() == len(files["pkg/__init__.py"])
+    assert not any(files for _, _, files in os.walk(get_store_path()))
+
+
+def test_dedupe_during_gc(monkeypatch, teardown):
+    files = {"pkg/__init__.py": "x = 1\n" * 100}
+    first, _ = _make_environment("first", files)
+    second, second_site_packages = _make_environment("second", files)
+    dedupe_environment(first)
+    link = os.link
+
+    def link_after_gc(source, target):
+        # A concurrent gc removes the file in the store right before it is linked
+        if source.startswith(get_store_path()) and os.path.exists(source):
+            os.remove(source)
+            monkeypatch.setattr(store.os, "link", link)
+            raise FileNotFoundError(source)
+        link(source, target)
+    monkeypatch.setattr(store.os, "link", link_after_gc)
+    dedupe_environment(second)
+    # The file of the second environment is now the one in the store
+    file_path = os.path.join(second_site_packages, "pkg", "__init__.py")
+    assert os.stat(file_path).st_nlink == 2
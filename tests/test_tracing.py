@@ -0,0 +1,28 @@
+import sys
+import json
+
+from manven import tracing
+from manven.commands import create_environment
+
+
+def test_span_is_noop_when_disabled(monkeypatch):
+    monkeypatch.setattr(tracing, "_target", None)
+    assert tracing.span("first") is tracing.span("second")
+
+
+def test_spans_are_nested(tmp_path, monkeypatch, teardown):
+    trace_file = tmp_path / "trace.jsonl"
+    monkeypatch.setattr(tracing, "_target", str(trace_file))
+    with tracing.span("outer", extra="value"):
+        create_environment("test", default_pkgs=[])
+        tracing.run([sys.executable, "-c", "import sys; sys.exit(3)"])
+
+    with open(trace_file, 'r') as f:
+        spans = {span["name"]: span for span in map(json.loads, f)}
+    assert spans["outer"]["parent"] is None
+    assert spans["outer"]["extra"] == "value"
+    assert spans["create_environment"]["parent"] == spans["outer"]["id"]
+    assert spans["_create_an_environment"]["parent"] == spans["create_environment"]["id"]
+    assert spans["subprocess"]["returncode"] == 3
+    assert spans["subprocess"]["args"][0] == sys.executable
+    assert spans["outer"]["wall"] >= spans["create_environment"]["wall"] > 0
@@ -0,0 +1,43 @@
+import os
+import time
+
+from manven.settings import ENVS_PATH
+from manven.trash import get_trash_path, move_to_trash, list_trash, empty_trash, is_emptying, spawn_trash_worker
+
+path_to_repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_move_to_trash_and_empty(teardown):
+    for name in ["test", "hello"]:
+        os.makedirs(os.path.join(ENVS_PATH, name, "bin"))
+        move_to_trash(os.path.join(ENVS_PATH, name))
+        assert not os.path.exists(os.path.join(ENVS_PATH, name))
+    with open(os.path.join(ENVS_PATH, "file"), 'w'):
+        pass
+    move_to_trash(os.path.join(ENVS_PATH, "file"))
+
+    entries = list_trash()
+    assert len(entries) == 3
+    assert sorted(entry.rsplit('-', 1)[0] for entry in entries) == ["file", "hello", "test"]
+
+    assert empty_trash(jobs=2) == 3
+    assert list_trash() == []
+    assert not is_emptying()
+    assert os.path.exists(get_trash_path())
+
+
+def test_empty_missing_trash(teardown):
+    assert empty_trash() == 0
+
+
+def test_trash_worker(tmp_path, monkeypatch, teardown):
+    # The worker empties the trash of ENVS_PATH, whatever the config of its working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PYTHONPATH", path_to_repo)
+    os.makedirs(os.path.join(ENVS_PATH, "test", "bin"))
+    move_to_trash(os.path.join(ENVS_PATH, "test"))
+    spawn_trash_worker()
+    start = time.time()
+    while list_trash() and time.time() - start < 60:
+        time.sleep(0.1)
+    assert list_trash() == []
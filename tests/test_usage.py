@@ -0,0 +1,49 @@
+import os
+
+from manven import usage
+from manven.commands import create_environment, get_environments_disk_usage
+from manven.usage import get_disk_usage
+from manven.settings import ENVS_PATH
+
+
+def _make_environment(name):
+    path_to_venv = os.path.join(ENVS_PATH, name)
+    site_packages = os.path.join(path_to_venv, "lib", "python3.8", "site-packages")
+    os.makedirs(site_packages)
+    with open(os.path.join(site_packages, "module.py"), 'w') as f:
+        f.write("x = 1\n" * 1000)
+    return path_to_venv, site_packages
+
+
+def test_disk_usage_is_cached(teardown, monkeypatch):
+    path_to_venv, site_packages = _make_environment("test")
+    first = get_disk_usage([path_to_venv])
+    assert first[path_to_venv]["files"] == 1
+    assert first[path_to_venv]["size"] > 0
+
+    # Not walked again if nothing changed
+    def fail(path):
+        raise AssertionError("Should use the cache")
+    with monkeypatch.context() as m:
+        m.setattr(usage, "_measure", fail)
+        assert get_disk_usage([path_to_venv]) == first
+
+    # Walked again after installing something
+    with open(os.path.join(site_packages, "other.py"), 'w') as f:
+        f.write("y = 2\n")
+    assert get_disk_usage([path_to_venv])[path_to_venv]["files"] == 2
+
+
+def test_hardlinks_counted_once(teardown):
+    path_to_venv, site_packages = _make_environment("test")
+    size = get_disk_usage([path_to_venv])[path_to_venv]["size"]
+    os.link(os.path.join(site_packages, "module.py"), os.path.join(site_packages, "link.py"))
+    assert get_disk_usage([path_to_venv])[path_to_venv] == {"size": size, "files": 2}
+
+
+def test_environments_disk_usage(teardown):
+    create_environment("test", default_pkgs=[])
+    environments = get_environments_disk_usage()
+    assert [environment["name"] for environment in environments] == ["test"]
+    assert environments[0]["size"] > 0
+    assert environments[0]["last_activated"] is None
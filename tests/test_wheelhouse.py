@@ -0,0 +1,53 @@
+import os
+import sys
+import pytest
+
+from manven.commands import create_environment
+from manven.settings import ENVS_PATH
+from manven.wheelhouse import get_wheelhouse_path, get_environment_abi_tag, format_abi_tag, can_serve,\
+    record_install, get_stats
+
+
+@pytest.mark.parametrize("implementation, major, minor, expected", [
+    ("CPython", 3, 8, "cp38"),
+    ("cpython", "3", "11", "cp311"),
+    ("PyPy", 3, 9, "pp39"),
+])
+def test_format_abi_tag(implementation, major, minor, expected):
+    assert format_abi_tag(implementation, major, minor) == expected
+
+
+def test_get_environment_abi_tag(teardown):
+    create_environment("test", default_pkgs=[])
+    expected = format_abi_tag(sys.implementation.name, *sys.version_info[:2])
+    assert get_environment_abi_tag(os.path.join(ENVS_PATH, "test")) == expected
+    assert get_environment_abi_tag(os.path.join(ENVS_PATH, "other")) is None
+
+
+@pytest.mark.parametrize("packages, expected", [
+    ([], True),
+    (["manven"], True),
+    (["manven>=0.5", "typing-extensions[extra]"], True),
+    (["manven", "numpy"], False),
+    (["./path/to/package"], False),
+])
+def test_can_serve(packages, expected, teardown):
+    wheelhouse_path = get_wheelhouse_path("cp38")
+    os.makedirs(wheelhouse_path)
+    for wheel in ["manven-0.5.1-py3-none-any.whl", "typing_extensions-4.0.0-py3-none-any.whl"]:
+        with open(os.path.join(wheelhouse_path, wheel), 'w'):
+            pass
+    assert can_serve(packages, "cp38") == expected
+    assert not can_serve(packages, "cp39")
+
+
+def test_record_install(teardown):
+    # Nothing is recorded without a wheelhouse
+    record_install(hit=True)
+    assert get_stats() == {"hits": 0, "misses": 0}
+
+    os.makedirs(get_wheelhouse_path())
+    record_install(hit=True)
+    record_install(hit=False)
+    record_install(hit=True)
+    assert get_stats() == {"hits": 2, "misses": 1}